@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Aggregate stored per-comic score distributions without running any model.
+
+Every scoring run (analysis/score_all.py or one of the yearly scripts)
+keeps each comic's full label distribution in a memory-mapped score store
+(see common/score_store.py). This script answers new questions from it
+with a few array operations:
+
+  --stat mean        mean score of each label per period (default)
+  --stat top         share of comics whose highest-scoring column it is
+  --stat threshold   share of comics scoring at least --threshold
+
+over year, month or day bins, for all labels, a --labels subset, or
+--group columns that combine several labels (summed, or their maximum
+with --combine max). --bootstrap N adds a percentile bootstrap confidence
+interval next to each column (see common/bootstrap.py).
+
+Usage:
+    python analysis/aggregate_scores.py goemotions
+    python analysis/aggregate_scores.py goemotions --stat top --by month
+    python analysis/aggregate_scores.py goemotions --stat threshold --threshold 0.3
+    python analysis/aggregate_scores.py goemotions --group positive=joy+amusement+love \\
+        --group negative=anger+annoyance+disgust --out goemotions_groups.csv
+    python analysis/aggregate_scores.py sarcasm --labels sarcastic --by month --bootstrap 2000
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from common.bootstrap import DEFAULT_CONFIDENCE, interval_columns, with_intervals
+from common.corpus import DATASET_PATH
+from common.score_store import PERIODS, STORE_DIR, grouped_means, load_score_store
+
+
+STATS = ("mean", "top", "threshold")
+COMBINE = {"sum": np.sum, "max": np.max}
+
+
+def group_spec(value: str) -> tuple[str, list[str]]:
+    """Parse NAME=label+label+... into (NAME, [labels])."""
+    name, sep, members = value.partition("=")
+    labels = [label.strip() for label in members.split("+") if label.strip()]
+    if not sep or not name.strip() or not labels:
+        raise argparse.ArgumentTypeError(f"expected NAME=label+label, got '{value}'")
+    return name.strip(), labels
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("model", help="Model whose stored scores to read (e.g. goemotions)")
+    parser.add_argument("--by", choices=PERIODS, default="year", help="Period bins (default: year)")
+    parser.add_argument("--stat", choices=STATS, default="mean", help="Statistic per period (default: mean)")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.5,
+        help="Score cut-off for --stat threshold (default: 0.5)",
+    )
+    parser.add_argument("--labels", default=None, help="Comma-separated labels to keep (default: all)")
+    parser.add_argument(
+        "--group",
+        type=group_spec,
+        action="append",
+        default=[],
+        metavar="NAME=LABEL+LABEL",
+        help="Aggregate a combination of labels as one column (repeatable; replaces --labels)",
+    )
+    parser.add_argument(
+        "--combine",
+        choices=COMBINE,
+        default="sum",
+        help="How --group combines its labels' scores per comic (default: sum)",
+    )
+    parser.add_argument(
+        "--bootstrap",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Add bootstrap confidence intervals from N resamples (default: 0, none)",
+    )
+    parser.add_argument(
+        "--confidence",
+        type=float,
+        default=DEFAULT_CONFIDENCE,
+        help=f"Confidence level of the intervals (default: {DEFAULT_CONFIDENCE})",
+    )
+    parser.add_argument("--out", type=Path, default=None, help="Also write the table to this CSV")
+    parser.add_argument("--dataset", type=Path, default=DATASET_PATH)
+    parser.add_argument("--store-dir", type=Path, default=STORE_DIR)
+    return parser.parse_args()
+
+
+def select_columns(store, labels: list[str], groups: list, combine: str) -> tuple[list[str], np.ndarray]:
+    """The per-comic values to aggregate: (column names, comics x columns array)."""
+    if groups:
+        reduce = COMBINE[combine]
+        columns = [reduce(store.matrix(members), axis=1) for _, members in groups]
+        return [name for name, _ in groups], np.column_stack(columns)
+    labels = labels or store.labels
+    return list(labels), store.matrix(labels)
+
+
+def per_comic_stat(values: np.ndarray, stat: str, threshold: float) -> np.ndarray:
+    """What gets averaged per period: the scores, top-column indicators or threshold hits."""
+    if stat == "threshold":
+        return (values >= threshold).astype(np.float32)
+    if stat == "top":
+        indicators = np.zeros_like(values)
+        if len(values):
+            indicators[np.arange(len(values)), values.argmax(axis=1)] = 1.0
+        return indicators
+    return values
+
+
+def main():
+    args = parse_args()
+    store = load_score_store(args.model, dataset_path=args.dataset, store_dir=args.store_dir)
+    if store is None:
+        raise SystemExit(
+            f"No stored {args.model} scores in {args.store_dir / args.model}. "
+            f"Run analysis/score_all.py (or the model's yearly script) first."
+        )
+    print(f"Read {len(store)} comics x {len(store.labels)} labels from {store.path}")
+    print(f"Scored with options: {json.dumps(json.loads(store.meta['options']))}")
+
+    labels = [label.strip() for label in args.labels.split(",")] if args.labels else None
+    try:
+        columns, values = select_columns(store, labels, args.group, args.combine)
+    except KeyError as exc:
+        raise SystemExit(exc.args[0])
+
+    keys, inverse = store.periods(args.by)
+    per_comic = per_comic_stat(values, args.stat, args.threshold)
+    table = grouped_means(keys, inverse, per_comic, columns, args.by)
+    if args.bootstrap > 0:
+        intervals = interval_columns(
+            inverse, pd.DataFrame(per_comic, columns=columns), args.bootstrap, args.confidence
+        )
+        intervals.index = table.index
+        table = with_intervals(table, intervals, columns)
+
+    print(table.to_string(float_format=lambda x: f"{x:.4f}"))
+    if args.out is not None:
+        table.to_csv(args.out)
+        print(f"\nSaved {args.stat} by {args.by} to: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Autotune batch size and thread count for each classifier on this host.
+
+For each selected model this runs short timed trials over a grid of batch
+sizes x intra-op thread counts (torch's, or the ONNX Runtime session's for
+the onnx backends), on a stratified sample of real transcripts (spread over
+the corpus's length distribution, so Sunday strips are in it), and measures
+per trial:
+
+  - comics_per_sec    throughput after a warm-up batch
+  - peak_rss_mb       the process's peak resident memory during the trial
+
+The fastest configuration (within --max-rss-mb, if given) is saved as this
+host's profile in analysis/.cache/autotune.json. The scoring scripts and
+score_all.py pick it up automatically whenever --batch-size, --max-tokens or
+the thread count are not given; --no-tuning ignores it.
+
+The inference cache is bypassed, so every trial really runs the model.
+Each trial's padded-token budget is its batch size times the model's
+window, so the batch size is the limit being tuned.
+
+Usage:
+    python analysis/autotune.py
+    python analysis/autotune.py --models sentiment,sarcasm --sample 256
+    python analysis/autotune.py --batch-sizes 8,16,32 --threads 2,4,8 --backend int8
+    python analysis/autotune.py --max-rss-mb 4000
+"""
+
+import argparse
+import contextlib
+import io
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from common.backends import BACKENDS, DEFAULT_BACKEND, set_inference_threads
+from common.corpus import DATASET_PATH, load_corpus
+from common.inference import model_max_length
+from common.tuning import (
+    PROFILE_PATH,
+    host_id,
+    save_profile,
+    stratified_sample,
+    timed,
+    usable_cpus,
+)
+from score_all import MODELS
+
+
+DEFAULT_SAMPLE = 128
+DEFAULT_BATCH_SIZES = "1,4,8,16,32,64"
+
+
+def default_thread_grid() -> str:
+    """Powers of two up to the usable CPU count, plus the count itself."""
+    cpus = usable_cpus()
+    threads = [1]
+    while threads[-1] * 2 <= cpus:
+        threads.append(threads[-1] * 2)
+    if threads[-1] != cpus:
+        threads.append(cpus)
+    return ",".join(str(t) for t in threads)
+
+
+def int_list(value: str) -> list[int]:
+    return sorted({int(item) for item in value.split(",") if item.strip()})
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--models",
+        default=",".join(MODELS),
+        help=f"Comma-separated subset of: {', '.join(MODELS)} (default: all)",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default=DEFAULT_BACKEND,
+        help=f"Backend to tune; profiles are kept per backend (default: {DEFAULT_BACKEND})",
+    )
+    parser.add_argument(
+        "--sample",
+        type=int,
+        default=DEFAULT_SAMPLE,
+        help=f"Transcripts per trial (default: {DEFAULT_SAMPLE})",
+    )
+    parser.add_argument("--strata", type=int, default=8, help="Length strata in the sample (default: 8)")
+    parser.add_argument("--seed", type=int, default=0, help="Sampling seed (default: 0)")
+    parser.add_argument(
+        "--batch-sizes",
+        type=int_list,
+        default=int_list(DEFAULT_BATCH_SIZES),
+        help=f"Comma-separated batch sizes to try (default: {DEFAULT_BATCH_SIZES})",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int_list,
+        default=int_list(default_thread_grid()),
+        help=f"Comma-separated intra-op thread counts to try (default: {default_thread_grid()})",
+    )
+    parser.add_argument(
+        "--max-rss-mb",
+        type=float,
+        default=None,
+        help="Only pick configurations whose peak memory stays under this many MB",
+    )
+    parser.add_argument("--dataset", type=Path, default=DATASET_PATH)
+    parser.add_argument("--dry-run", action="store_true", help="Report the trials without saving a profile")
+    return parser.parse_args()
+
+
+def run_trial(module, classifier, texts: list[str], batch_size: int, threads: int) -> dict:
+    """Time one configuration on `texts`; failures (e.g. out of memory) are recorded."""
+    # Also rebuilds an ONNX backend's session, which fixes its thread count
+    set_inference_threads(classifier, threads)
+    max_tokens = batch_size * model_max_length(classifier.tokenizer)
+    trial = {"batch_size": batch_size, "max_tokens": max_tokens, "threads": threads}
+
+    # run_model reports progress per batch, which would drown the trial table
+    quiet = contextlib.redirect_stdout(io.StringIO())
+    try:
+        with quiet:
+            # Warm-up: first calls pay for allocator growth and kernel selection
+            module.run_model(classifier, texts[:batch_size], batch_size, max_tokens)
+            _, seconds, peak_mb = timed(
+                lambda: module.run_model(classifier, texts, batch_size, max_tokens)
+            )
+    except (RuntimeError, MemoryError) as exc:
+        return {**trial, "comics_per_sec": np.nan, "peak_rss_mb": np.nan, "error": str(exc)[:200]}
+    return {**trial, "comics_per_sec": len(texts) / seconds, "peak_rss_mb": peak_mb, "error": ""}
+
+
+def tune_model(name: str, texts: list[str], args) -> pd.DataFrame:
+    module, build = MODELS[name]
+    classifier = build(args.backend)
+
+    trials = []
+    for threads in args.threads:
+        for batch_size in args.batch_sizes:
+            trial = run_trial(module, classifier, texts, batch_size, threads)
+            trials.append(trial)
+            if trial["error"]:
+                print(f"  threads={threads:<3} batch={batch_size:<4} failed: {trial['error']}")
+                # Larger batches at this thread count would only fail again
+                break
+            print(f"  threads={threads:<3} batch={batch_size:<4} "
+                  f"{trial['comics_per_sec']:8.2f} comics/s  {trial['peak_rss_mb']:8.0f} MB")
+    return pd.DataFrame(trials)
+
+
+def pick_best(trials: pd.DataFrame, max_rss_mb: float = None):
+    """The fastest successful trial within the memory limit, or None."""
+    ok = trials[trials["error"] == ""]
+    if max_rss_mb is not None:
+        ok = ok[ok["peak_rss_mb"] <= max_rss_mb]
+    if ok.empty:
+        return None
+    return ok.loc[ok["comics_per_sec"].idxmax()]
+
+
+def main():
+    args = parse_args()
+    names = [name.strip() for name in args.models.split(",") if name.strip()]
+    for name in names:
+        if name not in MODELS:
+            raise SystemExit(f"Unknown model '{name}'. Choose from: {', '.join(MODELS)}")
+
+    corpus = load_corpus(args.dataset)
+    lengths = np.diff(np.asarray(corpus.offsets))
+    indices = stratified_sample(lengths, args.sample, args.strata, args.seed)
+    texts = [corpus.text(int(i)) for i in indices]
+    print(f"Host: {host_id()}")
+    print(f"Tuning on {len(texts)} transcripts ({args.strata} length strata), "
+          f"batch sizes {args.batch_sizes} x threads {args.threads}")
+
+    for name in names:
+        print(f"\n[{name}] {args.backend}")
+        trials = tune_model(name, texts, args)
+        best = pick_best(trials, args.max_rss_mb)
+        if best is None:
+            print(f"  No configuration succeeded within the limits; keeping the defaults for {name}")
+            continue
+
+        print(f"  Best: batch size {best['batch_size']}, {best['threads']} threads, "
+              f"{best['comics_per_sec']:.2f} comics/s, peak {best['peak_rss_mb']:.0f} MB")
+        if args.dry_run:
+            continue
+        save_profile(
+            name,
+            args.backend,
+            {
+                "batch_size": int(best["batch_size"]),
+                "max_tokens": int(best["max_tokens"]),
+                "threads": int(best["threads"]),
+                "comics_per_sec": round(float(best["comics_per_sec"]), 3),
+                "peak_rss_mb": round(float(best["peak_rss_mb"]), 1),
+                "sample": len(texts),
+                "trials": trials.replace({np.nan: None}).to_dict("records"),
+            },
+        )
+
+    if not args.dry_run:
+        print(f"\nSaved profiles to: {PROFILE_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Import-time and startup benchmark for the analysis scripts.
+
+Every case runs in a fresh interpreter (so nothing is already imported) and
+reports the best wall time over --repeats runs, the child's peak RSS, and
+whether torch / transformers ended up imported:
+
+  - import torch, import transformers   the cost the scripts used to pay
+                                        before doing anything
+  - import <script>                     each analysis script's module import
+  - <script> --from-scores              a full aggregation-only run: stored
+                                        per-comic scores -> yearly CSV + plot
+                                        (written to a temporary directory)
+
+The --from-scores cases need analysis/comic_scores/comic_scores.csv from
+analysis/score_all.py and are skipped for models it doesn't hold.
+
+Usage:
+    python analysis/benchmark_startup.py
+    python analysis/benchmark_startup.py --repeats 5 --csv startup.csv
+    python analysis/benchmark_startup.py --script-args "--chunked mean"
+"""
+
+import argparse
+import json
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from common.scores import SCORES_CSV, SCORES_META
+
+
+ANALYSIS_DIR = Path(__file__).resolve().parent
+SCRIPT_DIRS = [ANALYSIS_DIR, ANALYSIS_DIR / "yearly_emotions", ANALYSIS_DIR / "yearly_sentiment"]
+
+# model name -> script module (in one of SCRIPT_DIRS)
+SCRIPTS = {
+    "sentiment": "yearly_sentiment",
+    "goemotions": "emotions_goemotions",
+    "sarcasm": "emotions_sarcasm",
+    "zeroshot": "emotions_zeroshot",
+}
+
+HEAVY_MODULES = ("torch", "transformers")
+
+# Appended to every case: report which heavy modules got imported
+REPORT_HEAVY = (
+    "import sys, json; "
+    f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]), file=sys.stderr)"
+)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per case; the fastest counts (default: 3)")
+    parser.add_argument("--csv", type=Path, default=None, help="Also write the results to this CSV")
+    parser.add_argument(
+        "--script-args",
+        default="",
+        help="Extra options for the --from-scores runs, matching how the scores were made "
+             "(e.g. \"--backend int8 --chunked mean\")",
+    )
+    return parser.parse_args()
+
+
+def run_case(argv: list[str]) -> tuple[float, float, list, int]:
+    """Run argv once; return (seconds, peak RSS in MB, heavy modules imported, exit status)."""
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(str(d) for d in SCRIPT_DIRS), "MPLBACKEND": "Agg"}
+    start = time.perf_counter()
+    process = subprocess.Popen(argv, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, env=env)
+    stderr = process.stderr.read()
+    # wait4 rather than wait(): it also returns the child's own resource usage
+    _, status, usage = os.wait4(process.pid, 0)
+    seconds = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak_mb = usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    heavy = []
+    for line in reversed(stderr.decode("utf-8", "replace").splitlines()):
+        if line.startswith("["):
+            heavy = json.loads(line)
+            break
+    return seconds, peak_mb, heavy, process.returncode
+
+
+def cases(out_dir: Path, script_args: list[str]) -> list[tuple[str, list[str]]]:
+    python = sys.executable
+    found = [
+        ("import torch", [python, "-c", f"import torch; {REPORT_HEAVY}"]),
+        ("import transformers", [python, "-c", f"from transformers import pipeline; {REPORT_HEAVY}"]),
+    ]
+    for module in SCRIPTS.values():
+        found.append((f"import {module}", [python, "-c", f"import {module}; {REPORT_HEAVY}"]))
+
+    stored = {}
+    if SCORES_CSV.exists() and SCORES_META.exists():
+        with SCORES_META.open("r", encoding="utf-8") as f:
+            stored = json.load(f).get("models", {})
+    for name, module in SCRIPTS.items():
+        if name not in stored:
+            print(f"Skipping {module} --from-scores: no {name} scores in {SCORES_CSV}")
+            continue
+        # runpy keeps the heavy-module report in the same interpreter
+        code = (
+            f"import runpy, sys; sys.argv = {[module, '--from-scores', '--output-dir', str(out_dir / name), *script_args]!r}; "
+            f"runpy.run_module('{module}', run_name='__main__'); {REPORT_HEAVY}"
+        )
+        found.append((f"{module} --from-scores", [python, "-c", code]))
+    return found
+
+
+def main():
+    args = parse_args()
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, argv in cases(Path(tmp), shlex.split(args.script_args)):
+            runs = [run_case(argv) for _ in range(args.repeats)]
+            failed = [run for run in runs if run[3] != 0]
+            rows.append({
+                "case": label,
+                "seconds": min(run[0] for run in runs),
+                "peak_rss_mb": max(run[1] for run in runs),
+                "imports_torch": "torch" in runs[-1][2],
+                "imports_transformers": "transformers" in runs[-1][2],
+                "ok": not failed,
+            })
+            print(f"  {label:<40} {rows[-1]['seconds']:6.2f} s  {rows[-1]['peak_rss_mb']:7.0f} MB"
+                  f"{'  FAILED' if failed else ''}")
+
+    report = pd.DataFrame(rows)
+    print("\n" + report.to_string(index=False, float_format=lambda x: f"{x:.3g}"))
+    if args.csv is not None:
+        report.to_csv(args.csv, index=False)
+        print(f"\nSaved benchmark to: {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
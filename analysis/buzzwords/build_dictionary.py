@@ -1,61 +1,88 @@
 #!/usr/bin/env python3
-import json
-import re
+import argparse
+import sys
 from pathlib import Path
 
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common.corpus import DATASET_PATH, load_corpus
+from common.tokens import TOKEN_RE, load_tokens
+
+from yearly_corpus import (
+    YEARLY_CORPUS_DIR,
+    changed_years,
+    load_manifest,
+    mark_processed,
+    update_yearly_corpus,
+)
+
 OUT_DIR = Path(__file__).parent
-YEARLY_CORPUS_PATH = OUT_DIR / "yearly_corpus.json"
 RAW_DICT_PATH = OUT_DIR / "unique_words_raw.txt"
 
-# Simple token regex:
-# - starts with a letter
-# - can include letters, digits, apostrophes, hyphens, underscores
-TOKEN_RE = re.compile(r"[A-Za-z][A-Za-z0-9'_/-]*")
+# Unique words of each year, so only changed years are recomputed
+YEAR_WORDS_DIR = YEARLY_CORPUS_DIR / "words"
 
+# Name under which this stage records what it has processed (yearly_corpus.py)
+STAGE_NAME = "build_dictionary"
 
-def load_yearly_corpus(path: Path):
-    with path.open("r", encoding="utf-8") as f:
-        return json.load(f)
 
-
-def extract_unique_words(yearly_corpus: dict[str, list[str]]):
+def extract_unique_words(tokens) -> list[str]:
     """
-    Iterate all transcripts across all years, tokenize, and collect unique words.
+    Unique words of a token-id corpus (common/tokens.py), sorted.
+
+    Vocabulary ids are assigned in sorted order, so the sorted unique ids
+    of the comics' tokens give the sorted words without any string work.
     """
-    unique_words = set()
-    total_texts = sum(len(v) for v in yearly_corpus.values())
-    print(f"Scanning {total_texts} transcripts across {len(yearly_corpus)} years...")
+    return [tokens.vocab[i] for i in np.unique(tokens.ids)]
 
-    for year, texts in yearly_corpus.items():
-        for text in texts:
-            # lowercase to normalise
-            lower = text.lower()
-            for match in TOKEN_RE.findall(lower):
-                unique_words.add(match)
 
-    return unique_words
+def update_year_words(corpus, tokens, years) -> None:
+    """Rewrite the word lists of `years`, removing those of years no longer in the corpus."""
+    YEAR_WORDS_DIR.mkdir(parents=True, exist_ok=True)
+    for year in years:
+        rows = np.flatnonzero(corpus.years == int(year))
+        path = YEAR_WORDS_DIR / f"{year}.txt"
+        if len(rows) == 0:
+            path.unlink(missing_ok=True)
+            continue
+        words = extract_unique_words(tokens.subset(rows))
+        path.write_text("".join(w + "\n" for w in words), encoding="utf-8")
+        print(f"  {year}: {len(rows)} transcripts, {len(words)} unique tokens")
 
 
 def main():
-    if not YEARLY_CORPUS_PATH.exists():
-        raise SystemExit(
-            f"Error: {YEARLY_CORPUS_PATH} not found. "
-            "Run build_yearly_corpus.py first."
-        )
-
-    print(f"Loading yearly corpus from {YEARLY_CORPUS_PATH} ...")
-    yearly_corpus = load_yearly_corpus(YEARLY_CORPUS_PATH)
-
-    unique_words = extract_unique_words(yearly_corpus)
-    print(f"Found {len(unique_words)} unique tokens.")
-
-    sorted_words = sorted(unique_words)
+    parser = argparse.ArgumentParser(description="Write the raw dictionary of unique words")
+    parser.add_argument("--force", action="store_true", help="Recompute every year, even if none changed")
+    args = parser.parse_args()
+
+    corpus = load_corpus(DATASET_PATH)
+    update_yearly_corpus(corpus)
+    inputs = {"token_pattern": TOKEN_RE.pattern}
+    years = sorted(load_manifest()["years"])
+    changed = years if args.force else changed_years(STAGE_NAME, inputs)
+    # A year whose word list went missing is recomputed too
+    changed = sorted(set(changed) | {y for y in years if not (YEAR_WORDS_DIR / f"{y}.txt").exists()})
+    if not changed and RAW_DICT_PATH.exists():
+        print(f"No year changed since the last run; {RAW_DICT_PATH} is up to date.")
+        return
+    tokens = load_tokens(DATASET_PATH, corpus)
+    print(f"Collecting the words of {len(changed)} changed year(s) (pattern {TOKEN_RE.pattern})...")
+    update_year_words(corpus, tokens, changed)
+
+    words = set()
+    for year in years:
+        words.update((YEAR_WORDS_DIR / f"{year}.txt").read_text(encoding="utf-8").split())
+    sorted_words = sorted(words)
+    print(f"Found {len(sorted_words)} unique tokens.")
 
     OUT_DIR.mkdir(parents=True, exist_ok=True)
     with RAW_DICT_PATH.open("w", encoding="utf-8") as f:
         for w in sorted_words:
             f.write(w + "\n")
 
+    mark_processed(STAGE_NAME, inputs)
+
     print(f"Wrote raw dictionary to: {RAW_DICT_PATH}")
     print("Next step: open this file, fix OCR errors / junk, and save as a cleaned dictionary.")
     print("For example: unique_words_cleaned.txt")
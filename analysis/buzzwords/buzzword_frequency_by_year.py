@@ -1,74 +1,103 @@
-import json
-import re
-from collections import Counter, defaultdict
-import pandas as pd
+import argparse
+import hashlib
+import sys
+from pathlib import Path
 import matplotlib.pyplot as plt
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common.corpus import DATASET_PATH, load_corpus
+from common.tokens import load_tokens
+
+import buzzword_matcher
+import buzzword_matrix
+from buzzword_matcher import load_buzzword_matcher
+from buzzword_matrix import MATRIX_PATH, BuzzwordMatrix
+from yearly_corpus import changed_years, mark_processed, update_yearly_corpus
 
 # ------------------------------
 # Config
 # ------------------------------
-YEARLY_CORPUS_PATH = "yearly_corpus.json"
 BUZZWORDS_PATH = "buzzwords.txt"
 OUTPUT_CSV = "buzzword_counts_by_year.csv"
 OUTPUT_HEATMAP = "buzzword_heatmap.png"
 
-# ------------------------------
-# Helper Functions
-# ------------------------------
+# Name under which this stage records what it has processed (yearly_corpus.py)
+STAGE_NAME = "buzzword_frequency_by_year"
 
-def load_buzzwords(path):
-    """Load buzzwords into a lowercase set."""
-    with open(path, "r") as f:
-        words = {line.strip().lower() for line in f if line.strip()}
-    return words
+parser = argparse.ArgumentParser(description="Count buzzwords per comic and per year")
+parser.add_argument("--force", action="store_true", help="Recount every year, even if none changed")
+args = parser.parse_args()
 
-def tokenize(text):
-    """Basic word tokenizer: lowercase, remove punctuation, split on whitespace."""
-    text = text.lower()
-    text = re.sub(r"[^a-z0-9']", " ", text)  # keep letters, numbers, apostrophes
-    return text.split()
+# Buzzwords are matched with one compiled pattern (see buzzword_matcher.py),
+# so hyphenated terms ("buy-in") and phrases match, not just single tokens.
+# Counts are taken from the shared token-id corpus (common/tokens.py), kept
+# per comic in a sparse matrix (see buzzword_matrix.py) and rolled up to
+# years from there. After the first run only the years whose transcripts
+# changed are recounted, from their rows of the token cache, and spliced
+# into the saved matrix.
 
 # ------------------------------
 # Load Data
 # ------------------------------
 
-print("Loading yearly corpus...")
-with open(YEARLY_CORPUS_PATH, "r") as f:
-    yearly_corpus = json.load(f)  # { "1989": ["text...", "text..."], "1990": [...], ... }
+print(f"Loading dataset from {DATASET_PATH} ...")
+corpus = load_corpus(DATASET_PATH)
+print(f"Loaded {len(corpus)} comics.")
+
+# Only recount when a year's transcripts, the buzzword list or the counting
+# code changed
+update_yearly_corpus(corpus)
+with open(BUZZWORDS_PATH, "rb") as f:
+    inputs = {"buzzwords_sha256": hashlib.sha256(f.read()).hexdigest()}
+code_hash = hashlib.sha256()
+for module in (buzzword_matcher, buzzword_matrix):
+    code_hash.update(Path(module.__file__).read_bytes())
+inputs["code_sha256"] = code_hash.hexdigest()
+changed = changed_years(STAGE_NAME, inputs)
+outputs = [MATRIX_PATH, Path(OUTPUT_CSV), Path(OUTPUT_HEATMAP)]
+if not changed and all(p.exists() for p in outputs) and not args.force:
+    print("No year changed since the last run; buzzword counts are up to date.")
+    sys.exit(0)
+print(f"Years changed since the last run: {', '.join(changed) or 'none'}")
 
 print("Loading buzzwords...")
-buzzwords = load_buzzwords(BUZZWORDS_PATH)
+matcher = load_buzzword_matcher(BUZZWORDS_PATH)
 
-print(f"{len(buzzwords)} buzzwords loaded.")
+print(f"{len(matcher)} buzzwords loaded.")
 
 # ------------------------------
-# Count Buzzwords Per Year
+# Count Buzzwords Per Comic
 # ------------------------------
 
-yearly_counts = {}  # {year: {buzzword: count}}
-
-for year, transcripts in yearly_corpus.items():
-    print(f"Processing year {year}...")
-    word_counter = Counter()
-
-    for text in transcripts:
-        tokens = tokenize(text)
-        for token in tokens:
-            if token in buzzwords:
-                word_counter[token] += 1
-
-    yearly_counts[year] = dict(word_counter)
+previous = None
+if MATRIX_PATH.exists() and not args.force:
+    try:
+        previous = BuzzwordMatrix.load(MATRIX_PATH)
+    except ValueError as exc:
+        print(exc)
+
+tokens = load_tokens(DATASET_PATH, corpus)
+all_years = {str(year) for year in set(corpus.years.tolist())}
+if previous is None or previous.terms != matcher.terms or all_years <= set(changed):
+    print("Counting buzzwords per comic...")
+    matrix = BuzzwordMatrix.build(corpus, tokens, matcher)
+else:
+    print(f"Recounting buzzwords in {len(changed)} year(s)...")
+    rows = np.flatnonzero(np.isin(corpus.years, [int(year) for year in changed]))
+    part = BuzzwordMatrix.build(corpus.subset(rows), tokens.subset(rows), matcher)
+    matrix = previous.with_years_replaced(part, changed)
+matrix.save(MATRIX_PATH)
+print(f"Saved {matrix.counts.nnz} non-zero counts to {MATRIX_PATH}")
 
 # ------------------------------
-# Convert to DataFrame
+# Roll Up to Years
 # ------------------------------
 
-df = pd.DataFrame.from_dict(yearly_counts, orient="index")
-df = df.fillna(0).astype(int)
+df = matrix.by_year()
 
-# Sort years numerically
-df.index = df.index.astype(int)
-df = df.sort_index()
+# Only buzzwords that occur at all
+df = df.loc[:, df.sum(axis=0) > 0]
 
 # Save CSV
 df.to_csv(OUTPUT_CSV)
@@ -93,4 +122,6 @@ plt.savefig(OUTPUT_HEATMAP, dpi=300)
 print(f"Saved heatmap to {OUTPUT_HEATMAP}")
 plt.close()
 
-print("Done!")
\ No newline at end of file
+mark_processed(STAGE_NAME, inputs)
+
+print("Done!")
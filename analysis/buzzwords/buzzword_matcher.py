@@ -0,0 +1,135 @@
+"""
+Compiled multi-pattern buzzword matcher.
+
+The old per-token approach (strip everything except [a-z0-9'], split, look
+each token up in a set) could never match hyphenated entries such as
+"buy-in" or "cross-platform", nor multi-word phrases, and ran a Python loop
+per token.
+
+BuzzwordMatcher compiles the whole buzzword list into ONE regular
+expression, shaped as a character trie so that terms sharing a prefix
+share regex states (leverage / leveraging / leveraged, cross-platform /
+cross-selling, ...). Each transcript is then scanned once with finditer.
+
+Matching rules:
+  - case-insensitive (text is lowercased before scanning)
+  - word boundaries: a match may not be preceded or followed by
+    [a-z0-9'], the same word characters the old tokenizer kept
+  - a hyphen in a term matches "-" (or an en dash / other hyphen variant)
+    with optional whitespace around it, e.g. "BUY-IN", "BUY - IN"
+  - a space in a term matches any run of whitespace, including the
+    newlines between panels
+  - the longest term wins at each position, and matches don't overlap:
+    "cross-platform" is one hit for "cross-platform", not also "platform"
+"""
+
+import re
+from collections import Counter
+
+
+# Characters that count as part of a word (same set the old tokenizer kept)
+WORD_CHARS = "a-z0-9'"
+
+# Hyphen-like characters OCR'd transcripts use inside compounds
+HYPHENS = "\\-\u2010\u2011\u2012\u2013"
+
+_HYPHEN = object()
+_SPACE = object()
+
+_SEPARATOR_RE = re.compile(rf"\s*[{HYPHENS}]\s*|\s+")
+
+
+def canonical_term(term: str) -> str:
+    """Lowercase, single spaces between words, bare "-" between compound parts."""
+    term = term.strip().lower()
+    return _SEPARATOR_RE.sub(lambda m: "-" if m.group().strip() else " ", term)
+
+
+def _units(term: str) -> list:
+    """Split a canonical term into characters and separator markers."""
+    units = []
+    for char in term:
+        if char == "-":
+            units.append(_HYPHEN)
+        elif char == " ":
+            units.append(_SPACE)
+        else:
+            units.append(char)
+    return units
+
+
+def _unit_pattern(unit) -> str:
+    if unit is _HYPHEN:
+        return rf"\s*[{HYPHENS}]\s*"
+    if unit is _SPACE:
+        return r"\s+"
+    return re.escape(unit)
+
+
+def _trie_pattern(node: dict) -> str:
+    """
+    Turn a trie ({unit: child, None: True for end-of-term}) into a regex.
+
+    Where a term ends inside a longer one, the continuation is a greedy
+    optional group, so the longer term is tried first and the trailing
+    boundary check backtracks to the shorter one if needed.
+    """
+    branches = [
+        _unit_pattern(unit) + _trie_pattern(child)
+        for unit, child in node.items()
+        if unit is not None
+    ]
+    if not branches:
+        return ""
+
+    body = branches[0] if len(branches) == 1 else "|".join(branches)
+    if None in node:
+        return f"(?:{body})?"
+    return body if len(branches) == 1 else f"(?:{body})"
+
+
+class BuzzwordMatcher:
+    """
+    Match a fixed list of buzzwords / phrases against transcripts.
+
+        matcher = BuzzwordMatcher(["synergy", "buy-in", "paradigm shift"])
+        matcher.count("We need BUY-IN on the paradigm\\nshift.")
+        # Counter({'buy-in': 1, 'paradigm shift': 1})
+    """
+
+    def __init__(self, terms):
+        self.terms = list(dict.fromkeys(canonical_term(t) for t in terms if t.strip()))
+        self.index = {term: i for i, term in enumerate(self.terms)}
+
+        trie = {}
+        for term in self.terms:
+            node = trie
+            for unit in _units(term):
+                node = node.setdefault(unit, {})
+            node[None] = True
+
+        if self.terms:
+            body = _trie_pattern(trie)
+            self.pattern = re.compile(rf"(?<![{WORD_CHARS}])(?:{body})(?![{WORD_CHARS}])")
+        else:
+            self.pattern = None
+
+    def __len__(self):
+        return len(self.terms)
+
+    def finditer(self, text: str):
+        """Yield the canonical term for every match in `text`, left to right."""
+        if self.pattern is None:
+            return
+        for match in self.pattern.finditer(text.lower()):
+            yield canonical_term(match.group())
+
+    def count(self, text: str) -> Counter:
+        """Counter of term -> occurrences in one transcript."""
+        return Counter(self.finditer(text))
+
+
+def load_buzzword_matcher(path) -> BuzzwordMatcher:
+    """Build a matcher from a buzzword file (one term or phrase per line)."""
+    with open(path, "r", encoding="utf-8") as f:
+        return BuzzwordMatcher(line for line in f if line.strip())
@@ -0,0 +1,295 @@
+"""
+Sparse per-comic buzzword counts.
+
+Instead of one Counter per year, buzzword_frequency_by_year.py now keeps a
+comics x terms CSR matrix (scipy.sparse) with the number of times each
+buzzword occurs in each comic, next to the comic dates and years. It is
+built from the pre-tokenized corpus (common/tokens.py) without rescanning
+any transcript text. Every
+roll-up is a sparse matrix product with an indicator matrix:
+
+    by_year  = Y @ X      Y: years x comics, 1 where the comic is from that year
+    by_month = M @ X      M: months x comics
+
+so per-comic detail is never thrown away and nothing is re-tokenized to
+answer a new question. The matrix is saved as a single compressed .npz
+(CSR arrays, terms, dates, years) that the plot script loads directly.
+
+Query it from the command line:
+
+    python buzzword_matrix.py synergy --year 1997
+"""
+
+import argparse
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from buzzword_matcher import HYPHENS, WORD_CHARS, canonical_term
+
+
+MATRIX_PATH = Path(__file__).parent / "buzzword_matrix.npz"
+
+MATRIX_FORMAT_VERSION = 1
+
+
+# Hyphen variants TOKEN_RE does not keep inside a token
+_DROPPED_HYPHENS = HYPHENS.replace("\\-", "")
+
+
+def _token_sequences(term: str) -> list[tuple[list[str], re.Pattern]]:
+    """
+    Token sequences (under common.tokens.TOKEN_RE) that spell a term across
+    more than one token: the words of a phrase, or a compound broken after
+    its hyphen, as at a panel line break ("team-\nbuilding").
+
+    A compound whose hyphen stands on its own ("customer - focused") or is
+    an en dash loses the hyphen to the tokenizer, leaving just the two
+    words. The same words also occur without any hyphen ("customer
+    service"), which the matcher does not count, so that sequence comes
+    with a pattern for the text of the comic to confirm the hyphen was
+    there; the other sequences carry None.
+    """
+    if " " in term:
+        return [(term.split(" "), None)]
+    sequences = []
+    for i, char in enumerate(term):
+        if char != "-":
+            continue
+        left, right = term[:i], term[i + 1:]
+        sequences.append(([term[:i + 1], right], None))
+        pattern = re.compile(
+            rf"(?<![{WORD_CHARS}]){re.escape(left)}"
+            rf"(?:\s+[{HYPHENS}]|[{_DROPPED_HYPHENS}])\s*"
+            rf"{re.escape(right)}(?![{WORD_CHARS}])"
+        )
+        sequences.append(([left, right], pattern))
+    return sequences
+
+
+def _confirmed(corpus, comic: np.ndarray, starts: np.ndarray, pattern: re.Pattern) -> np.ndarray:
+    """
+    Keep, in each comic, only as many of the n-gram `starts` as `pattern`
+    finds in its text. Only the few comics holding the n-gram are read.
+    """
+    keep = np.zeros(len(starts), dtype=bool)
+    rows = comic[starts]
+    for row in np.unique(rows):
+        hits = len(pattern.findall(corpus.text(int(row)).lower()))
+        keep[np.flatnonzero(rows == row)[:hits]] = True
+    return starts[keep]
+
+
+def _indicator(labels) -> tuple[sparse.csr_matrix, np.ndarray]:
+    """Groups x comics 0/1 matrix for a label per comic, plus the sorted group labels."""
+    groups, inverse = np.unique(np.asarray(labels), return_inverse=True)
+    n = len(inverse)
+    matrix = sparse.csr_matrix(
+        (np.ones(n, dtype=np.int32), (inverse.ravel(), np.arange(n))),
+        shape=(len(groups), n),
+    )
+    return matrix, groups
+
+
+class BuzzwordMatrix:
+    """
+    Buzzword counts per comic.
+
+    Attributes:
+      - counts: int32 CSR matrix, comics x terms
+      - terms:  canonical buzzword per column
+      - dates:  b"YYYY-MM-DD" (S10) per row
+      - years:  int16 per row
+    """
+
+    def __init__(self, counts, terms, dates, years):
+        self.counts = sparse.csr_matrix(counts, dtype=np.int32)
+        self.terms = list(terms)
+        self.dates = np.asarray(dates, dtype="S10")
+        self.years = np.asarray(years, dtype=np.int16)
+        self.term_index = {term: i for i, term in enumerate(self.terms)}
+
+    @classmethod
+    def build(cls, corpus, tokens, matcher) -> "BuzzwordMatrix":
+        """
+        Count buzzwords per comic from the token-id corpus (common.tokens).
+
+        Single-token matches are worked out once per vocabulary entry with
+        the BuzzwordMatcher ("win-wins" -> win, "cross-platform" ->
+        cross-platform), giving a vocab x terms matrix V, so per-comic counts
+        are C @ V with C the comics x vocab token counts. Terms spread over
+        several tokens (phrases, compounds split after the hyphen) are
+        matched as token n-grams, longest first, and the tokens they cover
+        are left out of C. A compound whose standalone hyphen the tokenizer
+        dropped is only counted where the comic's text shows the hyphen.
+        """
+        n_vocab, n_terms = len(tokens.vocab), len(matcher.terms)
+
+        rows, cols, data = [], [], []
+        for token_id, token in enumerate(tokens.vocab):
+            for term, count in matcher.count(token).items():
+                rows.append(token_id)
+                cols.append(matcher.index[term])
+                data.append(count)
+        vocab_terms = sparse.csr_matrix((data, (rows, cols)), shape=(n_vocab, n_terms), dtype=np.int32)
+
+        comic = tokens.comic_of_token()
+        ids = np.asarray(tokens.ids)
+        covered = np.zeros(len(ids), dtype=bool)
+        ngram_rows, ngram_cols = [], []
+        sequences = [
+            (term, parts, pattern)
+            for term in matcher.terms
+            for parts, pattern in _token_sequences(term)
+        ]
+        sequences.sort(key=lambda item: (-len(item[1]), -len(item[0])))
+        for term, parts, pattern in sequences:
+            starts = tokens.ngram_starts(parts)
+            if pattern is not None and len(starts):
+                starts = _confirmed(corpus, comic, starts, pattern)
+            # Skip matches overlapping a longer one
+            free = np.ones(len(starts), dtype=bool)
+            for k in range(len(parts)):
+                free &= ~covered[starts + k]
+            starts = starts[free]
+            for k in range(len(parts)):
+                covered[starts + k] = True
+            ngram_rows.append(comic[starts])
+            ngram_cols.append(np.full(len(starts), matcher.index[term]))
+
+        free = ~covered
+        comic_vocab = sparse.csr_matrix(
+            (np.ones(int(free.sum()), dtype=np.int32), (comic[free], ids[free])),
+            shape=(len(corpus), n_vocab),
+        )
+        counts = comic_vocab @ vocab_terms
+        if ngram_rows:
+            ngram_rows = np.concatenate(ngram_rows)
+            counts = counts + sparse.csr_matrix(
+                (np.ones(len(ngram_rows), dtype=np.int32), (ngram_rows, np.concatenate(ngram_cols))),
+                shape=counts.shape,
+            )
+        counts.eliminate_zeros()
+        counts.sort_indices()
+        return cls(counts, matcher.terms, corpus.dates, corpus.years)
+
+    def with_years_replaced(self, part: "BuzzwordMatrix", years) -> "BuzzwordMatrix":
+        """
+        This matrix with the rows of `years` swapped for `part` (built over
+        just those years' comics), rows back in date order. A year in
+        `years` that `part` has no comics for is dropped.
+        """
+        if part.terms != self.terms:
+            raise ValueError("cannot splice matrices with different terms")
+        keep = ~np.isin(self.years, np.asarray([int(year) for year in years], dtype=np.int16))
+        dates = np.concatenate([self.dates[keep], part.dates])
+        order = np.argsort(dates, kind="stable")
+        counts = sparse.vstack([self.counts[keep], part.counts], format="csr")[order]
+        counts.sort_indices()
+        row_years = np.concatenate([self.years[keep], part.years])
+        return BuzzwordMatrix(counts, self.terms, dates[order], row_years[order])
+
+    # ------------------------------
+    # Persistence
+    # ------------------------------
+
+    def save(self, path: Path = MATRIX_PATH):
+        np.savez_compressed(
+            path,
+            format_version=np.int32(MATRIX_FORMAT_VERSION),
+            data=self.counts.data,
+            indices=self.counts.indices,
+            indptr=self.counts.indptr,
+            shape=np.array(self.counts.shape, dtype=np.int64),
+            terms=np.array(self.terms, dtype=str),
+            dates=self.dates,
+            years=self.years,
+        )
+
+    @classmethod
+    def load(cls, path: Path = MATRIX_PATH) -> "BuzzwordMatrix":
+        with np.load(path) as f:
+            if int(f["format_version"]) != MATRIX_FORMAT_VERSION:
+                raise ValueError(f"{path} was written by a different version; rebuild it")
+            counts = sparse.csr_matrix(
+                (f["data"], f["indices"], f["indptr"]), shape=tuple(f["shape"])
+            )
+            return cls(counts, f["terms"].tolist(), f["dates"], f["years"])
+
+    # ------------------------------
+    # Roll-ups
+    # ------------------------------
+
+    def _rollup(self, labels, index_name: str) -> pd.DataFrame:
+        indicator, groups = _indicator(labels)
+        table = (indicator @ self.counts).toarray()
+        return pd.DataFrame(
+            table, index=pd.Index(groups, name=index_name), columns=self.terms
+        )
+
+    def by_year(self) -> pd.DataFrame:
+        """Years x terms counts."""
+        return self._rollup(self.years.astype(int), "year")
+
+    def by_month(self) -> pd.DataFrame:
+        """Months ("YYYY-MM") x terms counts."""
+        return self._rollup(self.dates.astype("S7").astype(str), "month")
+
+    def comics_per_year(self) -> pd.Series:
+        years, counts = np.unique(self.years.astype(int), return_counts=True)
+        return pd.Series(counts, index=pd.Index(years, name="year"))
+
+    def rates_by_year(self, per: int = 1000) -> pd.DataFrame:
+        """Mentions per `per` comics, so sparse and busy years compare fairly."""
+        table = self.by_year()
+        return table.div(self.comics_per_year(), axis=0) * per
+
+    def totals(self) -> pd.Series:
+        """Total mentions of each term, most frequent first."""
+        totals = np.asarray(self.counts.sum(axis=0)).ravel()
+        return pd.Series(totals, index=self.terms).sort_values(ascending=False, kind="stable")
+
+    def top_terms(self, n: int = 20) -> list[str]:
+        return self.totals().head(n).index.tolist()
+
+    # ------------------------------
+    # Lookups
+    # ------------------------------
+
+    def comics_using(self, term: str, year: int = None) -> pd.Series:
+        """Dates of the comics that use `term` (optionally in one year), with their counts."""
+        column = self.counts[:, self.term_index[term]]
+        rows = column.nonzero()[0]
+        if year is not None:
+            rows = rows[self.years[rows] == year]
+        return pd.Series(
+            column[rows].toarray().ravel(),
+            index=pd.Index(self.dates[rows].astype(str), name="date"),
+            name=term,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Which comics use a buzzword")
+    parser.add_argument("term", help="Buzzword as listed in buzzwords.txt")
+    parser.add_argument("--year", type=int, help="Only comics from this year")
+    parser.add_argument("--matrix", type=Path, default=MATRIX_PATH)
+    args = parser.parse_args()
+
+    matrix = BuzzwordMatrix.load(args.matrix)
+    term = canonical_term(args.term)
+    if term not in matrix.term_index:
+        parser.error(f"'{args.term}' is not in the buzzword list")
+
+    hits = matrix.comics_using(term, args.year)
+    where = f" in {args.year}" if args.year is not None else ""
+    print(f"{len(hits)} comics use '{term}'{where}:")
+    for date, count in hits.items():
+        print(f"  {date}  x{count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,25 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
 
+from buzzword_matrix import MATRIX_PATH, BuzzwordMatrix
+
 # -------------------------------------------------------------------
 # CONFIG
 # -------------------------------------------------------------------
-INPUT_CSV = "buzzword_counts_by_year.csv"
 OUTPUT_PNG = "buzzword_heatmap_top20.png"
 TOP_N = 20
 FIGSIZE = (14, 10)
 
 # -------------------------------------------------------------------
-# LOAD AND FIX DATA
+# LOAD DATA
 # -------------------------------------------------------------------
-df = pd.read_csv(INPUT_CSV)
-
-# Rename first column to "year"
-df = df.rename(columns={"Unnamed: 0": "year"})
-
-# Set year as index
-df = df.set_index("year")
+# Per-comic counts written by buzzword_frequency_by_year.py
+counts = BuzzwordMatrix.load(MATRIX_PATH)
 
 # -------------------------------------------------------------------
 # FIND TOP 20 BUZZWORDS OVERALL
 # -------------------------------------------------------------------
-# Sum each buzzword column
-total_counts = df.sum(axis=0).sort_values(ascending=False)
-
-top_words = total_counts.head(TOP_N).index.tolist()
+top_words = counts.top_terms(TOP_N)
 
 print(f"Top {TOP_N} buzzwords:")
 for w in top_words:
@@ -36,7 +28,7 @@ for w in top_words:
 # -------------------------------------------------------------------
 # SUBSET MATRIX TO TOP 20 COLUMNS
 # -------------------------------------------------------------------
-matrix = df[top_words]
+matrix = counts.by_year()[top_words]
 
 # -------------------------------------------------------------------
 # PLOT HEATMAP
@@ -0,0 +1,139 @@
+"""
+Incremental per-year transcript corpus.
+
+build_yearly_corpus.py used to re-serialize every transcript into one
+indented yearly_corpus.json on each run. The corpus is now one compact JSON
+file per year plus a small manifest:
+
+    yearly_corpus/
+        manifest.json     format version, generation counter, and per year:
+                          file name, sha256 of the file, comic count and the
+                          generation in which the year last changed
+        1989.json         {"1989-04-16": "transcript", ...}, dates sorted
+        ...
+        consumers.json    per downstream stage: the year hashes (and other
+                          input fingerprints) it last processed
+        words/1989.txt    unique words per year, kept by build_dictionary.py
+
+A year's file is only rewritten when its content hash changes, so fixing a
+typo in one 2004 transcript rewrites 2004.json and nothing else.
+
+Downstream stages call changed_years(name) to learn which years differ
+from what they processed last, redo just those years' rows (taken from the
+shared token cache, common/tokens.py) and call mark_processed(name) once
+done.
+"""
+
+import hashlib
+import json
+import os
+from collections import defaultdict
+from pathlib import Path
+
+
+YEARLY_CORPUS_DIR = Path(__file__).parent / "yearly_corpus"
+
+MANIFEST_VERSION = 1
+
+
+def _year_bytes(entries: dict) -> bytes:
+    """Canonical file content for one year: compact JSON, dates sorted."""
+    return json.dumps(dict(sorted(entries.items())), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _write_atomic(path: Path, data: bytes):
+    # Per-process name, so two stages writing the same file never share a tmp file
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: Path, default):
+    if not path.exists():
+        return default
+    with path.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_manifest(corpus_dir: Path = YEARLY_CORPUS_DIR) -> dict:
+    manifest = _read_json(corpus_dir / "manifest.json", None)
+    if manifest is None or manifest.get("version") != MANIFEST_VERSION:
+        return {"version": MANIFEST_VERSION, "generation": 0, "years": {}}
+    return manifest
+
+
+def update_yearly_corpus(corpus, corpus_dir: Path = YEARLY_CORPUS_DIR, full: bool = False) -> list[str]:
+    """
+    Bring the per-year files in line with a common.corpus.Corpus.
+
+    Years whose content hash is unchanged (and whose file is intact) are
+    left alone; `full=True` rewrites every year. Returns the years that
+    were written or removed.
+    """
+    by_year = defaultdict(dict)
+    for i, year in enumerate(corpus.years.tolist()):
+        by_year[str(year)][corpus.date(i)] = corpus.text(i)
+
+    corpus_dir.mkdir(parents=True, exist_ok=True)
+    manifest = load_manifest(corpus_dir)
+    generation = manifest["generation"] + 1
+    old_years = manifest["years"]
+    new_years = {}
+    changed = []
+
+    for year in sorted(by_year):
+        data = _year_bytes(by_year[year])
+        digest = hashlib.sha256(data).hexdigest()
+        entry = old_years.get(year)
+        path = corpus_dir / f"{year}.json"
+        if not full and entry is not None and entry["sha256"] == digest and path.exists():
+            new_years[year] = entry
+            continue
+
+        _write_atomic(path, data)
+        new_years[year] = {
+            "file": path.name,
+            "sha256": digest,
+            "comics": len(by_year[year]),
+            "generation": generation,
+        }
+        changed.append(year)
+
+    for year in sorted(set(old_years) - set(new_years)):
+        (corpus_dir / old_years[year]["file"]).unlink(missing_ok=True)
+        changed.append(year)
+
+    if changed or not (corpus_dir / "manifest.json").exists():
+        manifest = {"version": MANIFEST_VERSION, "generation": generation, "years": new_years}
+        _write_atomic(corpus_dir / "manifest.json", json.dumps(manifest, indent=2).encode("utf-8"))
+
+    return sorted(changed)
+
+
+def changed_years(consumer: str, inputs: dict = None, corpus_dir: Path = YEARLY_CORPUS_DIR) -> list[str]:
+    """
+    Years added, changed or removed since `consumer` last called
+    mark_processed(). If its other `inputs` fingerprints differ from last
+    time (e.g. the buzzword list was edited), every year counts as changed.
+    """
+    current = load_manifest(corpus_dir)["years"]
+    seen = _read_json(corpus_dir / "consumers.json", {}).get(consumer)
+    if seen is None or seen.get("inputs") != (inputs or {}):
+        return sorted(set(current) | set(seen["years"] if seen else {}))
+
+    seen_years = seen["years"]
+    return sorted(
+        year
+        for year in set(current) | set(seen_years)
+        if current.get(year, {}).get("sha256") != seen_years.get(year)
+    )
+
+
+def mark_processed(consumer: str, inputs: dict = None, corpus_dir: Path = YEARLY_CORPUS_DIR):
+    """Record that `consumer` is up to date with the current corpus and inputs."""
+    consumers = _read_json(corpus_dir / "consumers.json", {})
+    consumers[consumer] = {
+        "years": {year: entry["sha256"] for year, entry in load_manifest(corpus_dir)["years"].items()},
+        "inputs": inputs or {},
+    }
+    _write_atomic(corpus_dir / "consumers.json", json.dumps(consumers, indent=2).encode("utf-8"))
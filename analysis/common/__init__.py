@@ -0,0 +1,9 @@
+"""
+Shared helpers for the analysis scripts.
+
+The scripts in analysis/* are run directly (e.g. `python emotions_sarcasm.py`),
+so each one puts the `analysis/` directory on sys.path and imports from here:
+
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from common.corpus import load_dataset
+"""
@@ -0,0 +1,99 @@
+"""
+Online yearly accumulators for streaming aggregation.
+
+The analysis scripts aggregate with df.groupby("year") over a frame that
+holds every comic. In streaming mode each scored chunk is folded into one
+of these instead, and then dropped, so memory depends on the number of
+years rather than the number of comics.
+
+  YearlyMoments  per-year count, mean and variance of numeric columns
+                 (Chan et al. parallel update, numerically stable)
+  YearlyCounts   per-year label counts and proportions
+"""
+
+from collections import Counter, defaultdict
+
+import numpy as np
+import pandas as pd
+
+
+class YearlyMoments:
+    """Running count / mean / variance per year for a fixed set of columns."""
+
+    def __init__(self, columns: list[str]):
+        self.columns = list(columns)
+        # year -> [count, mean (array), sum of squared deviations (array)]
+        self._stats = {}
+
+    def update(self, years, values):
+        """Fold in one chunk: `values` maps each column to one value per comic."""
+        years = np.asarray(years)
+        matrix = np.column_stack([np.asarray(values[c], dtype=np.float64) for c in self.columns])
+
+        for year in np.unique(years):
+            block = matrix[years == year]
+            n_b = len(block)
+            mean_b = block.mean(axis=0)
+            m2_b = ((block - mean_b) ** 2).sum(axis=0)
+
+            key = int(year)
+            if key not in self._stats:
+                self._stats[key] = [n_b, mean_b, m2_b]
+                continue
+
+            n_a, mean_a, m2_a = self._stats[key]
+            n = n_a + n_b
+            delta = mean_b - mean_a
+            self._stats[key] = [
+                n,
+                mean_a + delta * n_b / n,
+                m2_a + m2_b + delta ** 2 * n_a * n_b / n,
+            ]
+
+    def counts(self) -> pd.Series:
+        years = sorted(self._stats)
+        return pd.Series([self._stats[y][0] for y in years], index=pd.Index(years, name="year"))
+
+    def means(self) -> pd.DataFrame:
+        years = sorted(self._stats)
+        return pd.DataFrame(
+            [self._stats[y][1] for y in years],
+            index=pd.Index(years, name="year"),
+            columns=self.columns,
+        )
+
+    def stds(self, ddof: int = 1) -> pd.DataFrame:
+        """Standard deviations (ddof=1 like pandas); NaN for years with too few comics."""
+        years = sorted(self._stats)
+        rows = []
+        for y in years:
+            n, _, m2 = self._stats[y]
+            rows.append(np.sqrt(m2 / (n - ddof)) if n > ddof else np.full(len(self.columns), np.nan))
+        return pd.DataFrame(rows, index=pd.Index(years, name="year"), columns=self.columns)
+
+
+class YearlyCounts:
+    """Running label counts per year."""
+
+    def __init__(self):
+        self._counts = defaultdict(Counter)
+
+    def update(self, years, labels):
+        for year, label in zip(years, labels):
+            self._counts[int(year)][label] += 1
+
+    def counts(self, label_name: str = None) -> pd.DataFrame:
+        """Years x labels table of counts (0 where a label never occurred)."""
+        years = sorted(self._counts)
+        labels = sorted({label for counter in self._counts.values() for label in counter})
+        return pd.DataFrame(
+            [[self._counts[y][label] for label in labels] for y in years],
+            index=pd.Index(years, name="year"),
+            columns=pd.Index(labels, name=label_name),
+            dtype=np.int64,
+        )
+
+    def proportions(self, label_name: str = None) -> pd.DataFrame:
+        """Counts divided by each year's total."""
+        table = self.counts(label_name)
+        return table.div(table.sum(axis=1), axis=0)
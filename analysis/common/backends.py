@@ -0,0 +1,239 @@
+"""
+Pluggable CPU inference backends for the Hugging Face pipelines.
+
+Every scoring script builds an ordinary eager PyTorch pipeline and then
+hands it to apply_backend(), which swaps the model underneath it:
+
+  fp32       eager PyTorch, unchanged (the reference)
+  int8       torch dynamic int8 quantization of every nn.Linear
+  onnx       the model exported to ONNX and run with ONNX Runtime
+  onnx-int8  the ONNX graph with int8 dynamically quantized weights
+
+Tokenization, batching, post-processing and caching all stay in the
+pipeline, so results come back in exactly the same format.
+
+Exported graphs are cached under analysis/.cache/backends/<model>-<revision>/
+and only rebuilt when the model revision (or the torch / ONNX Runtime
+version) changes. Dynamic int8 quantization in torch takes about a second
+at load time, so it is recomputed rather than stored.
+
+ONNX Runtime is an optional dependency (pip install onnx onnxruntime); it is
+only imported when an onnx backend is requested.
+
+Non-fp32 backends are recorded in the inference cache key and in the
+per-comic score metadata, so their results never mix with fp32 ones. Use
+analysis/compare_backends.py to check a backend against fp32 first.
+"""
+
+import json
+import os
+import re
+from pathlib import Path
+
+from .inference_cache import CACHE_DIR
+
+
+BACKENDS = ("fp32", "int8", "onnx", "onnx-int8")
+DEFAULT_BACKEND = "fp32"
+
+BACKEND_DIR = CACHE_DIR / "backends"
+
+ONNX_OPSET = 17
+
+
+def backend_options(options: dict, backend: str = DEFAULT_BACKEND) -> dict:
+    """
+    Call options plus the backend, for cache keys and score metadata.
+
+    fp32 returns `options` unchanged so existing cache entries and score
+    tables stay valid.
+    """
+    if backend == DEFAULT_BACKEND:
+        return options
+    return {**options, "backend": backend}
+
+
+def artifact_dir(model) -> Path:
+    """Cache directory for one model revision's exported graphs."""
+    model_id = getattr(model, "name_or_path", None) or type(model).__name__
+    revision = getattr(model.config, "_commit_hash", None) or "unknown"
+    slug = re.sub(r"[^A-Za-z0-9_.-]+", "--", str(model_id)).strip("-")
+    return BACKEND_DIR / f"{slug}-{revision[:12]}"
+
+
+def apply_backend(classifier, backend: str = DEFAULT_BACKEND):
+    """
+    Switch a pipeline's model to `backend` in place and return the pipeline.
+
+    Quantized and ONNX backends run on the CPU, whatever device the
+    pipeline was built for.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}'. Choose from: {', '.join(BACKENDS)}")
+
+    classifier.inference_backend = backend
+    if backend == DEFAULT_BACKEND:
+        return classifier
+
+    import torch
+
+    model = classifier.model.to("cpu").eval()
+    classifier.device = torch.device("cpu")
+
+    if backend == "int8":
+        quantized = torch.ao.quantization.quantize_dynamic(
+            model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+        # Keep the attributes the cache keys read
+        quantized.name_or_path = model.name_or_path
+        classifier.model = quantized
+    else:
+        path = export_onnx(model, classifier.tokenizer, quantize=(backend == "onnx-int8"))
+        classifier.model = OnnxSequenceClassifier(path, model.config, model.name_or_path)
+
+    print(f"Using {backend} backend")
+    return classifier
+
+
+def set_inference_threads(classifier, threads: int):
+    """
+    Run `classifier` with `threads` intra-op threads. torch applies
+    torch.set_num_threads() on the next call, but an ONNX backend's session
+    has to be rebuilt to change it.
+    """
+    import torch
+
+    torch.set_num_threads(threads)
+    if isinstance(classifier.model, OnnxSequenceClassifier):
+        classifier.model.set_threads(threads)
+
+
+def export_onnx(model, tokenizer, quantize: bool = False) -> Path:
+    """
+    Export `model` to ONNX (and optionally int8-quantize it), reusing a
+    previous export when it was made by the same library versions.
+    """
+    import onnxruntime
+    import torch
+
+    out_dir = artifact_dir(model)
+    fp32_path = out_dir / "model.onnx"
+    int8_path = out_dir / "model.int8.onnx"
+    meta_path = out_dir / "meta.json"
+
+    meta = {
+        "model": str(getattr(model, "name_or_path", "")),
+        "torch": torch.__version__,
+        "onnxruntime": onnxruntime.__version__,
+        "opset": ONNX_OPSET,
+    }
+    if meta_path.exists():
+        with meta_path.open("r", encoding="utf-8") as f:
+            if json.load(f) != meta:
+                fp32_path.unlink(missing_ok=True)
+                int8_path.unlink(missing_ok=True)
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    if not fp32_path.exists():
+        print(f"Exporting {meta['model']} to ONNX (one-off, cached in {out_dir})...")
+        sample = tokenizer(
+            ["An example transcript.", "Dilbert: A slightly longer example transcript."],
+            ["This example is short.", "This example is long."],
+            padding=True,
+            return_tensors="pt",
+        )
+        input_names = [name for name in tokenizer.model_input_names if name in sample]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["logits"] = {0: "batch"}
+
+        # Per-process temp names: sharded workers may export concurrently
+        tmp_path = fp32_path.with_suffix(f".{os.getpid()}.tmp")
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                ({name: sample[name] for name in input_names},),
+                str(tmp_path),
+                input_names=input_names,
+                output_names=["logits"],
+                dynamic_axes=dynamic_axes,
+                opset_version=ONNX_OPSET,
+                dynamo=False,
+            )
+        os.replace(tmp_path, fp32_path)
+        int8_path.unlink(missing_ok=True)
+
+    if quantize and not int8_path.exists():
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        print(f"Quantizing ONNX graph to int8 (cached in {out_dir})...")
+        tmp_path = int8_path.with_suffix(f".{os.getpid()}.tmp")
+        quantize_dynamic(str(fp32_path), str(tmp_path), weight_type=QuantType.QInt8)
+        os.replace(tmp_path, int8_path)
+
+    tmp_meta = meta_path.with_suffix(f".{os.getpid()}.tmp")
+    with tmp_meta.open("w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_meta, meta_path)
+
+    return int8_path if quantize else fp32_path
+
+
+class OnnxSequenceClassifier:
+    """
+    Stand-in for a *ForSequenceClassification model backed by an ONNX
+    Runtime session.
+
+    It provides what the pipelines and score_pairs() use: calling it with
+    tokenizer outputs returns an object with `.logits`, plus `config`,
+    `name_or_path` and `device`.
+    """
+
+    def __init__(self, path: Path, config, name_or_path: str, threads: int = None):
+        import torch
+
+        self.path = Path(path)
+        # Follow torch's thread budget (pinned per worker by common/sharding.py)
+        self.threads = None
+        self.set_threads(threads or torch.get_num_threads())
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.config = config
+        self.name_or_path = name_or_path
+        self.device = torch.device("cpu")
+        self.dtype = torch.float32
+
+    def set_threads(self, threads: int):
+        """
+        Use `threads` intra-op threads. A session fixes its thread count
+        when it is created, so a different count means a new session.
+        """
+        import onnxruntime
+
+        if threads == self.threads:
+            return
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(
+            str(self.path), options, providers=["CPUExecutionProvider"]
+        )
+        self.threads = threads
+
+    def to(self, *args, **kwargs):
+        return self
+
+    def eval(self):
+        return self
+
+    def forward(self, **inputs):
+        import torch
+        from transformers.modeling_outputs import SequenceClassifierOutput
+
+        feed = {
+            name: inputs[name].detach().cpu().numpy().astype("int64")
+            for name in self.input_names
+            if name in inputs
+        }
+        (logits,) = self.session.run(["logits"], feed)
+        return SequenceClassifierOutput(logits=torch.from_numpy(logits))
+
+    __call__ = forward
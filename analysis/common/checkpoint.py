@@ -0,0 +1,237 @@
+"""
+Checkpointed, resumable scoring with append-only result shards.
+
+A long scoring run (the DeBERTa-large zero-shot model takes hours on a CPU)
+used to keep every result in memory until the very end. Now finished
+comics are flushed to disk every `shard_size` comics as the scorer reports
+them (per length-bucketed batch in process, per worker shard on a pool):
+
+    analysis/.cache/checkpoints/<run name>/
+        manifest.json        options, shard size and one entry per shard:
+                             file name, sha256, comic count, comic dates
+        shard-00000.jsonl    {"date", "text_sha256", "result"} per line
+        shard-00001.jsonl
+        ...
+
+Shards are written to a temp file and renamed, then the manifest is
+replaced atomically, so a crash leaves at worst one orphan shard that is
+ignored. With resume=True the manifest is re-read, every shard's sha256
+and line count are verified (corrupt shards are dropped and re-scored),
+and comics whose date and transcript hash are already recorded are
+skipped. Without it the run starts from scratch.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+from .inference_cache import CACHE_DIR, text_sha256
+
+
+CHECKPOINT_DIR = CACHE_DIR / "checkpoints"
+
+# Comics per shard: small enough that a crash loses only a minute or two
+# of the slowest model, large enough to keep the file count modest. Only
+# how often results are written; the scorer still sees the whole input
+DEFAULT_SHARD_SIZE = 128
+
+MANIFEST_VERSION = 1
+
+
+def _bytes_sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class ScoringCheckpoint:
+    """
+    On-disk record of one scoring run's finished comics.
+
+    `name` identifies the run (e.g. "sarcasm"); `options` are the model's
+    call options (plus backend), and a resumed run only reuses shards that
+    were written with the same options.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        options: dict,
+        resume: bool = False,
+        shard_size: int = DEFAULT_SHARD_SIZE,
+        root: Path = CHECKPOINT_DIR,
+    ):
+        self.name = name
+        self.options = json.loads(json.dumps(options, sort_keys=True))
+        self.shard_size = shard_size
+        self.dir = Path(root) / name
+        self.manifest_path = self.dir / "manifest.json"
+        self.shards = []
+        # date -> (text_sha256, result) for every comic in a verified shard
+        self.completed = {}
+
+        if resume:
+            self._load()
+        else:
+            shutil.rmtree(self.dir, ignore_errors=True)
+        self.dir.mkdir(parents=True, exist_ok=True)
+
+    def _load(self):
+        """Read the manifest and keep only shards that pass verification."""
+        if not self.manifest_path.exists():
+            print(f"No checkpoint to resume in {self.dir}, starting from scratch")
+            return
+
+        with self.manifest_path.open("r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") != MANIFEST_VERSION or manifest.get("options") != self.options:
+            print(f"Checkpoint in {self.dir} was written with different options, starting from scratch")
+            shutil.rmtree(self.dir, ignore_errors=True)
+            return
+
+        dropped = 0
+        for shard in manifest.get("shards", []):
+            records = self._verify(shard)
+            if records is None:
+                dropped += 1
+                (self.dir / shard["file"]).unlink(missing_ok=True)
+                continue
+            self.shards.append(shard)
+            for record in records:
+                self.completed[record["date"]] = (record["text_sha256"], record["result"])
+
+        # Shards written after the last manifest update (crash in between)
+        known = {shard["file"] for shard in self.shards}
+        for path in self.dir.glob("shard-*"):
+            if path.name not in known:
+                path.unlink()
+
+        if dropped:
+            print(f"Dropped {dropped} corrupt checkpoint shard(s); their comics will be re-scored")
+        self._write_manifest()
+        print(f"Resuming from {len(self.shards)} shard(s), {len(self.completed)} comics done ({self.dir})")
+
+    def _verify(self, shard: dict):
+        """Return the shard's records, or None if it is missing or corrupt."""
+        path = self.dir / shard["file"]
+        if not path.exists():
+            return None
+        data = path.read_bytes()
+        if _bytes_sha256(data) != shard.get("sha256"):
+            return None
+        try:
+            records = [json.loads(line) for line in data.decode("utf-8").splitlines()]
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            return None
+        if len(records) != shard.get("count") or [r["date"] for r in records] != shard.get("dates"):
+            return None
+        return records
+
+    def _write_manifest(self):
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "name": self.name,
+            "options": self.options,
+            "shard_size": self.shard_size,
+            "shards": self.shards,
+        }
+        tmp_path = self.manifest_path.with_suffix(".json.tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(tmp_path, self.manifest_path)
+
+    def lookup(self, date: str, text: str):
+        """Return the recorded result for this comic, or None if it must be scored."""
+        found = self.completed.get(date)
+        if found is None or found[0] != text_sha256(text):
+            return None
+        return found[1]
+
+    def append(self, dates: list[str], texts: list[str], results: list):
+        """Write one shard for freshly scored comics and record it in the manifest."""
+        lines = [
+            json.dumps(
+                {"date": date, "text_sha256": text_sha256(text), "result": result},
+                separators=(",", ":"),
+                default=float,
+            )
+            for date, text, result in zip(dates, texts, results)
+        ]
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+
+        # Never reuse the name of a shard that was dropped on resume
+        number = max((int(shard["file"][6:11]) + 1 for shard in self.shards), default=0)
+        file_name = f"shard-{number:05d}.jsonl"
+        tmp_path = self.dir / f"{file_name}.tmp"
+        with tmp_path.open("wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.dir / file_name)
+
+        self.shards.append(
+            {
+                "file": file_name,
+                "sha256": _bytes_sha256(data),
+                "count": len(lines),
+                "dates": list(dates),
+            }
+        )
+        # Not added to self.completed: a run never looks its own new comics
+        # up again, and streaming runs must not accumulate every result
+        self._write_manifest()
+
+
+def run_checkpointed(score_fn, dates, texts, checkpoint: ScoringCheckpoint = None) -> list:
+    """
+    Score `texts` with score_fn(texts, on_results) -> results, saving
+    finished comics to the checkpoint as the run goes.
+
+    score_fn gets every comic the checkpoint doesn't already hold in one
+    call, so length bucketing, panel dedup and worker sharding see the
+    whole input. It reports comics as its own work units finish (batches,
+    worker shards) through on_results(indices, results), indices into the
+    list it was given; they are written out a shard of `shard_size` at a
+    time. Comics it never reported are saved when it returns. Returns one
+    result per comic, in input order. Without a checkpoint this is just
+    score_fn(texts).
+    """
+    texts = list(texts)
+    if checkpoint is None:
+        return score_fn(texts)
+
+    dates = [str(date) for date in dates]
+    results = [checkpoint.lookup(date, text) for date, text in zip(dates, texts)]
+    todo = [i for i, result in enumerate(results) if result is None]
+    if len(todo) < len(texts):
+        print(f"  Checkpoint: {len(texts) - len(todo)} of {len(texts)} comics already scored")
+    if not todo:
+        return results
+
+    pending = []
+    saved = set()
+
+    def flush(count: int):
+        shard, pending[:count] = pending[:count], []
+        checkpoint.append(
+            [dates[todo[p]] for p, _ in shard],
+            [texts[todo[p]] for p, _ in shard],
+            [result for _, result in shard],
+        )
+        print(f"  Checkpointed {len(saved) - len(pending)}/{len(todo)} comics")
+
+    def on_results(indices, shard_results):
+        for p, result in zip(indices, shard_results):
+            if p not in saved:
+                saved.add(p)
+                pending.append((p, result))
+        while len(pending) >= checkpoint.shard_size:
+            flush(checkpoint.shard_size)
+
+    todo_results = score_fn([texts[i] for i in todo], on_results)
+    on_results(range(len(todo)), todo_results)
+    if pending:
+        flush(len(pending))
+    for i, result in zip(todo, todo_results):
+        results[i] = result
+    return results
@@ -0,0 +1,222 @@
+"""
+Chunked scoring: score transcripts panel by panel instead of truncating.
+
+Transcripts separate panels with blank lines. In chunked mode each
+transcript is split at those boundaries, and any panel longer than the
+model window is cut into consecutive windows, so no text is dropped. Every
+distinct chunk is scored once per run: a panel that appears in several
+comics costs a single forward pass, and with an InferenceCache an unchanged
+panel is never scored again on a rerun, even if the rest of its comic was
+edited. Chunks are short, so length-bucketed batching (common/inference.py)
+packs many of them under the same padded-token budget.
+
+Chunk scores are combined back into one pipeline-style result per comic:
+
+    mean      average of each label's score over the comic's chunks
+    max       each label's highest score in any chunk; most useful for the
+              multi-label outputs ("did any panel read as angry?"). Binary
+              top-1 models report whichever label peaked higher.
+    weighted  average weighted by each chunk's length in tokens
+"""
+
+import re
+
+import numpy as np
+
+from .inference import model_max_length
+from .inference_cache import text_sha256
+
+
+CHUNK_AGGREGATIONS = ("mean", "max", "weighted")
+
+PANEL_BREAK = re.compile(r"\n\s*\n")
+
+# A window cut out of a long panel can tokenize slightly differently at its
+# edges than it did in place, so windows leave a few tokens of slack
+WINDOW_SLACK = 8
+
+
+def chunking_options(options: dict, chunking: str = None) -> dict:
+    """
+    Call options plus the chunk aggregation, for score metadata and
+    checkpoints. Unchunked runs return `options` unchanged.
+    """
+    if chunking is None:
+        return options
+    return {**options, "chunks": chunking}
+
+
+def split_panels(text: str) -> list[str]:
+    """The transcript's non-empty panels; the whole text if it has none."""
+    panels = [panel.strip() for panel in PANEL_BREAK.split(text)]
+    return [panel for panel in panels if panel] or [text]
+
+
+def chunk_transcripts(tokenizer, texts: list[str], max_length: int = None):
+    """
+    Split every text into panel chunks that fit the model window.
+
+    Returns (chunks, lengths, owners): the chunk texts, their lengths in
+    tokens (including special tokens) and the index of the text each one
+    came from, in reading order.
+    """
+    if max_length is None:
+        max_length = model_max_length(tokenizer)
+    special = tokenizer.num_special_tokens_to_add(pair=False)
+    step = max(1, max_length - special - WINDOW_SLACK)
+
+    panels = []
+    panel_owners = []
+    for i, text in enumerate(texts):
+        for panel in split_panels(text):
+            panels.append(panel)
+            panel_owners.append(i)
+
+    # Offsets let long panels be cut at token boundaries
+    encoded = tokenizer(panels, add_special_tokens=False, return_offsets_mapping=True)
+
+    chunks, lengths, owners = [], [], []
+    for panel, owner, offsets in zip(panels, panel_owners, encoded["offset_mapping"]):
+        if len(offsets) <= step:
+            chunks.append(panel)
+            lengths.append(len(offsets) + special)
+            owners.append(owner)
+            continue
+        for start in range(0, len(offsets), step):
+            end = start + step
+            finish = offsets[end][0] if end < len(offsets) else len(panel)
+            chunks.append(panel[offsets[start][0]:finish].strip())
+            lengths.append(min(step, len(offsets) - start) + special)
+            owners.append(owner)
+    return chunks, np.array(lengths, dtype=np.int64), np.array(owners, dtype=np.int64)
+
+
+def score_map(result, labels=()) -> dict:
+    """
+    One pipeline result as {label: score}.
+
+    Handles zero-shot results ({'labels', 'scores'}), all-label results
+    (a list of {label, score}) and top-1 results ({label, score}); for a
+    top-1 result of a binary model (`labels` from its config) the other
+    label gets the remaining probability.
+    """
+    if isinstance(result, dict) and "labels" in result:
+        return {label: float(score) for label, score in zip(result["labels"], result["scores"])}
+    if isinstance(result, dict):
+        scores = {result["label"]: float(result["score"])}
+        others = [label for label in labels if label != result["label"]]
+        if len(others) == 1:
+            scores[others[0]] = 1.0 - scores[result["label"]]
+        return scores
+    return {item["label"]: float(item["score"]) for item in result}
+
+
+def result_from_scores(template, scores: dict, text: str):
+    """Build a result shaped like `template` (one chunk's result) from {label: score}."""
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    if isinstance(template, dict) and "labels" in template:
+        return {
+            "sequence": text,
+            "labels": [label for label, _ in ranked],
+            "scores": [score for _, score in ranked],
+        }
+    if isinstance(template, dict):
+        return {"label": ranked[0][0], "score": ranked[0][1]}
+    return [{"label": label, "score": score} for label, score in ranked]
+
+
+def aggregate_chunks(texts, chunk_results, lengths, owners, aggregation: str, labels=()) -> list:
+    """Combine chunk results into one result per text, shaped like the chunk results."""
+    by_owner = [[] for _ in texts]
+    for k, owner in enumerate(owners):
+        by_owner[owner].append(k)
+
+    results = []
+    for text, ks in zip(texts, by_owner):
+        maps = [score_map(chunk_results[k], labels) for k in ks]
+        names = list(dict.fromkeys(label for scores in maps for label in scores))
+        matrix = np.array([[scores.get(label, 0.0) for label in names] for scores in maps])
+        if aggregation == "max":
+            combined = matrix.max(axis=0)
+        elif aggregation == "weighted":
+            combined = np.average(matrix, axis=0, weights=lengths[ks])
+        else:
+            combined = matrix.mean(axis=0)
+        results.append(
+            result_from_scores(chunk_results[ks[0]], dict(zip(names, combined.tolist())), text)
+        )
+    return results
+
+
+def run_chunked(score_fn, classifier, texts, aggregation: str, on_results=None) -> list:
+    """
+    Score `texts` chunk by chunk and return one aggregated result per text.
+
+    `score_fn(chunks, lengths, on_chunks)` scores a list of chunk texts (with
+    their token lengths) and returns one pipeline result per chunk; the
+    scripts pass their own unchunked run_model so batching and caching work
+    as usual. If it reports chunks as they finish through
+    on_chunks(indices, results), each comic whose chunks are all scored is
+    aggregated and passed on to `on_results(indices, results)`.
+    """
+    if aggregation not in CHUNK_AGGREGATIONS:
+        raise ValueError(f"Unknown chunk aggregation '{aggregation}'. Choose from: {', '.join(CHUNK_AGGREGATIONS)}")
+    texts = list(texts)
+    if not texts:
+        return []
+
+    chunks, lengths, owners = chunk_transcripts(classifier.tokenizer, texts)
+
+    # Score each distinct chunk once, however many comics it appears in
+    slots = {}
+    positions = []
+    for chunk in chunks:
+        positions.append(slots.setdefault(text_sha256(chunk), len(slots)))
+    first = {}
+    for k, slot in enumerate(positions):
+        first.setdefault(slot, k)
+    unique = list(first.values())
+    print(f"  {len(texts)} comics -> {len(chunks)} chunks ({len(unique)} distinct, "
+          f"{aggregation} per comic)")
+
+    labels = list(getattr(classifier.model.config, "id2label", {}).values())
+    comic_chunks = [[] for _ in texts]
+    for k, owner in enumerate(owners):
+        comic_chunks[owner].append(k)
+    unique_results = [None] * len(unique)
+
+    def aggregate(comics):
+        ks = [k for i in comics for k in comic_chunks[i]]
+        local = {i: n for n, i in enumerate(comics)}
+        return aggregate_chunks(
+            [texts[i] for i in comics],
+            [unique_results[positions[k]] for k in ks],
+            lengths[ks],
+            [local[owners[k]] for k in ks],
+            aggregation,
+            labels,
+        )
+
+    on_chunks = None
+    if on_results is not None:
+        # Distinct chunks each comic still waits for, and the comics each chunk feeds
+        waiting = [len({positions[k] for k in ks}) for ks in comic_chunks]
+        feeds = [set() for _ in unique]
+        for k, owner in enumerate(owners):
+            feeds[positions[k]].add(int(owner))
+
+        def on_chunks(indices, results):
+            finished = []
+            for slot, result in zip(indices, results):
+                if unique_results[slot] is not None:
+                    continue
+                unique_results[slot] = result
+                for i in feeds[slot]:
+                    waiting[i] -= 1
+                    if waiting[i] == 0:
+                        finished.append(i)
+            if finished:
+                on_results(finished, aggregate(finished))
+
+    unique_results[:] = score_fn([chunks[k] for k in unique], lengths[unique], on_chunks)
+    return aggregate(range(len(texts)))
@@ -0,0 +1,213 @@
+"""
+Command-line options shared by the scoring scripts and score_all.py.
+
+Batch size, padded-token budget and the in-process torch thread count come
+from the command line when given, else from this host's autotune profile
+for the model (see analysis/autotune.py and common/tuning.py), else from
+the built-in defaults.
+
+Nothing here imports torch or transformers, so --from-scores runs (which
+only aggregate stored per-comic scores) start in a fraction of a second.
+"""
+
+from pathlib import Path
+
+from .backends import BACKENDS, DEFAULT_BACKEND
+from .bootstrap import DEFAULT_CONFIDENCE, DEFAULT_RESAMPLES, DEFAULT_SEED
+from .checkpoint import DEFAULT_SHARD_SIZE
+from .chunking import CHUNK_AGGREGATIONS
+from .corpus import DATASET_PATH
+from .inference import DEFAULT_BATCH_SIZE, DEFAULT_MAX_TOKENS
+from .score_store import STORE_DIR, load_score_store
+from .scores import SCORES_CSV, load_model_scores
+from .tuning import load_profile, set_torch_threads, thread_cap
+
+
+def add_scoring_arguments(parser):
+    """Add batch sizing, chunking, backend, CPU sharding, checkpoint and streaming options to an ArgumentParser."""
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=None,
+        help=f"Maximum comics per forward pass (default: autotuned for this host, "
+             f"else {DEFAULT_BATCH_SIZE})",
+    )
+    parser.add_argument(
+        "--max-tokens",
+        type=int,
+        default=None,
+        help=f"Maximum padded tokens per batch (default: autotuned for this host, "
+             f"else {DEFAULT_MAX_TOKENS})",
+    )
+    parser.add_argument(
+        "--no-tuning",
+        action="store_true",
+        help="Ignore this host's autotune profile and use the built-in defaults",
+    )
+    parser.add_argument(
+        "--chunked",
+        choices=CHUNK_AGGREGATIONS,
+        default=None,
+        help="Score transcripts panel by panel instead of truncating them, and combine "
+             "the panel scores per comic by this aggregation (see common/chunking.py)",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default=DEFAULT_BACKEND,
+        help=f"Inference backend (default: {DEFAULT_BACKEND}); "
+             "see analysis/compare_backends.py for agreement with fp32",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Worker processes for CPU inference; 1 runs in-process (default: 1)",
+    )
+    parser.add_argument(
+        "--threads-per-worker",
+        type=int,
+        default=None,
+        help="torch threads per worker (default: CPU count / workers; with one "
+             "worker, the autotuned thread count if there is one)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted run from its checkpoint shards",
+    )
+    parser.add_argument(
+        "--checkpoint-every",
+        type=int,
+        default=DEFAULT_SHARD_SIZE,
+        help=f"Comics per checkpoint shard (default: {DEFAULT_SHARD_SIZE})",
+    )
+    parser.add_argument(
+        "--stream",
+        nargs="?",
+        const=DATASET_PATH,
+        default=None,
+        type=Path,
+        metavar="SOURCE",
+        help="Stream comics from SOURCE (the dataset JSON, or a directory of per-year "
+             "shards such as public/comics-data) and aggregate by year on the fly, "
+             "in bounded memory (default SOURCE: the dataset JSON)",
+    )
+    return parser
+
+
+def add_output_arguments(parser, output_dir: Path):
+    """Add --from-scores, --output-dir and the bootstrap options to a one-model analysis script."""
+    parser.add_argument(
+        "--from-scores",
+        nargs="?",
+        const=SCORES_CSV,
+        default=None,
+        type=Path,
+        metavar="CSV",
+        help="Never run a model: aggregate and plot the stored per-comic scores in CSV "
+             "(default CSV: the table written by analysis/score_all.py)",
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=Path,
+        default=output_dir,
+        help=f"Where to write the yearly CSV and plot (default: {output_dir})",
+    )
+    parser.add_argument(
+        "--bootstrap",
+        type=int,
+        default=DEFAULT_RESAMPLES,
+        metavar="N",
+        help=f"Bootstrap resamples for the yearly confidence intervals; 0 leaves them out "
+             f"(default: {DEFAULT_RESAMPLES})",
+    )
+    parser.add_argument(
+        "--confidence",
+        type=float,
+        default=DEFAULT_CONFIDENCE,
+        help=f"Confidence level of the intervals (default: {DEFAULT_CONFIDENCE})",
+    )
+    parser.add_argument(
+        "--bootstrap-seed",
+        type=int,
+        default=DEFAULT_SEED,
+        help=f"Random seed for the resamples, so reruns give the same intervals (default: {DEFAULT_SEED})",
+    )
+    return parser
+
+
+def require_model_scores(name: str, options: dict, scores_csv: Path):
+    """load_model_scores() for --from-scores, which has nothing to fall back on."""
+    df = load_model_scores(name, options, scores_csv=scores_csv, meta_path=scores_csv.with_suffix(".meta.json"))
+    if df is None:
+        raise SystemExit(
+            f"No up-to-date {name} scores in {scores_csv} for these options. Run "
+            f"analysis/score_all.py (with the same --backend / --chunked) first."
+        )
+    return df
+
+
+def require_score_store(name: str, options: dict, source: Path):
+    """The score store a streaming run over `source` has just written (for the bootstrap)."""
+    store = load_score_store(name, options, dataset_path=Path(source))
+    if store is None:
+        raise SystemExit(
+            f"No up-to-date {name} score store in {STORE_DIR / name} for this run; "
+            f"pass --bootstrap 0 to skip the confidence intervals."
+        )
+    return store
+
+
+def tuned_settings(args, name: str = None) -> dict:
+    """
+    Batch size, padded-token budget and in-process thread count for model
+    `name`: explicit options first, then this host's autotune profile, then
+    the defaults. `threads` is None when torch's own default should stand.
+    A profile's thread count is measured for the whole host, so it is
+    capped at OMP_NUM_THREADS when a parent (pipeline.py) has set one.
+    """
+    profile = None
+    if name is not None and not args.no_tuning:
+        profile = load_profile(name, args.backend)
+    profile = profile or {}
+
+    threads = args.threads_per_worker
+    if args.workers == 1 and threads is None:
+        # Profiles are measured in one process, so they don't apply to workers
+        threads = profile.get("threads")
+        if threads and thread_cap():
+            threads = min(threads, thread_cap())
+    return {
+        "batch_size": args.batch_size or profile.get("batch_size") or DEFAULT_BATCH_SIZE,
+        "max_tokens": args.max_tokens or profile.get("max_tokens") or DEFAULT_MAX_TOKENS,
+        "threads": threads,
+        "tuned": bool(profile),
+    }
+
+
+def resolve_scoring_arguments(args, name: str):
+    """
+    Fill in --batch-size / --max-tokens for a one-model script and, for an
+    in-process run, set torch's thread count. Returns `args`.
+    """
+    if args.bootstrap < 0:
+        raise SystemExit("--bootstrap must be 0 or a positive number of resamples")
+    if not 0 < args.confidence < 1:
+        raise SystemExit("--confidence must be between 0 and 1 (e.g. 0.95)")
+
+    if getattr(args, "from_scores", None) is not None:
+        if args.stream is not None:
+            raise SystemExit("--from-scores and --stream can't be combined")
+        # No model will run, so there is nothing to tune (and no torch to import)
+        return args
+
+    settings = tuned_settings(args, name)
+    args.batch_size = settings["batch_size"]
+    args.max_tokens = settings["max_tokens"]
+    if settings["tuned"]:
+        print(f"Autotune profile for {name} on this host: batch size {args.batch_size}, "
+              f"max tokens {args.max_tokens}, threads {settings['threads'] or 'default'}")
+    if args.workers == 1 and settings["threads"]:
+        set_torch_threads(settings["threads"])
+    return args
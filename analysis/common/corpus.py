@@ -0,0 +1,282 @@
+"""
+Shared loader for the Dilbert transcript corpus.
+
+Every analysis script used to json.load() the master dataset, parse each date
+with strptime and build a DataFrame row by row. This module does that work
+once and writes a columnar cache next to the source file:
+
+    data/.dilbert_comics_transcripts.cache/
+        meta.json     - sha256 of the source JSON, row count, format version
+        dates.npy     - "YYYY-MM-DD" as fixed-width bytes (S10)
+        years.npy     - int16 year per comic
+        offsets.npy   - int64 byte offsets into text.bin (length n + 1)
+        text.bin      - UTF-8 transcripts (stripped), concatenated
+
+Later runs hash the source, and if it matches meta.json the arrays are
+reopened memory-mapped instead of re-parsing the JSON.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+DATASET_PATH = Path(__file__).resolve().parents[2] / "data" / "dilbert_comics_transcripts.json"
+
+CACHE_FORMAT_VERSION = 2
+
+# Dataset keys are calendar dates; anything else is skipped
+DATE_RE = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+
+def cache_dir_for(dataset_path: Path) -> Path:
+    """Return the cache directory that sits next to the given source file."""
+    return dataset_path.parent / f".{dataset_path.stem}.cache"
+
+
+def file_sha256(path: Path, chunk_size: int = 1 << 20) -> str:
+    """Hash a file in chunks so large datasets never have to fit in memory."""
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def take_ranges(values, offsets, rows) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Concatenate the `offsets` ranges of `values` for `rows`, in that order:
+    (gathered values, their offsets, length len(rows) + 1). Vectorized, so
+    slicing a year out of a memory-mapped array is one fancy index.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    starts = np.asarray(offsets[rows], dtype=np.int64)
+    lengths = np.asarray(offsets[rows + 1], dtype=np.int64) - starts
+    new_offsets = np.concatenate(([0], np.cumsum(lengths)))
+    index = np.repeat(starts - new_offsets[:-1], lengths) + np.arange(new_offsets[-1])
+    return values[index], new_offsets
+
+
+class Corpus:
+    """
+    Column-oriented view of the transcripts.
+
+    Attributes:
+      - dates:   array of b"YYYY-MM-DD" (S10)
+      - years:   int16 array
+      - offsets: int64 array of length n + 1 into `blob`
+      - blob:    uint8 array with all transcripts as UTF-8
+
+    When loaded from the cache, all four arrays are read-only memory maps.
+    """
+
+    def __init__(self, dates, years, offsets, blob, source_sha256: str = ""):
+        self.dates = dates
+        self.years = years
+        self.offsets = offsets
+        self.blob = blob
+        self.source_sha256 = source_sha256
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def date(self, i: int) -> str:
+        return self.dates[i].decode("ascii")
+
+    def text(self, i: int) -> str:
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.blob[start:end].tobytes().decode("utf-8")
+
+    def iter_texts(self):
+        for i in range(len(self)):
+            yield self.text(i)
+
+    def subset(self, rows) -> "Corpus":
+        """A Corpus of just the comics at `rows`, in that order."""
+        rows = np.asarray(rows, dtype=np.int64)
+        blob, offsets = take_ranges(self.blob, self.offsets, rows)
+        return Corpus(self.dates[rows], self.years[rows], offsets, blob)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Return the classic DataFrame with columns: date, year, text."""
+        return pd.DataFrame(
+            {
+                "date": self.dates.astype(str),
+                "year": self.years.astype(int),
+                "text": list(self.iter_texts()),
+            }
+        )
+
+
+def parse_year(date_str: str) -> int:
+    """
+    Year of a "YYYY-MM-DD" dataset key. Like the old
+    strptime(date_str, "%Y-%m-%d") it raises ValueError for a key that
+    isn't a calendar date, but it also insists on zero padding, so every
+    date fits the fixed-width S10 column.
+    """
+    if not DATE_RE.fullmatch(date_str):
+        raise ValueError(f"not a YYYY-MM-DD date: {date_str!r}")
+    return date.fromisoformat(date_str).year
+
+
+def parse_dataset(dataset_path: Path) -> Corpus:
+    """
+    Parse the master JSON into a Corpus.
+
+    Entries without transcript text, or whose key isn't a valid
+    "YYYY-MM-DD" date, are skipped (with a warning, as before).
+    """
+    with dataset_path.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    dates = []
+    years = []
+    offsets = [0]
+    chunks = []
+    skipped = 0
+
+    for date_str, entry in data.items():
+        transcript = (entry.get("transcript") or "").strip()
+        if not transcript:
+            skipped += 1
+            continue
+
+        try:
+            year = parse_year(date_str)
+        except ValueError:
+            print(f"Warning: Could not parse date '{date_str}', skipping")
+            skipped += 1
+            continue
+
+        encoded = transcript.encode("utf-8")
+        dates.append(date_str)
+        years.append(year)
+        chunks.append(encoded)
+        offsets.append(offsets[-1] + len(encoded))
+
+    if skipped > 0:
+        print(f"Warning: Skipped {skipped} entries with missing transcripts or bad dates")
+
+    return Corpus(
+        dates=np.array(dates, dtype="S10"),
+        years=np.array(years, dtype=np.int16),
+        offsets=np.array(offsets, dtype=np.int64),
+        blob=np.frombuffer(b"".join(chunks), dtype=np.uint8),
+    )
+
+
+def write_cache(corpus: Corpus, cache_dir: Path, source_sha256: str):
+    """
+    Write the Corpus arrays to `cache_dir`.
+
+    Files are written into a temporary sibling directory first and then moved
+    into place, so an interrupted run never leaves a half-written cache.
+    """
+    tmp_dir = cache_dir.with_name(cache_dir.name + ".tmp")
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+    tmp_dir.mkdir(parents=True)
+
+    np.save(tmp_dir / "dates.npy", corpus.dates)
+    np.save(tmp_dir / "years.npy", corpus.years)
+    np.save(tmp_dir / "offsets.npy", corpus.offsets)
+    corpus.blob.tofile(tmp_dir / "text.bin")
+
+    meta = {
+        "format_version": CACHE_FORMAT_VERSION,
+        "source_sha256": source_sha256,
+        "rows": len(corpus),
+    }
+    with (tmp_dir / "meta.json").open("w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+    if cache_dir.exists():
+        shutil.rmtree(cache_dir)
+    os.replace(tmp_dir, cache_dir)
+
+
+def read_cache(cache_dir: Path, source_sha256: str):
+    """Reopen a cache memory-mapped, or return None if it is missing or stale."""
+    meta_path = cache_dir / "meta.json"
+    if not meta_path.exists():
+        return None
+
+    with meta_path.open("r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("format_version") != CACHE_FORMAT_VERSION:
+        return None
+    if meta.get("source_sha256") != source_sha256:
+        return None
+
+    text_path = cache_dir / "text.bin"
+    if text_path.stat().st_size == 0:
+        # np.memmap refuses zero-length files
+        blob = np.zeros(0, dtype=np.uint8)
+    else:
+        blob = np.memmap(text_path, dtype=np.uint8, mode="r")
+
+    return Corpus(
+        dates=np.load(cache_dir / "dates.npy", mmap_mode="r"),
+        years=np.load(cache_dir / "years.npy", mmap_mode="r"),
+        offsets=np.load(cache_dir / "offsets.npy", mmap_mode="r"),
+        blob=blob,
+        source_sha256=source_sha256,
+    )
+
+
+def load_corpus(dataset_path: Path = DATASET_PATH, use_cache: bool = True) -> Corpus:
+    """
+    Load the transcripts as a Corpus, going through the columnar cache.
+
+    The cache is keyed on the sha256 of the source file, so any edit to the
+    JSON (even one OCR fix) triggers a rebuild on the next run.
+    """
+    if not dataset_path.exists():
+        raise FileNotFoundError(
+            f"Dataset not found at {dataset_path}. "
+            f"Please check the DATASET_PATH constant in analysis/common/corpus.py."
+        )
+
+    source_sha256 = file_sha256(dataset_path)
+    cache_dir = cache_dir_for(dataset_path)
+
+    if use_cache:
+        corpus = read_cache(cache_dir, source_sha256)
+        if corpus is not None:
+            print(f"Using cached corpus: {cache_dir}")
+            return corpus
+
+    print(f"Parsing dataset: {dataset_path}")
+    corpus = parse_dataset(dataset_path)
+    corpus.source_sha256 = source_sha256
+
+    if use_cache:
+        write_cache(corpus, cache_dir, source_sha256)
+        print(f"Wrote corpus cache to: {cache_dir}")
+
+    return corpus
+
+
+def load_dataset(dataset_path: Path = DATASET_PATH) -> pd.DataFrame:
+    """
+    Load the Dilbert transcripts and return a DataFrame with:
+      - date (string)
+      - year (int)
+      - text (full transcript, stripped)
+    """
+    print(f"Loading dataset from: {dataset_path}")
+    corpus = load_corpus(dataset_path)
+    df = corpus.to_dataframe()
+
+    print(f"Loaded {len(df)} comics from dataset")
+    if len(df):
+        print(f"Year range: {df['year'].min()} to {df['year'].max()}")
+    return df
@@ -0,0 +1,196 @@
+"""
+Persistent, content-addressed cache of classifier outputs.
+
+Results are stored in SQLite, keyed by:
+  - a model key: model id, model revision and the task options (the keyword
+    arguments passed to the pipeline, e.g. truncation / candidate_labels)
+  - the sha256 of the normalized transcript
+
+so re-running a script after a handful of OCR fixes only pays inference for
+the transcripts that actually changed. The cache is size-bounded: once the
+stored results exceed `max_bytes`, the least recently used entries are
+evicted.
+"""
+
+import hashlib
+import json
+import sqlite3
+import time
+import unicodedata
+from pathlib import Path
+
+
+CACHE_DIR = Path(__file__).resolve().parents[1] / ".cache"
+DEFAULT_CACHE_PATH = CACHE_DIR / "inference.sqlite"
+
+# ~12k comics x 4 models x a few hundred bytes of JSON each is only tens of
+# MB, so this leaves plenty of room for label-set and model experiments.
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# SQLite's default limit on host parameters is 999 on older builds
+_SQL_CHUNK = 500
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form used for hashing: NFC, Unix newlines, no outer whitespace."""
+    text = unicodedata.normalize("NFC", text)
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text.strip()
+
+
+def text_sha256(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def model_key(model_id: str, revision: str, options: dict) -> str:
+    """Stable string identifying a model + task options combination."""
+    payload = {"model": model_id, "revision": revision, "options": options}
+    return json.dumps(payload, sort_keys=True, separators=(",", ":"))
+
+
+def pipeline_model_key(classifier, options: dict) -> str:
+    """
+    Build the model key for a Hugging Face pipeline.
+
+    The revision is the commit hash of the downloaded snapshot when the hub
+    recorded one, so a model update on the hub invalidates old entries.
+    A non-fp32 backend (see common/backends.py) becomes part of the options.
+    """
+    model = classifier.model
+    model_id = getattr(model, "name_or_path", None) or type(model).__name__
+    revision = getattr(model.config, "_commit_hash", None) or "unknown"
+    backend = getattr(classifier, "inference_backend", "fp32")
+    if backend != "fp32":
+        options = {**options, "backend": backend}
+    return model_key(model_id, revision, options)
+
+
+class InferenceCache:
+    """
+    SQLite-backed result cache with hit/miss counters and LRU eviction.
+
+    Typical use:
+
+        cache = InferenceCache()
+        cached = cache.get_many(key, hashes)      # {hash: result}
+        ...run the model on the misses...
+        cache.put_many(key, {hash: result, ...})
+        print(cache.report())
+    """
+
+    def __init__(self, path: Path = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Generous busy timeout: sharded runs have several writer processes
+        self.conn = sqlite3.connect(self.path, timeout=60)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                model_key TEXT NOT NULL,
+                text_sha256 TEXT NOT NULL,
+                result TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model_key, text_sha256)
+            ) WITHOUT ROWID
+            """
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)"
+        )
+        self.conn.commit()
+        # Apply the budget up front too, in case max_bytes was lowered
+        self.evict()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get_many(self, key: str, hashes: list[str]) -> dict:
+        """Return {text_sha256: result} for every hash already in the cache."""
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+        for start in range(0, len(unique), _SQL_CHUNK):
+            chunk = unique[start:start + _SQL_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT text_sha256, result FROM results "
+                f"WHERE model_key = ? AND text_sha256 IN ({placeholders})",
+                [key, *chunk],
+            ).fetchall()
+            for text_hash, result in rows:
+                found[text_hash] = json.loads(result)
+
+        # Touch the hits so LRU eviction keeps what is actually being used
+        if found:
+            now = time.time()
+            self.conn.executemany(
+                "UPDATE results SET last_used = ? WHERE model_key = ? AND text_sha256 = ?",
+                [(now, key, h) for h in found],
+            )
+            self.conn.commit()
+
+        self.hits += sum(1 for h in hashes if h in found)
+        self.misses += sum(1 for h in hashes if h not in found)
+        return found
+
+    def put_many(self, key: str, results: dict):
+        """Store {text_sha256: result} and evict old entries if over budget."""
+        now = time.time()
+        rows = []
+        for text_hash, result in results.items():
+            encoded = json.dumps(result, separators=(",", ":"), default=float)
+            rows.append((key, text_hash, encoded, len(encoded), now))
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO results "
+            "(model_key, text_sha256, result, size, last_used) VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
+        self.conn.commit()
+        self.evict()
+
+    def total_bytes(self) -> int:
+        (total,) = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()
+        return total
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        excess = self.total_bytes() - self.max_bytes
+        if excess <= 0:
+            return
+
+        doomed = []
+        freed = 0
+        for key, text_hash, size in self.conn.execute(
+            "SELECT model_key, text_sha256, size FROM results ORDER BY last_used"
+        ):
+            doomed.append((key, text_hash))
+            freed += size
+            if freed >= excess:
+                break
+
+        self.conn.executemany(
+            "DELETE FROM results WHERE model_key = ? AND text_sha256 = ?", doomed
+        )
+        self.conn.commit()
+        self.evictions += len(doomed)
+
+    def report(self) -> str:
+        lookups = self.hits + self.misses
+        rate = 100 * self.hits / lookups if lookups else 0.0
+        return (
+            f"Inference cache: {self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate), "
+            f"{self.evictions} evicted, {self.total_bytes() / 1024 / 1024:.1f} MB on disk "
+            f"({self.path})"
+        )
@@ -0,0 +1,66 @@
+"""
+Pipeline loading with pinned local model snapshots.
+
+analysis/pin_models.py downloads each classifier's hub snapshot into
+
+    analysis/.cache/models/<org>--<name>/     (or $DILBERT_MODELS_DIR)
+        pin.json    model id + the commit the files came from
+
+When a pinned snapshot exists, load_pipeline() builds the pipeline from it
+with the hub switched to offline mode, so a run never probes the network at
+startup. The pipeline still identifies its model by hub id and the pinned
+commit, so inference-cache keys and exported backends are the same as for
+a model loaded from the hub. Without a pin, models come from the hub (and
+its local cache) as before.
+
+transformers is only imported here, when a pipeline is actually built, so
+scripts that only aggregate stored scores start without it.
+"""
+
+import json
+import os
+from pathlib import Path
+
+from .inference_cache import CACHE_DIR
+
+
+MODELS_DIR = Path(os.environ.get("DILBERT_MODELS_DIR", CACHE_DIR / "models"))
+PIN_FILE = "pin.json"
+
+
+def snapshot_dir(model_id: str, models_dir: Path = MODELS_DIR) -> Path:
+    return models_dir / model_id.replace("/", "--")
+
+
+def pinned_snapshot(model_id: str, models_dir: Path = MODELS_DIR):
+    """Return (snapshot directory, pinned commit) for `model_id`, or None."""
+    path = snapshot_dir(model_id, models_dir)
+    pin_path = path / PIN_FILE
+    if not pin_path.exists():
+        return None
+    with pin_path.open("r", encoding="utf-8") as f:
+        pin = json.load(f)
+    if pin.get("model") != model_id:
+        return None
+    return path, pin.get("revision")
+
+
+def load_pipeline(task: str, model_id: str, **kwargs):
+    """Build a transformers pipeline for `model_id`, from its pinned snapshot if there is one."""
+    pinned = pinned_snapshot(model_id)
+    if pinned is not None:
+        # Read by huggingface_hub at import time, so set it before transformers loads
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+    from transformers import pipeline
+
+    if pinned is None:
+        return pipeline(task, model=model_id, **kwargs)
+
+    path, revision = pinned
+    print(f"Using pinned snapshot of {model_id} ({(revision or 'unknown')[:12]}) from {path}")
+    classifier = pipeline(task, model=str(path), **kwargs)
+    # Same identity as a hub load: cache keys and backend artifacts use these
+    classifier.model.name_or_path = model_id
+    classifier.model.config._commit_hash = revision
+    return classifier
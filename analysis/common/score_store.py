@@ -0,0 +1,243 @@
+"""
+Columnar store of every comic's full label distribution, per model.
+
+The per-comic CSV columns keep only what the yearly scripts plot: the top
+GoEmotions label, the sarcasm probability, and so on. Every scoring run also
+writes each comic's complete score vector:
+
+    analysis/comic_scores/store/<model>/
+        meta.json    labels, row count, options fingerprint, source sha256
+        dates.bin    one "YYYY-MM-DD" per comic (fixed-width S10), row order
+        scores.f16   float16 matrix, rows x labels, row-major
+
+Both data files are raw arrays, so a run can append chunk by chunk (the
+streaming and score_all.py paths never hold the whole corpus) and a reader
+can memory-map them. The directory is written under a temporary name and
+swapped in when the run finishes; a failed run keeps the previous store.
+
+New aggregations (another threshold, a label grouping, monthly instead of
+yearly bins) are then array operations over the stored matrix instead of a
+new inference run; see ScoreStore and analysis/aggregate_scores.py.
+"""
+
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .corpus import DATASET_PATH, file_sha256
+from .scores import SCORES_DIR, options_fingerprint
+
+
+STORE_DIR = SCORES_DIR / "store"
+STORE_FORMAT_VERSION = 1
+
+DATE_DTYPE = np.dtype("S10")
+SCORE_DTYPE = np.dtype(np.float16)
+
+# Prefix length of a "YYYY-MM-DD" date for each supported bin
+PERIODS = {"year": 4, "month": 7, "day": 10}
+
+
+class ScoreStoreWriter:
+    """
+    Append per-comic score vectors for one model and publish them on close().
+
+    Use as a context manager: the store replaces the previous one only if
+    the block finishes without an exception.
+    """
+
+    def __init__(self, name: str, options: dict, source_sha256: str = "", store_dir: Path = STORE_DIR):
+        self.name = name
+        self.options = options
+        self.source_sha256 = source_sha256
+        self.path = store_dir / name
+        self.tmp_path = store_dir / f"{name}.tmp"
+        self.labels = None
+        self.rows = 0
+
+        if self.tmp_path.exists():
+            shutil.rmtree(self.tmp_path)
+        self.tmp_path.mkdir(parents=True)
+        self._dates = (self.tmp_path / "dates.bin").open("wb")
+        self._scores = (self.tmp_path / "scores.f16").open("wb")
+
+    def append(self, dates, labels: list[str], scores):
+        """Add one row per comic; `scores` is a comics x labels array in `labels` order."""
+        if len(dates) == 0:
+            return
+        scores = np.asarray(scores, dtype=np.float64)
+        if self.labels is None:
+            self.labels = list(labels)
+        elif list(labels) != self.labels:
+            if sorted(labels) != sorted(self.labels):
+                raise ValueError(f"{self.name}: labels changed mid-run ({labels} vs {self.labels})")
+            # Same labels in another order: reorder the columns to the first chunk's
+            scores = scores[:, [list(labels).index(label) for label in self.labels]]
+
+        dates = np.asarray([str(date) for date in dates], dtype=DATE_DTYPE)
+        if len(dates) != len(scores):
+            raise ValueError(f"{self.name}: {len(dates)} dates for {len(scores)} score rows")
+        self._dates.write(dates.tobytes())
+        self._scores.write(np.ascontiguousarray(scores, dtype=SCORE_DTYPE).tobytes())
+        self.rows += len(dates)
+
+    def close(self):
+        self._dates.close()
+        self._scores.close()
+        meta = {
+            "format_version": STORE_FORMAT_VERSION,
+            "model": self.name,
+            "options": options_fingerprint(self.options),
+            "source_sha256": self.source_sha256,
+            "labels": self.labels or [],
+            "rows": self.rows,
+            "written_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        with (self.tmp_path / "meta.json").open("w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+
+        if self.path.exists():
+            shutil.rmtree(self.path)
+        os.replace(self.tmp_path, self.path)
+        print(f"Saved {self.rows} x {len(meta['labels'])} {self.name} score matrix to: {self.path}")
+
+    def abort(self):
+        self._dates.close()
+        self._scores.close()
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def open_score_writer(name: str, options: dict, source: Path = DATASET_PATH, store_dir: Path = STORE_DIR):
+    """
+    A ScoreStoreWriter for a run over `source`. Only the dataset JSON gets
+    a source hash; runs over a shard directory are recorded without one.
+    """
+    source = Path(source)
+    source_sha256 = file_sha256(source) if source.is_file() else ""
+    return ScoreStoreWriter(name, options, source_sha256, store_dir)
+
+
+class ScoreStore:
+    """A model's stored score matrix, memory-mapped read-only."""
+
+    def __init__(self, path: Path):
+        with (path / "meta.json").open("r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.path = path
+        self.labels = list(self.meta["labels"])
+        rows = self.meta["rows"]
+
+        if rows == 0:
+            # np.memmap refuses zero-length files
+            self.dates = np.zeros(0, dtype=DATE_DTYPE)
+            self.scores = np.zeros((0, len(self.labels)), dtype=SCORE_DTYPE)
+        else:
+            self.dates = np.memmap(path / "dates.bin", dtype=DATE_DTYPE, mode="r", shape=(rows,))
+            self.scores = np.memmap(
+                path / "scores.f16", dtype=SCORE_DTYPE, mode="r", shape=(rows, len(self.labels))
+            )
+
+    def __len__(self):
+        return len(self.dates)
+
+    @property
+    def years(self) -> np.ndarray:
+        return self.dates.astype("S4").astype(np.int64)
+
+    def matrix(self, labels: list[str] = None) -> np.ndarray:
+        """The scores of `labels` (default: all) as a float32 comics x labels array."""
+        if labels is None:
+            return np.asarray(self.scores, dtype=np.float32)
+        columns = [self.label_index(label) for label in labels]
+        return np.asarray(self.scores[:, columns], dtype=np.float32)
+
+    def column(self, label: str) -> np.ndarray:
+        return np.asarray(self.scores[:, self.label_index(label)], dtype=np.float32)
+
+    def label_index(self, label: str) -> int:
+        if label not in self.labels:
+            raise KeyError(f"{self.meta['model']} has no label '{label}'. Labels: {', '.join(self.labels)}")
+        return self.labels.index(label)
+
+    def periods(self, by: str = "year"):
+        """(sorted period keys, each comic's period index) for year, month or day bins."""
+        if by not in PERIODS:
+            raise ValueError(f"Unknown period '{by}'. Choose from: {', '.join(PERIODS)}")
+        keys, inverse = np.unique(self.dates.astype(f"S{PERIODS[by]}"), return_inverse=True)
+        keys = keys.astype(str)
+        return (keys.astype(np.int64) if by == "year" else keys), inverse
+
+    def to_frame(self) -> pd.DataFrame:
+        """date, year and one column per label, one row per comic."""
+        df = pd.DataFrame(self.matrix(), columns=self.labels)
+        df.insert(0, "year", self.years)
+        df.insert(0, "date", self.dates.astype(str))
+        return df
+
+
+def load_score_store(
+    name: str,
+    options: dict = None,
+    dataset_path: Path = DATASET_PATH,
+    store_dir: Path = STORE_DIR,
+):
+    """
+    Open `name`'s score store, or return None if there is none, it was
+    scored with different `options` (when given) or from a different dataset.
+    """
+    path = store_dir / name
+    meta_path = path / "meta.json"
+    if not meta_path.exists():
+        return None
+
+    with meta_path.open("r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("format_version") != STORE_FORMAT_VERSION:
+        return None
+    if options is not None and meta.get("options") != options_fingerprint(options):
+        return None
+    source_sha256 = meta.get("source_sha256")
+    if source_sha256 and dataset_path.exists() and source_sha256 != file_sha256(dataset_path):
+        print(f"Stored {name} scores in {path} are stale (dataset changed), ignoring them")
+        return None
+    return ScoreStore(path)
+
+
+def grouped_sums(inverse: np.ndarray, values: np.ndarray, groups: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Per-group column sums and row counts of `values` (comics x k), with
+    `inverse` giving each comic's group: one stable sort and a reduceat.
+    """
+    counts = np.bincount(inverse, minlength=groups)
+    sums = np.zeros((groups, values.shape[1]), dtype=np.float64)
+    if len(inverse) == 0:
+        return sums, counts
+    order = np.argsort(inverse, kind="stable")
+    present = np.flatnonzero(counts)
+    starts = np.concatenate(([0], np.cumsum(counts[present])[:-1]))
+    sums[present] = np.add.reduceat(values[order].astype(np.float64), starts, axis=0)
+    return sums, counts
+
+
+def grouped_means(keys, inverse: np.ndarray, values: np.ndarray, columns: list[str], index_name: str) -> pd.DataFrame:
+    """Per-period means of `values` plus a comic_count column, as a DataFrame."""
+    sums, counts = grouped_sums(inverse, values, len(keys))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = sums / counts[:, None]
+    frame = pd.DataFrame(means, index=pd.Index(keys, name=index_name), columns=columns)
+    frame["comic_count"] = counts
+    return frame
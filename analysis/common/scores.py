@@ -0,0 +1,73 @@
+"""
+Per-comic score table shared by the analysis scripts.
+
+analysis/score_all.py scores every comic with all classifiers in one pass
+and writes:
+
+    analysis/comic_scores/comic_scores.csv        date, year, <model>.<column>, ...
+    analysis/comic_scores/comic_scores.meta.json  source sha256 + per-model options
+
+The per-script yearly aggregations call load_model_scores() first and only
+run inference themselves when the table is missing or stale.
+"""
+
+import json
+from pathlib import Path
+
+import pandas as pd
+
+from .corpus import DATASET_PATH, file_sha256
+
+
+SCORES_DIR = Path(__file__).resolve().parents[1] / "comic_scores"
+SCORES_CSV = SCORES_DIR / "comic_scores.csv"
+SCORES_META = SCORES_DIR / "comic_scores.meta.json"
+
+
+def options_fingerprint(options: dict) -> str:
+    """Canonical JSON for a model's call options, used to detect stale columns."""
+    return json.dumps(options, sort_keys=True, separators=(",", ":"))
+
+
+def write_scores_meta(models: dict, source_sha256: str, meta_path: Path = SCORES_META):
+    """Record which models (and with which options) produced the score table."""
+    meta = {
+        "source_sha256": source_sha256,
+        "models": {name: options_fingerprint(options) for name, options in models.items()},
+    }
+    with meta_path.open("w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+
+def load_model_scores(
+    name: str,
+    options: dict,
+    dataset_path: Path = DATASET_PATH,
+    scores_csv: Path = SCORES_CSV,
+    meta_path: Path = SCORES_META,
+):
+    """
+    Return one model's per-comic columns (plus date and year) from the score
+    table, with the "<name>." prefix stripped, or None if the table is
+    missing, was built from a different dataset, or used different options.
+    """
+    if not scores_csv.exists() or not meta_path.exists():
+        return None
+
+    with meta_path.open("r", encoding="utf-8") as f:
+        meta = json.load(f)
+
+    if meta.get("models", {}).get(name) != options_fingerprint(options):
+        return None
+    if dataset_path.exists() and meta.get("source_sha256") != file_sha256(dataset_path):
+        print(f"Per-comic scores in {scores_csv} are stale (dataset changed), ignoring them")
+        return None
+
+    prefix = f"{name}."
+    df = pd.read_csv(
+        scores_csv,
+        usecols=lambda column: column in ("date", "year") or column.startswith(prefix),
+    )
+    df = df.rename(columns=lambda column: column[len(prefix):] if column.startswith(prefix) else column)
+    print(f"Loaded per-comic {name} scores for {len(df)} comics from: {scores_csv}")
+    return df
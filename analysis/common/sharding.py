@@ -0,0 +1,301 @@
+"""
+Multi-process CPU inference: shard the corpus across a pool of workers.
+
+On CPU-only servers one Python process driving one pipeline leaves most
+cores idle, while simply raising torch's thread count stops scaling well
+past a handful of threads. Instead we run N worker processes, each with its
+own copy of the model(s) and a fixed torch thread budget so that
+workers x threads never oversubscribes the machine.
+
+  - Transcripts are packed once into a shared memory block (UTF-8 blob plus
+    int64 offsets). Tasks only carry (start, end) ranges, never the text.
+  - The corpus is cut into more shards than workers so a slow shard (long
+    Sunday strips) doesn't leave the other workers idle at the end.
+  - Results are merged by shard index, so the output order (and therefore
+    every CSV) is identical to a single-process run.
+
+Usage:
+
+    with ShardedScorer({"sarcasm": ("emotions_sarcasm", "build_sarcasm_pipeline")},
+                       workers=8) as scorer:
+        results = scorer.score(texts)["sarcasm"]
+"""
+
+import importlib
+import multiprocessing as mp
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .backends import DEFAULT_BACKEND
+from .checkpoint import run_checkpointed
+from .inference import DEFAULT_BATCH_SIZE, DEFAULT_MAX_TOKENS
+from .inference_cache import InferenceCache
+
+
+# Shards per worker; more shards = better load balancing, more task overhead
+SHARDS_PER_WORKER = 4
+
+# Populated in each worker process by _init_worker
+_worker_models = {}
+_worker_cache = None
+
+
+def default_threads_per_worker(workers: int) -> int:
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def pack_texts(texts: list[str]):
+    """
+    Copy texts into one shared memory block.
+
+    Layout: [int64 offsets (n + 1)] [UTF-8 bytes]. Returns the SharedMemory
+    object (caller must close + unlink it) and the number of texts.
+    """
+    encoded = [text.encode("utf-8") for text in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+
+    header_bytes = offsets.nbytes
+    shm = shared_memory.SharedMemory(create=True, size=max(1, header_bytes + int(offsets[-1])))
+    np.ndarray(offsets.shape, dtype=np.int64, buffer=shm.buf)[:] = offsets
+    shm.buf[header_bytes:header_bytes + int(offsets[-1])] = b"".join(encoded)
+    return shm, len(encoded)
+
+
+def unpack_texts(shm_name: str, count: int, start: int, end: int) -> list[str]:
+    """Read texts[start:end] back out of a block written by pack_texts."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        offsets = np.ndarray((count + 1,), dtype=np.int64, buffer=shm.buf)
+        base = offsets.nbytes
+        texts = [
+            bytes(shm.buf[base + offsets[i]:base + offsets[i + 1]]).decode("utf-8")
+            for i in range(start, end)
+        ]
+        del offsets  # release the buffer export before closing
+    finally:
+        shm.close()
+    return texts
+
+
+def _init_worker(builders: dict, threads: int, cache_path, backend: str):
+    """Pin the thread budget, then build each model once per worker."""
+    global _worker_cache
+
+    # Must happen before torch spins up its thread pools
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+    import torch
+
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+
+    # Per-batch progress from N workers would interleave into noise; the
+    # parent reports progress per shard instead
+    sys.stdout = open(os.devnull, "w")
+
+    for name, (module_name, builder_name) in builders.items():
+        module = importlib.import_module(module_name)
+        _worker_models[name] = (module, getattr(module, builder_name)(backend=backend))
+
+    if cache_path is not None:
+        _worker_cache = InferenceCache(cache_path)
+
+
+def _score_shard(shm_name: str, count: int, start: int, end: int, batch_size: int, max_tokens: int,
+                 chunking: str = None):
+    texts = unpack_texts(shm_name, count, start, end)
+    results = {}
+    for name, (module, classifier) in _worker_models.items():
+        results[name] = module.run_model(
+            classifier, texts, batch_size, max_tokens, cache=_worker_cache, chunking=chunking
+        )
+    return results
+
+
+class ShardedScorer:
+    """
+    A process pool where every worker holds the given models.
+
+    `builders` maps a result name to (module name, builder function name);
+    each module must provide run_model() like the analysis scripts do
+    (including its `chunking=` option, see common/chunking.py).
+    Modules are imported by name in the workers, which inherit the parent's
+    sys.path (spawn copies it). Builders are called with `backend=`.
+
+    If `cache_path` is given, every worker opens the InferenceCache there;
+    SQLite's locking lets them share one file.
+    """
+
+    def __init__(
+        self,
+        builders: dict,
+        workers: int,
+        threads_per_worker: int = None,
+        cache_path=None,
+        backend: str = DEFAULT_BACKEND,
+    ):
+        self.builders = builders
+        self.workers = workers
+        self.threads = threads_per_worker or default_threads_per_worker(workers)
+        print(f"Starting {workers} workers x {self.threads} torch threads "
+              f"({os.cpu_count()} CPUs available)")
+
+        # spawn, not fork: forking a process that already initialised
+        # torch's OpenMP pool can deadlock the children
+        self.pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=mp.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(builders, self.threads, cache_path, backend),
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.pool.shutdown()
+
+    def score(
+        self,
+        texts,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        chunking: str = None,
+        on_shard=None,
+    ) -> dict:
+        """
+        Return {name: [result per text]} with results in input order.
+
+        `on_shard(indices, {name: results})` is called as each shard
+        finishes, e.g. to checkpoint it (see common/checkpoint.py).
+        """
+        texts = list(texts)
+        total = len(texts)
+        if total == 0:
+            return {name: [] for name in self.builders}
+
+        n_shards = min(total, self.workers * SHARDS_PER_WORKER)
+        bounds = np.linspace(0, total, n_shards + 1, dtype=np.int64)
+
+        shm, count = pack_texts(texts)
+        try:
+            futures = {
+                self.pool.submit(
+                    _score_shard, shm.name, count, int(bounds[k]), int(bounds[k + 1]),
+                    batch_size, max_tokens, chunking,
+                ): k
+                for k in range(n_shards)
+            }
+            shard_results = [None] * n_shards
+            done = 0
+            for future in as_completed(futures):
+                k = futures[future]
+                shard_results[k] = future.result()
+                if on_shard is not None:
+                    on_shard(range(int(bounds[k]), int(bounds[k + 1])), shard_results[k])
+                done += int(bounds[k + 1] - bounds[k])
+                print(f"  Shard {k + 1}/{n_shards} done ({done}/{total} comics)")
+        finally:
+            shm.close()
+            shm.unlink()
+
+        # Deterministic merge: concatenate shards in index order
+        return {
+            name: [result for shard in shard_results for result in shard[name]]
+            for name in self.builders
+        }
+
+
+def _one_model(name: str, on_results):
+    """Adapt a per-comic on_results callback to ShardedScorer's {name: results} shards."""
+    if on_results is None:
+        return None
+    return lambda indices, results: on_results(indices, results[name])
+
+
+def score_sharded(
+    module_name: str,
+    builder_name: str,
+    texts,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    cache=None,
+    workers: int = 2,
+    threads_per_worker: int = None,
+    backend: str = DEFAULT_BACKEND,
+    checkpoint=None,
+    dates=None,
+    chunking: str = None,
+) -> list:
+    """
+    One-model convenience wrapper: score `texts` on a throwaway pool.
+
+    With a ScoringCheckpoint (and the comics' `dates`), each worker shard
+    is saved as it finishes and already-checkpointed comics are skipped.
+    """
+    cache_path = cache.path if cache is not None else None
+    with ShardedScorer(
+        {module_name: (module_name, builder_name)},
+        workers,
+        threads_per_worker=threads_per_worker,
+        cache_path=cache_path,
+        backend=backend,
+    ) as scorer:
+        return run_checkpointed(
+            lambda todo, on_results=None: scorer.score(
+                todo, batch_size, max_tokens, chunking, _one_model(module_name, on_results)
+            )[module_name],
+            dates,
+            texts,
+            checkpoint,
+        )
+
+
+@contextmanager
+def open_scorer(
+    module_name: str,
+    builder_name: str,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    cache=None,
+    workers: int = 1,
+    threads_per_worker: int = None,
+    backend: str = DEFAULT_BACKEND,
+    chunking: str = None,
+):
+    """
+    Yield a score(texts, on_results=None) -> results function for one model
+    that stays loaded across calls: in this process, or on a worker pool if
+    workers > 1. Used by the streaming modes, which score the corpus chunk
+    by chunk.
+    """
+    if workers > 1:
+        cache_path = cache.path if cache is not None else None
+        with ShardedScorer(
+            {module_name: (module_name, builder_name)},
+            workers,
+            threads_per_worker=threads_per_worker,
+            cache_path=cache_path,
+            backend=backend,
+        ) as scorer:
+            yield lambda texts, on_results=None: scorer.score(
+                texts, batch_size, max_tokens, chunking, _one_model(module_name, on_results)
+            )[module_name]
+    else:
+        module = importlib.import_module(module_name)
+        classifier = getattr(module, builder_name)(backend=backend)
+        yield lambda texts, on_results=None: module.run_model(
+            classifier, texts, batch_size, max_tokens, cache=cache, chunking=chunking,
+            on_results=on_results,
+        )
@@ -0,0 +1,163 @@
+"""
+Streaming transcript reader for bounded-memory scoring.
+
+load_dataset() materialises the whole corpus (JSON dict -> Corpus ->
+DataFrame). That is fine for ~12k Dilbert strips, but the same tools should
+work on much larger archives. This module yields comics one at a time
+instead, from either source:
+
+  - the master JSON (data/dilbert_comics_transcripts.json), parsed
+    incrementally with json.JSONDecoder.raw_decode over a fixed-size buffer,
+    so only one entry is decoded at a time
+  - the per-year web shards (public/comics-data/<year>.json), read one year
+    file at a time in year order
+
+Both apply the same rules as parse_dataset(): entries without a transcript
+or without a four-digit year prefix are skipped. iter_comic_chunks() groups
+the stream into fixed-size chunks for the scoring loop.
+"""
+
+import json
+from pathlib import Path
+from typing import NamedTuple
+
+from .corpus import DATASET_PATH, parse_year
+
+
+SHARDS_DIR = Path(__file__).resolve().parents[2] / "public" / "comics-data"
+
+# Comics per scoring chunk in streaming mode
+DEFAULT_CHUNK_SIZE = 1024
+
+_READ_SIZE = 1 << 16
+_WHITESPACE = " \t\n\r"
+
+
+class ComicChunk(NamedTuple):
+    dates: list
+    years: list
+    texts: list
+
+
+def iter_json_object(f, read_size: int = _READ_SIZE):
+    """
+    Yield (key, value) pairs of a top-level JSON object from a text file
+    without loading the whole document.
+
+    Memory use is bounded by the largest single value plus one read buffer.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+
+    def fill():
+        nonlocal buffer, pos, eof
+        chunk = f.read(read_size)
+        if not chunk:
+            eof = True
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buffer) or eof:
+                return
+            fill()
+
+    def expect(char: str):
+        nonlocal pos
+        skip_whitespace()
+        if pos >= len(buffer) or buffer[pos] != char:
+            found = buffer[pos:pos + 20] if pos < len(buffer) else "end of file"
+            raise ValueError(f"Expected {char!r} in JSON stream, found {found!r}")
+        pos += 1
+
+    def decode():
+        nonlocal pos
+        while True:
+            skip_whitespace()
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+                continue
+            # A number at the very end of the buffer may be cut short
+            if end == len(buffer) and not eof and not isinstance(value, (str, dict, list)):
+                fill()
+                continue
+            pos = end
+            return value
+
+    fill()
+    expect("{")
+    skip_whitespace()
+    if pos < len(buffer) and buffer[pos] == "}":
+        return
+
+    while True:
+        key = decode()
+        expect(":")
+        value = decode()
+        yield key, value
+
+        skip_whitespace()
+        if pos < len(buffer) and buffer[pos] == ",":
+            pos += 1
+            continue
+        expect("}")
+        return
+
+
+def _comic_files(source: Path) -> list[Path]:
+    """The JSON file itself, or a shard directory's <year>.json files in order."""
+    if source.is_dir():
+        return sorted(p for p in source.glob("*.json") if p.stem.isdigit())
+    return [source]
+
+
+def iter_comics(source: Path = DATASET_PATH):
+    """
+    Yield (date, year, transcript) for every usable comic in `source`, which
+    is either the master JSON file or a directory of per-year shards.
+    """
+    source = Path(source)
+    if not source.exists():
+        raise FileNotFoundError(f"Comic source not found: {source}")
+
+    skipped = 0
+    for path in _comic_files(source):
+        with path.open("r", encoding="utf-8") as f:
+            for date_str, entry in iter_json_object(f):
+                transcript = (entry.get("transcript") or "").strip()
+                if not transcript:
+                    skipped += 1
+                    continue
+                try:
+                    year = parse_year(date_str)
+                except ValueError:
+                    skipped += 1
+                    continue
+                yield date_str, year, transcript
+
+    if skipped > 0:
+        print(f"Warning: Skipped {skipped} entries with missing transcripts or bad dates")
+
+
+def iter_comic_chunks(source: Path = DATASET_PATH, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """Group iter_comics() into ComicChunk(dates, years, texts) of up to chunk_size comics."""
+    chunk = ComicChunk([], [], [])
+    for date, year, text in iter_comics(source):
+        chunk.dates.append(date)
+        chunk.years.append(year)
+        chunk.texts.append(text)
+        if len(chunk.texts) >= chunk_size:
+            yield chunk
+            chunk = ComicChunk([], [], [])
+    if chunk.texts:
+        yield chunk
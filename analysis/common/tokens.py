@@ -0,0 +1,219 @@
+"""
+Pre-tokenized, memory-mapped token-id corpus.
+
+The buzzword tools used to regex-scan every transcript on each run, and
+with two different tokenizers (build_dictionary.py kept hyphenated words,
+buzzword_frequency_by_year.py split them). Now the corpus is tokenized
+once, with one canonical tokenizer, and stored next to the corpus cache:
+
+    data/.dilbert_comics_transcripts.tokens.cache/
+        meta.json     - sha256 of the source JSON, tokenizer pattern, sizes
+        vocab.txt     - one token per line; line number = token id
+        ids.npy       - uint32 token id per token, all comics concatenated
+        offsets.npy   - int64 offsets into ids.npy (length n + 1)
+
+Token ids are assigned in sorted vocabulary order, so vocab.txt is already
+the sorted dictionary. Downstream counting (per-comic term counts, document
+frequencies, n-grams) is vectorized numpy over the memory-mapped ids.
+"""
+
+import json
+import os
+import re
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+from .corpus import DATASET_PATH, Corpus, load_corpus, take_ranges
+
+
+TOKENS_FORMAT_VERSION = 1
+
+# The canonical tokenizer, applied to lowercased text:
+# - starts with a letter
+# - can include letters, digits, apostrophes, hyphens, underscores, slashes
+TOKEN_RE = re.compile(r"[a-z][a-z0-9'_/-]*")
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase and split a transcript into canonical tokens."""
+    return TOKEN_RE.findall(text.lower())
+
+
+def tokens_dir_for(dataset_path: Path) -> Path:
+    """Return the token cache directory that sits next to the given source file."""
+    return dataset_path.parent / f".{dataset_path.stem}.tokens.cache"
+
+
+class TokenCorpus:
+    """
+    Token ids per comic.
+
+    Attributes:
+      - vocab:   list of tokens, index = token id (sorted)
+      - ids:     uint32 array of token ids, all comics concatenated
+      - offsets: int64 array of length n + 1 into `ids`
+
+    When loaded from the cache, `ids` and `offsets` are read-only memory maps.
+    """
+
+    def __init__(self, vocab, ids, offsets, source_sha256: str = ""):
+        self.vocab = list(vocab)
+        self.ids = ids
+        self.offsets = offsets
+        self.source_sha256 = source_sha256
+        self._token_index = None
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def token_index(self) -> dict:
+        """token -> id (built on first use)."""
+        if self._token_index is None:
+            self._token_index = {token: i for i, token in enumerate(self.vocab)}
+        return self._token_index
+
+    def tokens(self, i: int) -> list[str]:
+        return [self.vocab[t] for t in self.ids[self.offsets[i]:self.offsets[i + 1]]]
+
+    def subset(self, rows) -> "TokenCorpus":
+        """The token ids of just the comics at `rows`, sharing this vocabulary."""
+        ids, offsets = take_ranges(self.ids, self.offsets, rows)
+        return TokenCorpus(self.vocab, ids, offsets)
+
+    def lengths(self) -> np.ndarray:
+        """Number of tokens per comic."""
+        return np.diff(self.offsets)
+
+    def comic_of_token(self) -> np.ndarray:
+        """Comic row for every position in `ids`."""
+        return np.repeat(np.arange(len(self), dtype=np.int64), self.lengths())
+
+    def token_counts(self) -> np.ndarray:
+        """Corpus frequency of every vocabulary entry."""
+        return np.bincount(self.ids, minlength=len(self.vocab))
+
+    def document_frequencies(self) -> np.ndarray:
+        """Number of comics each vocabulary entry occurs in."""
+        rows = self.comic_of_token()
+        pairs = np.unique(rows * len(self.vocab) + self.ids)
+        return np.bincount(pairs % len(self.vocab), minlength=len(self.vocab))
+
+    def ngram_starts(self, ngram) -> np.ndarray:
+        """
+        Positions in `ids` where the token sequence `ngram` starts, never
+        spanning two comics. Tokens not in the vocabulary match nowhere.
+        """
+        parts = [self.token_index.get(token) for token in ngram]
+        n = len(parts)
+        if None in parts or n == 0 or len(self.ids) < n:
+            return np.zeros(0, dtype=np.int64)
+
+        windows = len(self.ids) - n + 1
+        mask = np.ones(windows, dtype=bool)
+        for k, part in enumerate(parts):
+            mask &= self.ids[k:k + windows] == part
+        starts = np.flatnonzero(mask)
+
+        # Start and end must fall in the same comic
+        comic = np.searchsorted(self.offsets, starts, side="right")
+        return starts[starts + n <= self.offsets[comic]]
+
+
+def build_tokens(corpus: Corpus) -> TokenCorpus:
+    """Tokenize every transcript once and assign sorted vocabulary ids."""
+    provisional = {}
+    ids = []
+    offsets = [0]
+    for text in corpus.iter_texts():
+        for token in tokenize(text):
+            ids.append(provisional.setdefault(token, len(provisional)))
+        offsets.append(len(ids))
+
+    vocab = sorted(provisional)
+    remap = np.empty(len(provisional), dtype=np.uint32)
+    remap[[provisional[token] for token in vocab]] = np.arange(len(vocab), dtype=np.uint32)
+
+    return TokenCorpus(
+        vocab=vocab,
+        ids=remap[np.array(ids, dtype=np.int64)] if ids else np.zeros(0, dtype=np.uint32),
+        offsets=np.array(offsets, dtype=np.int64),
+        source_sha256=corpus.source_sha256,
+    )
+
+
+def write_tokens(tokens: TokenCorpus, tokens_dir: Path):
+    """Write a TokenCorpus to `tokens_dir` via a temporary sibling directory."""
+    tmp_dir = tokens_dir.with_name(tokens_dir.name + ".tmp")
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+    tmp_dir.mkdir(parents=True)
+
+    np.save(tmp_dir / "ids.npy", tokens.ids)
+    np.save(tmp_dir / "offsets.npy", tokens.offsets)
+    with (tmp_dir / "vocab.txt").open("w", encoding="utf-8") as f:
+        for token in tokens.vocab:
+            f.write(token + "\n")
+
+    meta = {
+        "format_version": TOKENS_FORMAT_VERSION,
+        "source_sha256": tokens.source_sha256,
+        "token_pattern": TOKEN_RE.pattern,
+        "rows": len(tokens),
+        "tokens": int(len(tokens.ids)),
+        "vocab_size": len(tokens.vocab),
+    }
+    with (tmp_dir / "meta.json").open("w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+    if tokens_dir.exists():
+        shutil.rmtree(tokens_dir)
+    os.replace(tmp_dir, tokens_dir)
+
+
+def read_tokens(tokens_dir: Path, source_sha256: str):
+    """Reopen a token cache memory-mapped, or return None if it is missing or stale."""
+    meta_path = tokens_dir / "meta.json"
+    if not meta_path.exists():
+        return None
+
+    with meta_path.open("r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("format_version") != TOKENS_FORMAT_VERSION:
+        return None
+    if meta.get("source_sha256") != source_sha256 or meta.get("token_pattern") != TOKEN_RE.pattern:
+        return None
+
+    with (tokens_dir / "vocab.txt").open("r", encoding="utf-8") as f:
+        vocab = f.read().splitlines()
+
+    return TokenCorpus(
+        vocab=vocab,
+        ids=np.load(tokens_dir / "ids.npy", mmap_mode="r"),
+        offsets=np.load(tokens_dir / "offsets.npy", mmap_mode="r"),
+        source_sha256=source_sha256,
+    )
+
+
+def load_tokens(dataset_path: Path = DATASET_PATH, corpus: Corpus = None) -> TokenCorpus:
+    """
+    Load the token-id corpus, tokenizing only when the source has changed.
+
+    Pass `corpus` if it is already loaded to avoid opening it twice.
+    """
+    if corpus is None:
+        corpus = load_corpus(dataset_path)
+
+    tokens_dir = tokens_dir_for(dataset_path)
+    tokens = read_tokens(tokens_dir, corpus.source_sha256)
+    if tokens is not None:
+        print(f"Using cached tokens: {tokens_dir}")
+        return tokens
+
+    print("Tokenizing corpus (one-off)...")
+    tokens = build_tokens(corpus)
+    write_tokens(tokens, tokens_dir)
+    print(f"Wrote {len(tokens.ids)} tokens ({len(tokens.vocab)} distinct) to: {tokens_dir}")
+    return tokens
@@ -0,0 +1,191 @@
+"""
+Per-host throughput profiles written by analysis/autotune.py.
+
+The best batch size and torch thread count differ a lot between models
+(distilbert vs. DeBERTa-large) and between machines. autotune.py times short
+trials on each host and records the winner here:
+
+    analysis/.cache/autotune.json
+        {"version": 1,
+         "hosts": {"<host id>": {"<model>/<backend>": {"batch_size": ...,
+                                                      "max_tokens": ...,
+                                                      "threads": ...,
+                                                      "comics_per_sec": ...,
+                                                      "peak_rss_mb": ...,
+                                                      "trials": [...]}}}}
+
+Hosts are identified by name, CPU model and usable CPU count, so one cache
+directory shared between machines keeps a profile for each of them. The
+scoring scripts look their model up with load_profile() (see
+common/cli.py) and use it whenever --batch-size, --max-tokens or the
+thread count are not given on the command line.
+"""
+
+import json
+import os
+import platform
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from .inference_cache import CACHE_DIR
+
+
+PROFILE_PATH = CACHE_DIR / "autotune.json"
+PROFILE_VERSION = 1
+
+
+def usable_cpus() -> int:
+    """CPUs this process may run on (respects container / taskset limits)."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def thread_cap():
+    """
+    The thread limit a parent process set through OMP_NUM_THREADS (as
+    pipeline.py does with each stage's CPU share), or None if unset.
+    """
+    try:
+        cap = int(os.environ.get("OMP_NUM_THREADS", ""))
+    except ValueError:
+        return None
+    return cap if cap > 0 else None
+
+
+def cpu_model() -> str:
+    """The CPU's marketing name where the OS exposes it."""
+    try:
+        with open("/proc/cpuinfo", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def host_id() -> str:
+    return f"{platform.node()}/{cpu_model()}/{usable_cpus()}cpu"
+
+
+def profile_key(model: str, backend: str) -> str:
+    return f"{model}/{backend}"
+
+
+def read_profiles(path: Path = PROFILE_PATH) -> dict:
+    if not path.exists():
+        return {"version": PROFILE_VERSION, "hosts": {}}
+    with path.open("r", encoding="utf-8") as f:
+        profiles = json.load(f)
+    if profiles.get("version") != PROFILE_VERSION:
+        return {"version": PROFILE_VERSION, "hosts": {}}
+    return profiles
+
+
+def load_profile(model: str, backend: str, path: Path = PROFILE_PATH):
+    """This host's tuned settings for `model` on `backend`, or None."""
+    try:
+        profiles = read_profiles(path)
+    except (OSError, json.JSONDecodeError):
+        return None
+    return profiles["hosts"].get(host_id(), {}).get(profile_key(model, backend))
+
+
+def save_profile(model: str, backend: str, profile: dict, path: Path = PROFILE_PATH):
+    """Record `profile` for this host, keeping every other host's entries."""
+    profiles = read_profiles(path)
+    profile = {**profile, "tuned_at": datetime.now(timezone.utc).isoformat(timespec="seconds")}
+    profiles["hosts"].setdefault(host_id(), {})[profile_key(model, backend)] = profile
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".json.tmp")
+    with tmp_path.open("w", encoding="utf-8") as f:
+        json.dump(profiles, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def set_torch_threads(threads: int):
+    """Set torch's intra-op thread count for this process."""
+    import torch
+
+    torch.set_num_threads(threads)
+
+
+def current_rss() -> int:
+    """Resident set size of this process in bytes."""
+    try:
+        with open("/proc/self/statm", "r", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # No procfs: fall back to the lifetime peak (KiB on Linux, bytes on macOS)
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if platform.system() == "Darwin" else peak * 1024
+
+
+class PeakRSS:
+    """
+    Track the highest resident set size while the block runs, by sampling it
+    from a background thread (the kernel's own high-water mark only ever
+    grows, so it can't tell trials in one process apart).
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, current_rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = current_rss()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+    @property
+    def peak_mb(self) -> float:
+        return self.peak / (1024 * 1024)
+
+
+def stratified_sample(lengths, size: int, strata: int = 8, seed: int = 0) -> np.ndarray:
+    """
+    Pick `size` indices spread over the length distribution.
+
+    Items are sorted by length and cut into `strata` equal-count bins, and
+    the same number is drawn at random from each, so even a small sample has
+    the corpus's mix of short dailies and long Sunday strips.
+    """
+    lengths = np.asarray(lengths)
+    if size >= len(lengths):
+        return np.arange(len(lengths))
+    rng = np.random.default_rng(seed)
+    bins = np.array_split(np.argsort(lengths, kind="stable"), strata)
+    picked = []
+    for k, members in enumerate(bins):
+        take = size // strata + (1 if k < size % strata else 0)
+        picked.append(rng.choice(members, size=min(take, len(members)), replace=False))
+    return np.sort(np.concatenate(picked))
+
+
+def timed(fn):
+    """Run fn() and return (result, seconds, peak RSS in MB)."""
+    with PeakRSS() as rss:
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+    return result, elapsed, rss.peak_mb
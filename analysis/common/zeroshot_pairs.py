@@ -0,0 +1,208 @@
+"""
+Zero-shot classification with a per-(premise, hypothesis) logit cache.
+
+The zero-shot pipeline turns every transcript into one NLI pair per
+candidate label ("<transcript>" / "This example is <label>.") and runs a
+forward pass for each pair. The pipeline can only cache whole results, so
+adding, removing or renaming one label would invalidate every transcript.
+
+Here each pair is cached on its own in the InferenceCache, keyed by the
+model, the hypothesis template, the hypothesis string and the transcript
+hash. The raw NLI logits are stored, so scores for any label set (and for
+multi_label on or off) are recomputed from cached logits. Only pairs that
+were never seen before cost a forward pass.
+"""
+
+import numpy as np
+
+from .inference import DEFAULT_BATCH_SIZE, DEFAULT_MAX_TOKENS, length_bucketed_batches
+from .inference_cache import model_key, text_sha256
+
+
+DEFAULT_HYPOTHESIS_TEMPLATE = "This example is {}."
+
+
+def entailment_ids(config) -> tuple[int, int]:
+    """Return (contradiction_id, entailment_id) the same way the pipeline does."""
+    entailment_id = -1
+    for label, idx in config.label2id.items():
+        if label.lower().startswith("entail"):
+            entailment_id = idx
+    contradiction_id = -1 if entailment_id == 0 else 0
+    return contradiction_id, entailment_id
+
+
+def pair_cache_key(classifier, hypothesis: str, hypothesis_template: str) -> str:
+    """Cache key for every pair that shares this model + hypothesis."""
+    model = classifier.model
+    model_id = getattr(model, "name_or_path", None) or type(model).__name__
+    revision = getattr(model.config, "_commit_hash", None) or "unknown"
+    options = {
+        "task": "nli-pair-logits",
+        "hypothesis_template": hypothesis_template,
+        "hypothesis": hypothesis,
+    }
+    backend = getattr(classifier, "inference_backend", "fp32")
+    if backend != "fp32":
+        options["backend"] = backend
+    return model_key(model_id, revision, options)
+
+
+def nli_logits(classifier, premises: list[str], hypotheses: list[str]) -> np.ndarray:
+    """Run one padded batch of (premise, hypothesis) pairs through the model."""
+    import torch
+
+    tokenizer = classifier.tokenizer
+    # Truncate only the transcript, never the hypothesis (as the pipeline does)
+    inputs = tokenizer(
+        premises,
+        hypotheses,
+        padding=True,
+        truncation="only_first",
+        return_tensors="pt",
+    )
+    inputs = {name: inputs[name].to(classifier.device) for name in tokenizer.model_input_names if name in inputs}
+    with torch.no_grad():
+        logits = classifier.model(**inputs).logits
+    return logits.float().cpu().numpy()
+
+
+def score_pairs(
+    classifier,
+    texts,
+    candidate_labels: list[str],
+    hypothesis_template: str = DEFAULT_HYPOTHESIS_TEMPLATE,
+    multi_label: bool = True,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    cache=None,
+    progress_every: int = 100,
+    on_results=None,
+) -> list[dict]:
+    """
+    Zero-shot classify `texts`, reusing cached pair logits where possible.
+
+    `batch_size` and `max_tokens` count NLI pairs, not transcripts. Returns
+    one result per text in the pipeline's format:
+      {"sequence": text, "labels": [...], "scores": [...]}  (sorted by score)
+
+    `on_results(indices, results)` is told about texts as they finish:
+    fully cached ones up front, the rest once their last pair is scored.
+    """
+    texts = list(texts)
+    hypotheses = [hypothesis_template.format(label) for label in candidate_labels]
+    hashes = [text_sha256(text) for text in texts]
+    keys = [pair_cache_key(classifier, h, hypothesis_template) for h in hypotheses]
+
+    # logits[text index][label index] -> np.ndarray of NLI class logits
+    logits = [[None] * len(candidate_labels) for _ in texts]
+    if cache is not None:
+        for j, key in enumerate(keys):
+            found = cache.get_many(key, hashes)
+            for i, text_hash in enumerate(hashes):
+                if text_hash in found:
+                    logits[i][j] = np.asarray(found[text_hash], dtype=np.float32)
+
+    # Pairs still missing, deduplicated by (transcript hash, label)
+    todo = {}
+    for i, text_hash in enumerate(hashes):
+        for j in range(len(candidate_labels)):
+            if logits[i][j] is None and (text_hash, j) not in todo:
+                todo[(text_hash, j)] = i
+    total_pairs = len(texts) * len(candidate_labels)
+    print(f"  Reused {total_pairs - len(todo)} of {total_pairs} (transcript, label) pairs, "
+          f"{len(todo)} to score")
+
+    def result(i):
+        return pair_logits_to_result(
+            texts[i], np.stack(logits[i]), candidate_labels, classifier.model.config, multi_label
+        )
+
+    # Labels each transcript hash still waits for, and the texts sharing it
+    waiting = {}
+    for text_hash, _ in todo:
+        waiting[text_hash] = waiting.get(text_hash, 0) + 1
+    copies = {}
+    for i, text_hash in enumerate(hashes):
+        copies.setdefault(text_hash, []).append(i)
+    if on_results is not None:
+        ready = [i for i, text_hash in enumerate(hashes) if text_hash not in waiting]
+        on_results(ready, [result(i) for i in ready])
+
+    if todo:
+        pairs = list(todo.items())
+        encoded = classifier.tokenizer(
+            [texts[i] for _, i in pairs],
+            [hypotheses[j] for (_, j), _ in pairs],
+            truncation="only_first",
+        )
+        lengths = [len(ids) for ids in encoded["input_ids"]]
+        batches = length_bucketed_batches(lengths, batch_size, max_tokens)
+
+        fresh = {}
+        done = 0
+        next_report = progress_every
+        for batch in batches:
+            batch_pairs = [pairs[p] for p in batch]
+            batch_logits = nli_logits(
+                classifier,
+                [texts[i] for _, i in batch_pairs],
+                [hypotheses[j] for (_, j), _ in batch_pairs],
+            )
+            per_key = {}
+            for ((text_hash, j), _), row in zip(batch_pairs, batch_logits):
+                fresh[(text_hash, j)] = row
+                per_key.setdefault(keys[j], {})[text_hash] = row.tolist()
+            if cache is not None:
+                for key, results in per_key.items():
+                    cache.put_many(key, results)
+
+            if on_results is not None:
+                finished = []
+                for (text_hash, j), _ in batch_pairs:
+                    waiting[text_hash] -= 1
+                    if waiting[text_hash] == 0:
+                        finished += copies[text_hash]
+                for i in finished:
+                    for j in range(len(candidate_labels)):
+                        if logits[i][j] is None:
+                            logits[i][j] = fresh[(hashes[i], j)]
+                if finished:
+                    on_results(finished, [result(i) for i in finished])
+
+            done += len(batch)
+            if done >= next_report or done == len(pairs):
+                print(f"  Scored {done}/{len(pairs)} pairs ({100*done/len(pairs):.1f}%)")
+                next_report = (done // progress_every + 1) * progress_every
+
+        for i, text_hash in enumerate(hashes):
+            for j in range(len(candidate_labels)):
+                if logits[i][j] is None:
+                    logits[i][j] = fresh[(text_hash, j)]
+
+    return [result(i) for i in range(len(texts))]
+
+
+def pair_logits_to_result(text, logits, candidate_labels, config, multi_label: bool) -> dict:
+    """
+    Turn one transcript's (n_labels x n_classes) NLI logits into a pipeline-style
+    result, using the same softmax rules as ZeroShotClassificationPipeline.
+    """
+    contradiction_id, entailment_id = entailment_ids(config)
+    if multi_label or len(candidate_labels) == 1:
+        # softmax over entailment vs. contradiction for each label independently
+        pair = logits[:, [contradiction_id, entailment_id]]
+        pair = np.exp(pair - pair.max(-1, keepdims=True))
+        scores = (pair / pair.sum(-1, keepdims=True))[:, 1]
+    else:
+        # softmax the entailment logits across all labels
+        entail = logits[:, entailment_id]
+        entail = np.exp(entail - entail.max())
+        scores = entail / entail.sum()
+
+    order = np.argsort(-scores, kind="stable")
+    return {
+        "sequence": text,
+        "labels": [candidate_labels[k] for k in order],
+        "scores": [float(scores[k]) for k in order],
+    }
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Agreement report: how far do the int8 / ONNX backends drift from fp32?
+
+For each selected classifier this scores the corpus (or a random sample of
+it) with eager fp32 and with every other backend, then reports per backend:
+
+  - label_agreement     share of comics whose label columns (e.g. top
+                        emotion, POSITIVE/NEGATIVE) match fp32
+  - mean_abs_diff       mean |score - fp32 score| over the numeric columns
+  - max_abs_diff        worst single-comic score difference
+  - yearly_max_diff     worst difference in a yearly mean, which is what the
+                        analysis scripts actually plot
+  - comics_per_sec      throughput, and speedup relative to fp32
+  - within_tolerance    yearly_max_diff <= --tolerance
+
+Pick the fastest backend that stays within tolerance and pass it to the
+scripts with --backend. The inference cache is bypassed here, so every
+backend really runs and the timings are comparable.
+
+Usage:
+    python analysis/compare_backends.py --models sentiment,sarcasm
+    python analysis/compare_backends.py --sample 1000 --backends int8,onnx-int8
+
+Output:
+    analysis/backend_reports/backend_agreement.csv
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from common.backends import BACKENDS, DEFAULT_BACKEND
+from common.corpus import DATASET_PATH, load_corpus
+from common.inference import DEFAULT_BATCH_SIZE, DEFAULT_MAX_TOKENS
+from score_all import MODELS
+
+
+REPORT_DIR = Path(__file__).resolve().parent / "backend_reports"
+REPORT_CSV = REPORT_DIR / "backend_agreement.csv"
+
+# Largest acceptable change in any yearly mean score
+DEFAULT_TOLERANCE = 0.01
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--models",
+        default=",".join(MODELS),
+        help=f"Comma-separated subset of: {', '.join(MODELS)} (default: all)",
+    )
+    candidates = [backend for backend in BACKENDS if backend != DEFAULT_BACKEND]
+    parser.add_argument(
+        "--backends",
+        default=",".join(candidates),
+        help=f"Backends to compare against fp32 (default: {','.join(candidates)})",
+    )
+    parser.add_argument(
+        "--sample",
+        type=int,
+        default=0,
+        help="Score a random sample of this many comics (default: whole corpus)",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Sampling seed (default: 0)")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help=f"Maximum allowed yearly mean difference (default: {DEFAULT_TOLERANCE})",
+    )
+    parser.add_argument("--dataset", type=Path, default=DATASET_PATH)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--max-tokens", type=int, default=DEFAULT_MAX_TOKENS)
+    return parser.parse_args()
+
+
+def select_comics(corpus, sample: int, seed: int):
+    """Return (texts, years) for the whole corpus or a reproducible sample."""
+    indices = np.arange(len(corpus))
+    if 0 < sample < len(corpus):
+        rng = np.random.default_rng(seed)
+        indices = np.sort(rng.choice(indices, size=sample, replace=False))
+    texts = [corpus.text(int(i)) for i in indices]
+    years = corpus.years[indices].astype(int)
+    return texts, years
+
+
+def score_with_backend(name: str, backend: str, texts, args):
+    """Build `name` on `backend`, score `texts` and return (columns, seconds)."""
+    module, build = MODELS[name]
+    classifier = build(backend)
+    start = time.perf_counter()
+    results = module.run_model(classifier, texts, args.batch_size, args.max_tokens)
+    elapsed = time.perf_counter() - start
+    return module.results_to_columns(results), elapsed
+
+
+def compare_columns(reference: pd.DataFrame, candidate: pd.DataFrame, years) -> dict:
+    """Label agreement and score differences between two results_to_columns() frames."""
+    numeric = [c for c in reference.columns if pd.api.types.is_numeric_dtype(reference[c])]
+    labels = [c for c in reference.columns if c not in numeric]
+
+    row = {}
+    if labels:
+        matches = (reference[labels].values == candidate[labels].values).all(axis=1)
+        row["label_agreement"] = float(matches.mean())
+    else:
+        row["label_agreement"] = np.nan
+
+    if numeric:
+        diff = (candidate[numeric] - reference[numeric]).abs()
+        row["mean_abs_diff"] = float(diff.values.mean())
+        row["max_abs_diff"] = float(diff.values.max())
+        yearly = (candidate[numeric] - reference[numeric]).groupby(years).mean()
+        row["yearly_max_diff"] = float(yearly.abs().values.max())
+    else:
+        row["mean_abs_diff"] = row["max_abs_diff"] = row["yearly_max_diff"] = np.nan
+    return row
+
+
+def main():
+    args = parse_args()
+    names = [name.strip() for name in args.models.split(",") if name.strip()]
+    backends = [backend.strip() for backend in args.backends.split(",") if backend.strip()]
+    for name in names:
+        if name not in MODELS:
+            raise SystemExit(f"Unknown model '{name}'. Choose from: {', '.join(MODELS)}")
+    for backend in backends:
+        if backend not in BACKENDS:
+            raise SystemExit(f"Unknown backend '{backend}'. Choose from: {', '.join(BACKENDS)}")
+
+    corpus = load_corpus(args.dataset)
+    texts, years = select_comics(corpus, args.sample, args.seed)
+    print(f"Comparing backends on {len(texts)} comics")
+
+    rows = []
+    for name in names:
+        print(f"\n[{name}] fp32 reference")
+        reference, fp32_seconds = score_with_backend(name, DEFAULT_BACKEND, texts, args)
+        rows.append({
+            "model": name,
+            "backend": DEFAULT_BACKEND,
+            "comics": len(texts),
+            **compare_columns(reference, reference, years),
+            "comics_per_sec": len(texts) / fp32_seconds,
+            "speedup": 1.0,
+        })
+
+        for backend in backends:
+            print(f"\n[{name}] {backend}")
+            columns, seconds = score_with_backend(name, backend, texts, args)
+            rows.append({
+                "model": name,
+                "backend": backend,
+                "comics": len(texts),
+                **compare_columns(reference, columns, years),
+                "comics_per_sec": len(texts) / seconds,
+                "speedup": fp32_seconds / seconds,
+            })
+
+    report = pd.DataFrame(rows)
+    report["within_tolerance"] = report["yearly_max_diff"].fillna(0) <= args.tolerance
+
+    REPORT_DIR.mkdir(parents=True, exist_ok=True)
+    report.to_csv(REPORT_CSV, index=False)
+
+    with pd.option_context("display.width", 160, "display.max_columns", None):
+        print("\n" + report.to_string(index=False, float_format=lambda x: f"{x:.4g}"))
+    print(f"\nSaved agreement report to: {REPORT_CSV}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Pin every classifier to a local snapshot, so scoring never needs the network.
+
+Downloads the current hub revision (or --revision) of each selected model
+into analysis/.cache/models/<org>--<name>/ (or $DILBERT_MODELS_DIR) and
+records the commit in pin.json. The scoring scripts then load the pinned
+files with the hub offline; see common/models.py. Models that are already
+pinned are skipped unless --refresh is given.
+
+Usage:
+    python analysis/pin_models.py
+    python analysis/pin_models.py --models sentiment,sarcasm
+    python analysis/pin_models.py --refresh      # move every pin to the latest revision
+"""
+
+import argparse
+import json
+import os
+from datetime import datetime, timezone
+
+from common.models import PIN_FILE, pinned_snapshot, snapshot_dir
+from score_all import MODELS
+
+import emotions_goemotions
+import emotions_sarcasm
+import emotions_zeroshot
+import yearly_sentiment
+
+
+MODEL_IDS = {
+    "sentiment": yearly_sentiment.SENTIMENT_MODEL,
+    "goemotions": emotions_goemotions.EMOTION_MODEL,
+    "sarcasm": emotions_sarcasm.SARCASM_MODEL,
+    "zeroshot": emotions_zeroshot.EMOTION_MODEL,
+}
+
+# Weights for frameworks the pipelines never load
+IGNORE_PATTERNS = ["*.h5", "*.msgpack", "*.ot", "*.tflite", "*.onnx", "onnx/*", "coreml/*"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--models",
+        default=",".join(MODELS),
+        help=f"Comma-separated subset of: {', '.join(MODELS)} (default: all)",
+    )
+    parser.add_argument("--revision", default=None, help="Hub revision to pin (default: latest)")
+    parser.add_argument("--refresh", action="store_true", help="Re-download models that are already pinned")
+    return parser.parse_args()
+
+
+def pin_model(model_id: str, revision: str = None):
+    from huggingface_hub import HfApi, snapshot_download
+
+    # Resolve a branch or tag to its commit so the pin can't move
+    revision = HfApi().model_info(model_id, revision=revision).sha
+    path = snapshot_dir(model_id)
+    print(f"Pinning {model_id} at {revision[:12]} into {path}")
+    snapshot_download(model_id, revision=revision, local_dir=path, ignore_patterns=IGNORE_PATTERNS)
+
+    pin = {
+        "model": model_id,
+        "revision": revision,
+        "pinned_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    tmp_path = path / f"{PIN_FILE}.tmp"
+    with tmp_path.open("w", encoding="utf-8") as f:
+        json.dump(pin, f, indent=2)
+    os.replace(tmp_path, path / PIN_FILE)
+
+
+def main():
+    args = parse_args()
+    names = [name.strip() for name in args.models.split(",") if name.strip()]
+    for name in names:
+        if name not in MODEL_IDS:
+            raise SystemExit(f"Unknown model '{name}'. Choose from: {', '.join(MODEL_IDS)}")
+
+    for name in names:
+        model_id = MODEL_IDS[name]
+        pinned = pinned_snapshot(model_id)
+        if pinned is not None and not args.refresh:
+            print(f"{name}: {model_id} already pinned at {(pinned[1] or 'unknown')[:12]}")
+            continue
+        pin_model(model_id, args.revision)
+
+
+if __name__ == "__main__":
+    main()
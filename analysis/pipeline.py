@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""
+Run the analysis stages that are out of date, independent ones in parallel.
+
+The buzzword workflow used to be a manual chain of scripts, and the
+sentiment / emotion scripts separate runs. This runner declares every stage
+with its script, the stages it depends on, its input files and its output
+files:
+
+    yearly_corpus -> dictionary -> buzzword_counts -> buzzword_top20
+    sentiment, sarcasm, goemotions, zeroshot    (independent)
+
+Hand-cleaning unique_words_raw.txt into unique_words_cleaned.txt stays a
+manual step; no stage reads the cleaned list.
+
+A stage's fingerprint is a sha256 over its input files' contents, its
+code (the script, its local helper modules and analysis/common/) and its
+command line. After a successful run the fingerprint and the output hashes
+are stored in analysis/.cache/pipeline/state.json. A stage is skipped while
+its fingerprint is unchanged and its outputs are still exactly what it
+wrote.
+
+Stages whose dependencies are done start as soon as they fit the CPU and
+memory budget, so e.g. the scoring models and the buzzword counts run side
+by side. Each stage's thread count is capped at its CPU share through the
+usual OMP/MKL environment variables, which also cap a tuned thread count
+from the autotune profile. The shared corpus and token caches are
+refreshed once before any stage starts. Output goes to
+analysis/.cache/pipeline/logs/<stage>.log.
+
+Usage:
+    python analysis/pipeline.py                      # everything that is stale
+    python analysis/pipeline.py buzzword_top20       # one stage and its dependencies
+    python analysis/pipeline.py --dry-run            # show what would run
+    python analysis/pipeline.py --force sarcasm      # rerun even if up to date
+    python analysis/pipeline.py --cpus 8 --memory-gb 12
+    python analysis/pipeline.py --scoring-args "--backend onnx-int8"
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shlex
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import NamedTuple
+
+ANALYSIS_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(ANALYSIS_DIR))
+
+from common.corpus import DATASET_PATH, file_sha256, load_corpus
+from common.inference_cache import CACHE_DIR
+from common.scores import SCORES_CSV
+from common.tokens import load_tokens
+
+
+PIPELINE_DIR = CACHE_DIR / "pipeline"
+STATE_PATH = PIPELINE_DIR / "state.json"
+LOG_DIR = PIPELINE_DIR / "logs"
+
+BUZZWORDS = ANALYSIS_DIR / "buzzwords"
+EMOTIONS = ANALYSIS_DIR / "yearly_emotions"
+SENTIMENT = ANALYSIS_DIR / "yearly_sentiment"
+
+
+class Stage(NamedTuple):
+    name: str
+    script: Path
+    inputs: list
+    outputs: list
+    deps: list = []
+    code: list = []        # local modules the script imports
+    args: list = []
+    cpus: int = 1
+    memory_gb: float = 0.5
+    scoring: bool = False  # accepts the shared scoring options (--backend, ...)
+
+
+STAGES = [
+    Stage(
+        name="yearly_corpus",
+        script=BUZZWORDS / "build_yearly_corpus.py",
+        inputs=[DATASET_PATH],
+        outputs=[BUZZWORDS / "yearly_corpus" / "manifest.json"],
+        code=[BUZZWORDS / "yearly_corpus.py"],
+    ),
+    Stage(
+        name="dictionary",
+        script=BUZZWORDS / "build_dictionary.py",
+        inputs=[DATASET_PATH],
+        outputs=[BUZZWORDS / "unique_words_raw.txt"],
+        deps=["yearly_corpus"],
+        code=[BUZZWORDS / "yearly_corpus.py"],
+    ),
+    Stage(
+        name="buzzword_counts",
+        script=BUZZWORDS / "buzzword_frequency_by_year.py",
+        inputs=[DATASET_PATH, BUZZWORDS / "buzzwords.txt"],
+        outputs=[
+            BUZZWORDS / "buzzword_matrix.npz",
+            BUZZWORDS / "buzzword_counts_by_year.csv",
+            BUZZWORDS / "buzzword_heatmap.png",
+        ],
+        # After dictionary, not beside it: both record their progress in
+        # yearly_corpus/consumers.json (read-modify-write)
+        deps=["yearly_corpus", "dictionary"],
+        code=[BUZZWORDS / "buzzword_matcher.py", BUZZWORDS / "buzzword_matrix.py", BUZZWORDS / "yearly_corpus.py"],
+    ),
+    Stage(
+        name="buzzword_top20",
+        script=BUZZWORDS / "plot_top20_buzzwords_heatmap.py",
+        inputs=[BUZZWORDS / "buzzword_matrix.npz"],
+        outputs=[BUZZWORDS / "buzzword_heatmap_top20.png"],
+        deps=["buzzword_counts"],
+        code=[BUZZWORDS / "buzzword_matrix.py", BUZZWORDS / "buzzword_matcher.py"],
+    ),
+    Stage(
+        name="sentiment",
+        script=SENTIMENT / "yearly_sentiment.py",
+        inputs=[DATASET_PATH, SCORES_CSV],
+        outputs=[SENTIMENT / "yearly_sentiment.csv", SENTIMENT / "yearly_sentiment.png"],
+        cpus=4,
+        memory_gb=2,
+        scoring=True,
+    ),
+    Stage(
+        name="sarcasm",
+        script=EMOTIONS / "emotions_sarcasm.py",
+        inputs=[DATASET_PATH, SCORES_CSV],
+        outputs=[
+            EMOTIONS / "emotions_sarcasm_output" / "emotions_sarcasm_stats.csv",
+            EMOTIONS / "emotions_sarcasm_output" / "emotions_sarcasm_trend.png",
+        ],
+        cpus=4,
+        memory_gb=2,
+        scoring=True,
+    ),
+    Stage(
+        name="goemotions",
+        script=EMOTIONS / "emotions_goemotions.py",
+        inputs=[DATASET_PATH, SCORES_CSV],
+        outputs=[
+            EMOTIONS / "emotions_goemotions_output" / "emotions_goemotions_counts.csv",
+            EMOTIONS / "emotions_goemotions_output" / "emotions_goemotions_proportions.csv",
+            EMOTIONS / "emotions_goemotions_output" / "emotions_goemotions_heatmap.png",
+        ],
+        cpus=4,
+        memory_gb=2,
+        scoring=True,
+    ),
+    Stage(
+        name="zeroshot",
+        script=EMOTIONS / "emotions_zeroshot.py",
+        inputs=[DATASET_PATH, SCORES_CSV],
+        outputs=[
+            EMOTIONS / "emotions_zeroshot_output" / "emotions_zeroshot.csv",
+            EMOTIONS / "emotions_zeroshot_output" / "emotions_zeroshot_heatmap.png",
+        ],
+        cpus=4,
+        memory_gb=5,
+        scoring=True,
+    ),
+]
+
+STAGES_BY_NAME = {stage.name: stage for stage in STAGES}
+
+
+# ------------------------------
+# Fingerprints
+# ------------------------------
+
+_hash_memo = {}
+
+
+def path_sha256(path: Path) -> str:
+    """Content hash of a file, or "missing" (memoized per size and mtime)."""
+    if not path.exists():
+        return "missing"
+    stat = path.stat()
+    key = (str(path), stat.st_size, stat.st_mtime_ns)
+    if key not in _hash_memo:
+        _hash_memo[key] = file_sha256(path)
+    return _hash_memo[key]
+
+
+def _relative(path: Path) -> str:
+    try:
+        return str(path.relative_to(ANALYSIS_DIR.parent))
+    except ValueError:
+        return str(path)
+
+
+def stage_command(stage: Stage, scoring_args: list[str]) -> list[str]:
+    return [sys.executable, str(stage.script), *stage.args, *(scoring_args if stage.scoring else [])]
+
+
+def stage_fingerprint(stage: Stage, command: list[str]) -> str:
+    """sha256 over the stage's inputs, code and command-line options."""
+    code = [stage.script, *stage.code, *sorted((ANALYSIS_DIR / "common").glob("*.py"))]
+    digest = hashlib.sha256()
+    digest.update(json.dumps(command[2:]).encode("utf-8"))
+    for path in [*stage.inputs, *code]:
+        digest.update(f"{_relative(path)}={path_sha256(path)}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def load_state() -> dict:
+    if not STATE_PATH.exists():
+        return {}
+    with STATE_PATH.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(state: dict):
+    PIPELINE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = STATE_PATH.with_suffix(".json.tmp")
+    with tmp_path.open("w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, STATE_PATH)
+
+
+def is_up_to_date(stage: Stage, fingerprint: str, state: dict) -> bool:
+    recorded = state.get(stage.name)
+    if recorded is None or recorded.get("fingerprint") != fingerprint:
+        return False
+    return all(
+        recorded["outputs"].get(_relative(path)) == path_sha256(path) for path in stage.outputs
+    )
+
+
+# ------------------------------
+# Scheduling
+# ------------------------------
+
+def total_memory_gb() -> float:
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / 1024 ** 3
+    except (ValueError, OSError, AttributeError):
+        return 8.0
+
+
+def select_stages(names: list[str]) -> list[Stage]:
+    """The named stages plus everything they depend on, in declaration order."""
+    wanted = set()
+
+    def add(name):
+        if name not in STAGES_BY_NAME:
+            raise SystemExit(f"Unknown stage '{name}'. Choose from: {', '.join(STAGES_BY_NAME)}")
+        if name not in wanted:
+            wanted.add(name)
+            for dep in STAGES_BY_NAME[name].deps:
+                add(dep)
+
+    for name in names or STAGES_BY_NAME:
+        add(name)
+    return [stage for stage in STAGES if stage.name in wanted]
+
+
+def start_stage(stage: Stage, command: list[str], cpus: int) -> subprocess.Popen:
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+    env = dict(os.environ)
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        env[var] = str(cpus)
+    log = (LOG_DIR / f"{stage.name}.log").open("w", encoding="utf-8")
+    # Scripts with relative paths (the buzzword ones) expect their own directory
+    process = subprocess.Popen(
+        command, cwd=stage.script.parent, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    log.close()
+    return process
+
+
+def run_pipeline(stages: list[Stage], args) -> bool:
+    """Run stale stages under the budget; return True if nothing failed."""
+    state = load_state()
+    scoring_args = shlex.split(args.scoring_args)
+    force = set(args.force or [])
+
+    pending = list(stages)
+    running = {}   # name -> (process, stage, fingerprint, cpus, memory, start time)
+    done, failed, would_run = set(), set(), set()
+    free_cpus, free_memory = args.cpus, args.memory_gb
+
+    while pending or running:
+        progress = False
+        for stage in list(pending):
+            if any(dep in failed for dep in stage.deps):
+                print(f"[skip] {stage.name}: a dependency failed")
+                pending.remove(stage)
+                failed.add(stage.name)
+                progress = True
+                continue
+            if not all(dep in done for dep in stage.deps):
+                continue
+
+            command = stage_command(stage, scoring_args)
+            fingerprint = stage_fingerprint(stage, command)
+            stale = (
+                stage.name in force
+                or any(dep in would_run for dep in stage.deps)
+                or not is_up_to_date(stage, fingerprint, state)
+            )
+            if not stale:
+                print(f"[up to date] {stage.name}")
+                pending.remove(stage)
+                done.add(stage.name)
+                progress = True
+                continue
+            if args.dry_run:
+                print(f"[would run] {stage.name}: {' '.join([_relative(stage.script), *command[2:]])}")
+                pending.remove(stage)
+                done.add(stage.name)
+                would_run.add(stage.name)
+                progress = True
+                continue
+
+            # Stages larger than the whole budget still run, alone
+            cpus = min(stage.cpus, args.cpus)
+            memory = min(stage.memory_gb, args.memory_gb)
+            if cpus > free_cpus or memory > free_memory:
+                continue
+            free_cpus -= cpus
+            free_memory -= memory
+            print(f"[start] {stage.name} ({cpus} CPU, {memory:g} GB)")
+            process = start_stage(stage, command, cpus)
+            running[stage.name] = (process, stage, fingerprint, cpus, memory, time.time())
+            pending.remove(stage)
+            progress = True
+
+        if not running:
+            if not progress and pending:
+                raise RuntimeError(f"Pipeline stalled with pending stages: {[s.name for s in pending]}")
+            continue
+
+        time.sleep(0.2)
+        for name, (process, stage, fingerprint, cpus, memory, started) in list(running.items()):
+            if process.poll() is None:
+                continue
+            del running[name]
+            free_cpus += cpus
+            free_memory += memory
+            elapsed = time.time() - started
+            log_path = LOG_DIR / f"{name}.log"
+            if process.returncode != 0:
+                print(f"[failed] {name} after {elapsed:.1f}s (exit {process.returncode}); see {log_path}")
+                failed.add(name)
+                continue
+
+            missing = [path for path in stage.outputs if not path.exists()]
+            if missing:
+                print(f"[failed] {name}: did not write {', '.join(_relative(p) for p in missing)}")
+                failed.add(name)
+                continue
+            state[name] = {
+                "fingerprint": fingerprint,
+                "outputs": {_relative(path): path_sha256(path) for path in stage.outputs},
+                "finished": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "seconds": round(elapsed, 1),
+            }
+            save_state(state)
+            done.add(name)
+            print(f"[done] {name} in {elapsed:.1f}s")
+
+    return not failed
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "stages",
+        nargs="*",
+        help=f"Stages to bring up to date, with their dependencies (default: all of {', '.join(STAGES_BY_NAME)})",
+    )
+    parser.add_argument("--force", nargs="+", metavar="STAGE", help="Run these stages even if up to date")
+    parser.add_argument("--dry-run", action="store_true", help="Only report which stages would run")
+    parser.add_argument(
+        "--cpus",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="CPU budget shared by concurrent stages (default: all cores)",
+    )
+    parser.add_argument(
+        "--memory-gb",
+        type=float,
+        default=round(total_memory_gb() * 0.8, 1),
+        help="Memory budget shared by concurrent stages (default: 80%% of RAM)",
+    )
+    parser.add_argument(
+        "--scoring-args",
+        default="",
+        help="Extra options for the scoring stages, e.g. \"--backend onnx-int8 --batch-size 16\"",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    stages = select_stages(args.stages)
+    if args.force:
+        select_stages(args.force)  # validate names
+
+    # Refresh the shared corpus and token caches once up front, so the
+    # stages running in parallel only ever read them
+    if DATASET_PATH.exists() and not args.dry_run:
+        load_tokens(DATASET_PATH, load_corpus(DATASET_PATH))
+
+    ok = run_pipeline(stages, args)
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
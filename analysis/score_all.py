@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Score every comic with all classifiers in a single pass.
+
+Instead of each analysis script loading the dataset, building its pipeline
+and walking the corpus separately, this runner:
+
+  1. loads the corpus once (via the shared columnar cache),
+  2. builds the selected classifiers once,
+  3. streams the corpus in chunks through every model, tokenizing each chunk
+     only once per distinct tokenizer (the GoEmotions and irony models both
+     use the roberta-base tokenizer, for example),
+  4. appends the per-comic results to one table:
+       analysis/comic_scores/comic_scores.csv
+     and every comic's full label distribution to each model's score store:
+       analysis/comic_scores/store/<model>/   (see common/score_store.py)
+
+The yearly aggregation scripts then read that table instead of re-running
+inference (see common/scores.py).
+
+Usage:
+    python analysis/score_all.py
+    python analysis/score_all.py --models sentiment,sarcasm --batch-size 16
+    python analysis/score_all.py --workers 8 --threads-per-worker 4
+    python analysis/score_all.py --backend onnx-int8
+    python analysis/score_all.py --chunked weighted   # panel by panel, no truncation
+    python analysis/score_all.py --resume      # continue an interrupted run
+
+Batch sizes and thread counts default to this host's autotune profiles
+(see analysis/autotune.py).
+"""
+
+import argparse
+import contextlib
+import os
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+ANALYSIS_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(ANALYSIS_DIR))
+sys.path.insert(0, str(ANALYSIS_DIR / "yearly_emotions"))
+sys.path.insert(0, str(ANALYSIS_DIR / "yearly_sentiment"))
+
+from common.backends import backend_options, set_inference_threads
+from common.checkpoint import ScoringCheckpoint, run_checkpointed
+from common.chunking import chunking_options
+from common.cli import add_scoring_arguments, tuned_settings
+from common.corpus import DATASET_PATH, load_corpus
+from common.inference import token_lengths, tokenizer_signature
+from common.inference_cache import InferenceCache
+from common.score_store import ScoreStoreWriter
+from common.scores import SCORES_CSV, SCORES_DIR, SCORES_META, write_scores_meta
+from common.sharding import ShardedScorer
+
+import emotions_goemotions
+import emotions_sarcasm
+import emotions_zeroshot
+import yearly_sentiment
+
+
+# name -> (script module, pipeline builder)
+# Each module provides CALL_KWARGS, run_model(), results_to_columns() and
+# score_vectors().
+MODELS = {
+    "sentiment": (yearly_sentiment, yearly_sentiment.build_sentiment_pipeline),
+    "goemotions": (emotions_goemotions, emotions_goemotions.build_emotion_pipeline),
+    "sarcasm": (emotions_sarcasm, emotions_sarcasm.build_sarcasm_pipeline),
+    "zeroshot": (emotions_zeroshot, emotions_zeroshot.build_emotion_pipeline),
+}
+
+DEFAULT_CHUNK_SIZE = 1024
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--models",
+        default=",".join(MODELS),
+        help=f"Comma-separated subset of: {', '.join(MODELS)} (default: all)",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help="Comics per streaming chunk; each chunk goes through every model",
+    )
+    parser.add_argument("--dataset", type=Path, default=DATASET_PATH)
+    parser.add_argument("--no-cache", action="store_true", help="Skip the inference cache")
+    add_scoring_arguments(parser)
+    return parser.parse_args()
+
+
+def build_classifiers(names: list[str], backend: str) -> dict:
+    classifiers = {}
+    for name in names:
+        if name not in MODELS:
+            raise SystemExit(f"Unknown model '{name}'. Choose from: {', '.join(MODELS)}")
+        _, build = MODELS[name]
+        print(f"Building {name} classifier...")
+        classifiers[name] = build(backend)
+    return classifiers
+
+
+def build_sharded_scorer(names: list[str], args, cache) -> ShardedScorer:
+    """Start a worker pool where every worker holds all selected models."""
+    builders = {
+        name: (MODELS[name][0].__name__, MODELS[name][1].__name__) for name in names
+    }
+    return ShardedScorer(
+        builders,
+        args.workers,
+        threads_per_worker=args.threads_per_worker,
+        cache_path=cache.path if cache is not None else None,
+        backend=args.backend,
+    )
+
+
+def score_chunk(classifiers: dict, texts: list[str], args, cache, settings: dict, on_results=None) -> dict:
+    """
+    Run one chunk of transcripts through every classifier in this process,
+    each with its own batch sizing and thread count (see tuned_settings).
+
+    Models run one after another, so a comic is finished once the last one
+    has scored it; `on_results(indices, records)` hears about it then.
+    """
+    # Tokenize once per distinct tokenizer and share the lengths. Chunked
+    # runs measure their panel chunks instead
+    lengths_by_signature = {}
+    results = {}
+    last = next(reversed(classifiers), None)
+    for name, classifier in classifiers.items():
+        module, _ = MODELS[name]
+        signature = tokenizer_signature(classifier.tokenizer)
+        if signature not in lengths_by_signature and args.chunked is None:
+            lengths_by_signature[signature] = token_lengths(classifier.tokenizer, texts)
+
+        print(f" [{name}]")
+        if settings[name]["threads"]:
+            set_inference_threads(classifier, settings[name]["threads"])
+        report = None
+        if on_results is not None and name == last:
+            def report(indices, last_results, name=name):
+                on_results(indices, [
+                    {**{earlier: results[earlier][i] for earlier in results}, name: result}
+                    for i, result in zip(indices, last_results)
+                ])
+        results[name] = module.run_model(
+            classifier,
+            texts,
+            batch_size=settings[name]["batch_size"],
+            max_tokens=settings[name]["max_tokens"],
+            cache=cache,
+            lengths=lengths_by_signature.get(signature),
+            chunking=args.chunked,
+            on_results=report,
+        )
+    return results
+
+
+def to_records(results: dict) -> list[dict]:
+    """{model name: results} as one {model name: result} record per comic."""
+    return [dict(zip(results, values)) for values in zip(*results.values())]
+
+
+def score_records(scorer, classifiers: dict, texts: list[str], args, cache, settings: dict,
+                  on_results=None) -> list[dict]:
+    """
+    Score texts with every model; return one {model name: result} record per
+    comic. Finished comics' records also go to `on_results(indices, records)`.
+    """
+    if scorer is not None:
+        # Workers share one batch sizing: the command line's, else the defaults
+        shared = tuned_settings(args)
+        on_shard = None
+        if on_results is not None:
+            def on_shard(indices, shard):
+                on_results(indices, to_records(shard))
+        results = scorer.score(texts, shared["batch_size"], shared["max_tokens"], args.chunked, on_shard)
+    else:
+        results = score_chunk(classifiers, texts, args, cache, settings, on_results)
+    return to_records(results)
+
+
+def results_table(results: dict) -> pd.DataFrame:
+    """Convert {model name: results} into prefixed per-comic columns."""
+    columns = []
+    for name, model_results in results.items():
+        module, _ = MODELS[name]
+        columns.append(module.results_to_columns(model_results).add_prefix(f"{name}."))
+    return pd.concat(columns, axis=1)
+
+
+def main():
+    args = parse_args()
+    names = [name.strip() for name in args.models.split(",") if name.strip()]
+
+    corpus = load_corpus(args.dataset)
+    total = len(corpus)
+    print(f"Scoring {total} comics with: {', '.join(names)}")
+
+    options = {
+        name: chunking_options(backend_options(MODELS[name][0].CALL_KWARGS, args.backend), args.chunked)
+        for name in names
+    }
+
+    # Every finished shard of comics is saved, so --resume can pick up after a crash
+    checkpoint = ScoringCheckpoint(
+        "score_all",
+        options,
+        resume=args.resume,
+        shard_size=args.checkpoint_every,
+    )
+
+    # Per-model batch sizing and threads from this host's autotune profiles
+    settings = {name: tuned_settings(args, name) for name in names}
+    for name in names:
+        if settings[name]["tuned"]:
+            print(f"Autotune profile for {name}: batch size {settings[name]['batch_size']}, "
+                  f"max tokens {settings[name]['max_tokens']}, "
+                  f"threads {settings[name]['threads'] or 'default'}")
+
+    cache = None if args.no_cache else InferenceCache()
+    if args.workers > 1:
+        scorer = build_sharded_scorer(names, args, cache)
+        classifiers = None
+    else:
+        scorer = None
+        classifiers = build_classifiers(names, args.backend)
+
+    SCORES_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_csv = SCORES_CSV.with_suffix(".csv.tmp")
+
+    with contextlib.ExitStack() as stores, tmp_csv.open("w", encoding="utf-8", newline="") as out:
+        writers = {
+            name: stores.enter_context(ScoreStoreWriter(name, options[name], corpus.source_sha256))
+            for name in names
+        }
+        for start in range(0, total, args.chunk_size):
+            end = min(start + args.chunk_size, total)
+            print(f"\nChunk {start}-{end} of {total}")
+            texts = [corpus.text(i) for i in range(start, end)]
+
+            chunk = pd.DataFrame(
+                {
+                    "date": corpus.dates[start:end].astype(str),
+                    "year": corpus.years[start:end].astype(int),
+                }
+            )
+            per_comic = run_checkpointed(
+                lambda todo, on_results=None: score_records(
+                    scorer, classifiers, todo, args, cache, settings, on_results
+                ),
+                chunk["date"],
+                texts,
+                checkpoint,
+            )
+            results = {name: [record[name] for record in per_comic] for name in names}
+            for name in names:
+                writers[name].append(chunk["date"], *MODELS[name][0].score_vectors(results[name]))
+            chunk = pd.concat([chunk, results_table(results)], axis=1)
+            chunk.to_csv(out, header=(start == 0), index=False)
+
+    if scorer is not None:
+        scorer.close()
+    os.replace(tmp_csv, SCORES_CSV)
+    write_scores_meta(options, corpus.source_sha256)
+
+    if cache is not None:
+        print(cache.report())
+        cache.close()
+    print(f"\nSaved per-comic scores to: {SCORES_CSV}")
+    print(f"Metadata: {SCORES_META}")
+
+
+if __name__ == "__main__":
+    main()
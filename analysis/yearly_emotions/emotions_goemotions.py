@@ -1,81 +1,38 @@
-import json
+import argparse
+import sys
 from pathlib import Path
-from datetime import datetime
 
 import pandas as pd
 import matplotlib.pyplot as plt
-import torch
-from transformers import pipeline
-
-
-DATASET_PATH = Path(__file__).parent.parent.parent / "data" / "dilbert_comics_transcripts.json"
-
-
-def load_dataset() -> pd.DataFrame:
-    """
-    Load the Dilbert transcripts and return a DataFrame with at least:
-      - date (string)
-      - year (int)
-      - text (full transcript)
-    
-    The JSON structure is:
-    {
-        "1989-04-16": {
-            "transcript": "FULL TEXT HERE",
-            "title": "...",
-            ...
-        },
-        ...
-    }
-    """
-    print(f"Loading dataset from: {DATASET_PATH}")
-    
-    if not DATASET_PATH.exists():
-        raise FileNotFoundError(
-            f"Dataset not found at {DATASET_PATH}. "
-            f"Please check the DATASET_PATH constant in this script."
-        )
-    
-    with DATASET_PATH.open("r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    rows = []
-    skipped = 0
-
-    # The JSON is a dictionary where keys are date strings and values are entry dicts
-    for date_str, entry in data.items():
-        # Extract the transcript text
-        transcript = entry.get('transcript', '')
-        
-        if not transcript:
-            skipped += 1
-            continue
-
-        # Parse year from date string (format: "YYYY-MM-DD")
-        try:
-            year = datetime.strptime(date_str, "%Y-%m-%d").year
-        except ValueError:
-            # Fallback: first 4 chars as year
-            try:
-                year = int(date_str[:4])
-            except (ValueError, IndexError):
-                skipped += 1
-                continue
-
-        rows.append(
-            {
-                "date": date_str,
-                "year": year,
-                "text": transcript.strip(),
-            }
-        )
 
-    if skipped > 0:
-        print(f"Warning: Skipped {skipped} entries with missing transcripts")
-    
-    df = pd.DataFrame(rows)
-    print(f"Loaded {len(df)} comics from dataset")
-    return df
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common.accumulators import YearlyCounts
+from common.backends import DEFAULT_BACKEND, apply_backend, backend_options
+from common.bootstrap import interval_columns, with_intervals
+from common.checkpoint import ScoringCheckpoint, run_checkpointed
+from common.chunking import chunking_options, run_chunked, score_map
+from common.cli import (
+    add_output_arguments,
+    add_scoring_arguments,
+    require_model_scores,
+    require_score_store,
+    resolve_scoring_arguments,
+)
+from common.corpus import load_dataset
+from common.inference import DEFAULT_BATCH_SIZE, DEFAULT_MAX_TOKENS, run_batched
+from common.inference_cache import InferenceCache
+from common.models import load_pipeline
+from common.score_store import ScoreStoreWriter, open_score_writer
+from common.scores import load_model_scores
+from common.sharding import open_scorer, score_sharded
+from common.stream import iter_comic_chunks
+
+
+# Hugging Face model (see common/models.py for pinned local snapshots)
+EMOTION_MODEL = "SamLowe/roberta-base-go_emotions"
+
+# Keyword arguments for every classifier call (also part of the cache key)
+CALL_KWARGS = {"truncation": True}
 
 
 def get_device():
@@ -83,6 +40,8 @@ def get_device():
     Determine the best available device for model inference.
     Priority: MPS (Apple Silicon) > CUDA (NVIDIA GPU) > CPU
     """
+    import torch
+
     if torch.backends.mps.is_available():
         return "mps"
     elif torch.cuda.is_available():
@@ -91,20 +50,29 @@ def get_device():
         return "cpu"
 
 
-def build_emotion_pipeline():
+def build_emotion_pipeline(backend: str = DEFAULT_BACKEND):
     """
     Build the GoEmotions classifier.
     We use SamLowe/roberta-base-go_emotions, which is widely used and well-documented.
     """
     device = get_device()
     print(f"Using device: {device}")
-    clf = pipeline(
+    clf = load_pipeline(
         "text-classification",
-        model="SamLowe/roberta-base-go_emotions",
+        EMOTION_MODEL,
         top_k=None,  # return scores for ALL labels
         device=device,
     )
-    return clf
+    return apply_backend(clf, backend)
+
+
+def top_emotion_from_result(result):
+    """
+    Pick (label, score) for the highest-scoring emotion from one pipeline
+    result, i.e. a list of {label, score} dicts (because top_k=None).
+    """
+    best = max(result, key=lambda x: x["score"])
+    return best["label"], best["score"]
 
 
 def get_top_emotion(classifier, text: str):
@@ -114,37 +82,124 @@ def get_top_emotion(classifier, text: str):
     """
     # classifier(text) returns a list with one element (for the single input),
     # which is itself a list of {label, score} dicts (because top_k=None).
-    result = classifier(text, truncation=True)[0]
-    best = max(result, key=lambda x: x["score"])
-    return best["label"], best["score"]
+    result = classifier(text, **CALL_KWARGS)[0]
+    return top_emotion_from_result(result)
 
 
-def compute_top_emotions(df: pd.DataFrame) -> pd.DataFrame:
+def results_to_columns(results: list) -> pd.DataFrame:
     """
-    Add two columns:
+    Turn pipeline results (one per comic) into per-comic columns:
       - top_emotion
       - top_emotion_score
     """
-    print("Building emotion classifier (this may take a moment on first run)...")
-    emotion_clf = build_emotion_pipeline()
-
     top_labels = []
     top_scores = []
-
-    total = len(df)
-    print(f"Computing emotions for {total} comics...")
-    
-    # Process with progress updates every 100 comics
-    for idx, text in enumerate(df["text"], 1):
-        if idx % 100 == 0 or idx == total:
-            print(f"  Processed {idx}/{total} comics ({100*idx/total:.1f}%)")
-        label, score = get_top_emotion(emotion_clf, text)
+    for result in results:
+        label, score = top_emotion_from_result(result)
         top_labels.append(label)
         top_scores.append(score)
+    return pd.DataFrame({"top_emotion": top_labels, "top_emotion_score": top_scores})
+
+
+def score_vectors(results: list):
+    """
+    All emotion scores of every comic, for the score store: returns
+    (labels in alphabetical order, one list of scores per comic).
+    """
+    maps = [score_map(result) for result in results]
+    labels = sorted(maps[0]) if maps else []
+    return labels, [[scores.get(label, 0.0) for label in labels] for scores in maps]
+
+
+def columns_from_store(store) -> pd.DataFrame:
+    """'year' plus the results_to_columns() columns, read back from a ScoreStore."""
+    scores = store.matrix()
+    return pd.DataFrame({
+        "year": store.years,
+        "top_emotion": pd.Series(store.labels)[scores.argmax(axis=1)].values,
+        "top_emotion_score": scores.max(axis=1),
+    })
+
+
+def run_model(classifier, texts, batch_size=DEFAULT_BATCH_SIZE, max_tokens=DEFAULT_MAX_TOKENS,
+              cache=None, lengths=None, chunking=None, on_results=None) -> list:
+    """
+    Score `texts` in length-bucketed batches and return one pipeline result
+    per text, in order. Shared by compute_*() and analysis/score_all.py.
+    Finished texts are also passed to `on_results(indices, results)`.
+    """
+    if chunking is not None:
+        # Panel by panel, then one aggregated result per comic (common/chunking.py)
+        return run_chunked(
+            lambda chunks, chunk_lengths, on_chunks: run_model(
+                classifier, chunks, batch_size, max_tokens, cache=cache, lengths=chunk_lengths,
+                on_results=on_chunks,
+            ),
+            classifier,
+            texts,
+            chunking,
+            on_results=on_results,
+        )
+    return run_batched(
+        classifier,
+        texts,
+        batch_size=batch_size,
+        max_tokens=max_tokens,
+        cache=cache,
+        lengths=lengths,
+        on_results=on_results,
+        **CALL_KWARGS,
+    )
+
+
+def compute_top_emotions(
+    df: pd.DataFrame,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    cache: InferenceCache = None,
+    workers: int = 1,
+    threads_per_worker: int = None,
+    backend: str = DEFAULT_BACKEND,
+    checkpoint: ScoringCheckpoint = None,
+    chunking: str = None,
+    store: ScoreStoreWriter = None,
+) -> pd.DataFrame:
+    """
+    Add two columns:
+      - top_emotion
+      - top_emotion_score
+    """
+    total = len(df)
+    if workers > 1:
+        print(f"Computing emotions for {total} comics on {workers} worker processes...")
+        results = score_sharded(
+            "emotions_goemotions", "build_emotion_pipeline", df["text"], batch_size, max_tokens,
+            cache=cache, workers=workers, threads_per_worker=threads_per_worker,
+            backend=backend, checkpoint=checkpoint, dates=df["date"],
+            chunking=chunking,
+        )
+    else:
+        print("Building emotion classifier (this may take a moment on first run)...")
+        emotion_clf = build_emotion_pipeline(backend)
+
+        print(f"Computing emotions for {total} comics...")
+        # Length-bucketed batches; results come back in df order
+        results = run_checkpointed(
+            lambda texts, on_results=None: run_model(
+                emotion_clf, texts, batch_size, max_tokens, cache=cache, chunking=chunking,
+                on_results=on_results,
+            ),
+            df["date"],
+            df["text"],
+            checkpoint,
+        )
+    columns = results_to_columns(results)
+    if store is not None:
+        store.append(df["date"], *score_vectors(results))
 
     df = df.copy()
-    df["top_emotion"] = top_labels
-    df["top_emotion_score"] = top_scores
+    for name in columns.columns:
+        df[name] = columns[name].values
     return df
 
 
@@ -176,8 +231,61 @@ def aggregate_by_year(df: pd.DataFrame) -> pd.DataFrame:
     return proportions, pivot
 
 
-def save_results(proportions: pd.DataFrame, counts: pd.DataFrame, out_dir: Path):
+def confidence_intervals(
+    df: pd.DataFrame, labels: list, resamples: int, confidence: float, seed: int
+) -> pd.DataFrame:
+    """
+    Bootstrap confidence intervals for every year's top-emotion proportions:
+    one <label>_ci_low / <label>_ci_high pair per label, indexed by year.
+    """
+    print(f"Bootstrapping {confidence:.0%} confidence intervals ({resamples} resamples)...")
+    # A proportion is the mean of a 0/1 indicator per comic
+    indicators = pd.get_dummies(df["top_emotion"]).reindex(columns=labels, fill_value=False)
+    return interval_columns(df["year"], indicators.astype(float), resamples, confidence, seed)
+
+
+def stream_top_emotions(
+    source: Path,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    cache: InferenceCache = None,
+    workers: int = 1,
+    threads_per_worker: int = None,
+    backend: str = DEFAULT_BACKEND,
+    checkpoint: ScoringCheckpoint = None,
+    chunking: str = None,
+    store: ScoreStoreWriter = None,
+):
+    """
+    Streaming equivalent of compute_top_emotions() + aggregate_by_year().
+
+    Comics are read from `source` (the dataset JSON or a shard directory)
+    and scored chunk by chunk; only per-year top-emotion counts are kept.
+    Returns (proportions, counts) like aggregate_by_year().
+    """
+    top_emotions = YearlyCounts()
+    with open_scorer(
+        "emotions_goemotions", "build_emotion_pipeline", batch_size, max_tokens,
+        cache=cache, workers=workers, threads_per_worker=threads_per_worker, backend=backend,
+        chunking=chunking,
+    ) as score:
+        streamed = 0
+        for chunk in iter_comic_chunks(source):
+            results = run_checkpointed(score, chunk.dates, chunk.texts, checkpoint)
+            top_emotions.update(chunk.years, results_to_columns(results)["top_emotion"])
+            if store is not None:
+                store.append(chunk.dates, *score_vectors(results))
+            streamed += len(chunk.texts)
+            print(f"Streamed {streamed} comics...")
+
+    return top_emotions.proportions("top_emotion"), top_emotions.counts("top_emotion")
+
+
+def save_results(proportions: pd.DataFrame, counts: pd.DataFrame, out_dir: Path, intervals: pd.DataFrame = None):
     out_dir.mkdir(parents=True, exist_ok=True)
+    if intervals is not None:
+        # Each emotion's column is followed by its _ci_low / _ci_high
+        proportions = with_intervals(proportions, intervals, list(proportions.columns))
     proportions.to_csv(out_dir / "emotions_goemotions_proportions.csv")
     counts.to_csv(out_dir / "emotions_goemotions_counts.csv")
 
@@ -213,24 +321,126 @@ def plot_heatmap(proportions: pd.DataFrame, out_dir: Path):
     plt.close(fig)
 
 
+def plot_trends(proportions: pd.DataFrame, intervals: pd.DataFrame, out_dir: Path, top_n: int = 6):
+    """
+    Line chart of the `top_n` most common top emotions by year, each with
+    its bootstrap confidence interval shaded, so that small years' swings
+    can be told apart from real shifts.
+    """
+    proportions = proportions.sort_index()
+    intervals = intervals.reindex(proportions.index)
+    labels = proportions.mean().sort_values(ascending=False).index[:top_n]
+
+    fig, ax = plt.subplots(figsize=(14, 6))
+    for label in labels:
+        (line,) = ax.plot(proportions.index, proportions[label], marker="o", markersize=3, label=label)
+        ax.fill_between(
+            proportions.index,
+            intervals[f"{label}_ci_low"],
+            intervals[f"{label}_ci_high"],
+            color=line.get_color(),
+            alpha=0.2,
+            linewidth=0,
+        )
+
+    ax.set_xlabel("Year")
+    ax.set_ylabel("Proportion of comics (top emotion)")
+    ax.set_title("Most Common Top Emotions by Year, with Bootstrap Confidence Intervals")
+    ax.legend(loc="best")
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    fig.tight_layout()
+    fig.savefig(out_dir / "emotions_goemotions_trends.png", dpi=150)
+    plt.close(fig)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Score Dilbert transcripts with GoEmotions and aggregate by year."
+    )
+    add_scoring_arguments(parser)
+    add_output_arguments(parser, Path(__file__).parent / "emotions_goemotions_output")
+    return resolve_scoring_arguments(parser.parse_args(), "goemotions")
+
+
 def main():
-    # Output directory relative to this script's location
-    out_dir = Path(__file__).parent / "emotions_goemotions_output"
+    args = parse_args()
 
-    print("Loading dataset...")
-    df = load_dataset()
+    out_dir = args.output_dir
 
-    print("Computing top emotions...")
-    df_with_emotions = compute_top_emotions(df)
+    options = chunking_options(backend_options(CALL_KWARGS, args.backend), args.chunked)
 
-    print("Aggregating by year...")
-    proportions, counts = aggregate_by_year(df_with_emotions)
+    if args.stream is not None:
+        # Bounded memory: score chunk by chunk, aggregate on the fly
+        print(f"Streaming comics from {args.stream}...")
+        checkpoint = ScoringCheckpoint(
+            "goemotions", options, resume=args.resume, shard_size=args.checkpoint_every
+        )
+        with InferenceCache() as cache, open_score_writer("goemotions", options, args.stream) as store:
+            proportions, counts = stream_top_emotions(
+                args.stream,
+                batch_size=args.batch_size,
+                max_tokens=args.max_tokens,
+                cache=cache,
+                workers=args.workers,
+                threads_per_worker=args.threads_per_worker,
+                backend=args.backend,
+                checkpoint=checkpoint,
+                chunking=args.chunked,
+                store=store,
+            )
+            print(cache.report())
+        if args.bootstrap:
+            # Streaming keeps no per-comic frame; the run's score store has every comic
+            df_with_emotions = columns_from_store(require_score_store("goemotions", options, args.stream))
+    else:
+        # Reuse per-comic results from score_all.py when they are up to date
+        if args.from_scores is not None:
+            # Stored scores only: no model is built and torch is never imported
+            df_with_emotions = require_model_scores("goemotions", options, args.from_scores)
+        else:
+            df_with_emotions = load_model_scores("goemotions", options)
+        if df_with_emotions is None:
+            print("Loading dataset...")
+            df = load_dataset()
+
+            print("Computing top emotions...")
+            # Results are flushed to checkpoint shards as they are scored
+            checkpoint = ScoringCheckpoint(
+                "goemotions", options, resume=args.resume, shard_size=args.checkpoint_every
+            )
+            with InferenceCache() as cache, open_score_writer("goemotions", options) as store:
+                df_with_emotions = compute_top_emotions(
+                    df,
+                    batch_size=args.batch_size,
+                    max_tokens=args.max_tokens,
+                    cache=cache,
+                    workers=args.workers,
+                    threads_per_worker=args.threads_per_worker,
+                    backend=args.backend,
+                    checkpoint=checkpoint,
+                    chunking=args.chunked,
+                    store=store,
+                )
+                print(cache.report())
+
+        print("Aggregating by year...")
+        proportions, counts = aggregate_by_year(df_with_emotions)
+
+    intervals = None
+    if args.bootstrap:
+        intervals = confidence_intervals(
+            df_with_emotions, list(proportions.columns), args.bootstrap, args.confidence, args.bootstrap_seed
+        )
 
     print("Saving CSVs...")
-    save_results(proportions, counts, out_dir)
+    save_results(proportions, counts, out_dir, intervals)
 
     print("Plotting heatmap...")
     plot_heatmap(proportions, out_dir)
+    if intervals is not None:
+        print("Plotting trends with confidence intervals...")
+        plot_trends(proportions, intervals, out_dir)
 
     print("Done.")
     print(f"Outputs saved in: {out_dir}")
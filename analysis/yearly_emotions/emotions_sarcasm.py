@@ -1,81 +1,41 @@
-import json
+import argparse
+import sys
 from pathlib import Path
-from datetime import datetime
 
 import pandas as pd
 import matplotlib.pyplot as plt
-import torch
-from transformers import pipeline
 
-
-DATASET_PATH = Path(__file__).parent.parent.parent / "data" / "dilbert_comics_transcripts.json"
-
-
-def load_dataset() -> pd.DataFrame:
-    """
-    Load the Dilbert transcripts and return a DataFrame with at least:
-      - date (string)
-      - year (int)
-      - text (full transcript)
-    
-    The JSON structure is:
-    {
-        "1989-04-16": {
-            "transcript": "FULL TEXT HERE",
-            "title": "...",
-            ...
-        },
-        ...
-    }
-    """
-    print(f"Loading dataset from: {DATASET_PATH}")
-    
-    if not DATASET_PATH.exists():
-        raise FileNotFoundError(
-            f"Dataset not found at {DATASET_PATH}. "
-            f"Please check the DATASET_PATH constant in this script."
-        )
-    
-    with DATASET_PATH.open("r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    rows = []
-    skipped = 0
-
-    # The JSON is a dictionary where keys are date strings and values are entry dicts
-    for date_str, entry in data.items():
-        # Extract the transcript text
-        transcript = entry.get('transcript', '')
-        
-        if not transcript:
-            skipped += 1
-            continue
-
-        # Parse year from date string (format: "YYYY-MM-DD")
-        try:
-            year = datetime.strptime(date_str, "%Y-%m-%d").year
-        except ValueError:
-            # Fallback: first 4 chars as year
-            try:
-                year = int(date_str[:4])
-            except (ValueError, IndexError):
-                skipped += 1
-                continue
-
-        rows.append(
-            {
-                "date": date_str,
-                "year": year,
-                "text": transcript.strip(),
-            }
-        )
-
-    if skipped > 0:
-        print(f"Warning: Skipped {skipped} entries with missing transcripts")
-    
-    df = pd.DataFrame(rows)
-    print(f"Loaded {len(df)} comics from dataset")
-    return df
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common.accumulators import YearlyMoments
+from common.backends import DEFAULT_BACKEND, apply_backend, backend_options
+from common.bootstrap import interval_columns, with_intervals
+from common.checkpoint import ScoringCheckpoint, run_checkpointed
+from common.chunking import chunking_options, run_chunked
+from common.cli import (
+    add_output_arguments,
+    add_scoring_arguments,
+    require_model_scores,
+    require_score_store,
+    resolve_scoring_arguments,
+)
+from common.corpus import load_dataset
+from common.inference import DEFAULT_BATCH_SIZE, DEFAULT_MAX_TOKENS, run_batched
+from common.inference_cache import InferenceCache
+from common.models import load_pipeline
+from common.score_store import ScoreStoreWriter, open_score_writer
+from common.scores import load_model_scores
+from common.sharding import open_scorer, score_sharded
+from common.stream import iter_comic_chunks
+
+
+# Hugging Face model (see common/models.py for pinned local snapshots)
+SARCASM_MODEL = "cardiffnlp/twitter-roberta-base-irony"
+
+# Columns of the stored score vectors (see score_vectors)
+SARCASM_LABELS = ["not_sarcastic", "sarcastic"]
+
+# Keyword arguments for every classifier call (also part of the cache key)
+CALL_KWARGS = {"truncation": True}
 
 
 def get_device():
@@ -83,6 +43,8 @@ def get_device():
     Determine the best available device for model inference.
     Priority: MPS (Apple Silicon) > CUDA (NVIDIA GPU) > CPU
     """
+    import torch
+
     if torch.backends.mps.is_available():
         return "mps"
     elif torch.cuda.is_available():
@@ -91,7 +53,7 @@ def get_device():
         return "cpu"
 
 
-def build_sarcasm_pipeline():
+def build_sarcasm_pipeline(backend: str = DEFAULT_BACKEND):
     """
     Build a sarcasm / irony classifier.
 
@@ -104,12 +66,12 @@ def build_sarcasm_pipeline():
     """
     device = get_device()
     print(f"Using device: {device}")
-    clf = pipeline(
+    clf = load_pipeline(
         "text-classification",
-        model="cardiffnlp/twitter-roberta-base-irony",
+        SARCASM_MODEL,
         device=device,
     )
-    return clf
+    return apply_backend(clf, backend)
 
 
 def get_sarcasm_score(classifier, text: str) -> float:
@@ -127,7 +89,15 @@ def get_sarcasm_score(classifier, text: str) -> float:
     as the "sarcastic" class. If the top label is the non-sarcastic class,
     we take (1 - score) as an approximate sarcasm probability.
     """
-    result = classifier(text, truncation=True)[0]
+    result = classifier(text, **CALL_KWARGS)[0]
+    return sarcasm_prob_from_result(result)
+
+
+def sarcasm_prob_from_result(result: dict) -> float:
+    """
+    Convert one pipeline result ({'label': ..., 'score': ...}) into a
+    sarcasm probability in [0, 1]. See get_sarcasm_score for the rules.
+    """
     label = result.get("label", "")
     score = float(result.get("score", 0.0))
 
@@ -149,28 +119,149 @@ def get_sarcasm_score(classifier, text: str) -> float:
     return sarcasm_prob
 
 
-def compute_sarcasm_scores(df: pd.DataFrame) -> pd.DataFrame:
+def results_to_columns(results: list) -> pd.DataFrame:
+    """Turn pipeline results (one per comic) into a 'sarcasm_score' column."""
+    return pd.DataFrame(
+        {"sarcasm_score": [sarcasm_prob_from_result(result) for result in results]}
+    )
+
+
+def score_vectors(results: list):
     """
-    Add a 'sarcasm_score' column to the DataFrame, with values in [0, 1].
+    Both class probabilities of every comic, for the score store: returns
+    (SARCASM_LABELS, one [p(not sarcastic), p(sarcastic)] pair per comic).
     """
-    print("Building sarcasm classifier (this may take a moment on first run)...")
-    sarcasm_clf = build_sarcasm_pipeline()
+    probs = [sarcasm_prob_from_result(result) for result in results]
+    return SARCASM_LABELS, [[1.0 - prob, prob] for prob in probs]
 
-    scores = []
-    total = len(df)
-    print(f"Computing sarcasm scores for {total} comics...")
 
-    for idx, text in enumerate(df["text"], 1):
-        if idx % 100 == 0 or idx == total:
-            print(f"  Processed {idx}/{total} comics ({100*idx/total:.1f}%)")
-        score = get_sarcasm_score(sarcasm_clf, text)
-        scores.append(score)
+def columns_from_store(store) -> pd.DataFrame:
+    """'year' and 'sarcasm_score' per comic, read back from a ScoreStore."""
+    return pd.DataFrame({"year": store.years, "sarcasm_score": store.column("sarcastic")})
+
+
+def run_model(classifier, texts, batch_size=DEFAULT_BATCH_SIZE, max_tokens=DEFAULT_MAX_TOKENS,
+              cache=None, lengths=None, chunking=None, on_results=None) -> list:
+    """
+    Score `texts` in length-bucketed batches and return one pipeline result
+    per text, in order. Shared by compute_*() and analysis/score_all.py.
+    Finished texts are also passed to `on_results(indices, results)`.
+    """
+    if chunking is not None:
+        # Panel by panel, then one aggregated result per comic (common/chunking.py)
+        return run_chunked(
+            lambda chunks, chunk_lengths, on_chunks: run_model(
+                classifier, chunks, batch_size, max_tokens, cache=cache, lengths=chunk_lengths,
+                on_results=on_chunks,
+            ),
+            classifier,
+            texts,
+            chunking,
+            on_results=on_results,
+        )
+    return run_batched(
+        classifier,
+        texts,
+        batch_size=batch_size,
+        max_tokens=max_tokens,
+        cache=cache,
+        lengths=lengths,
+        on_results=on_results,
+        **CALL_KWARGS,
+    )
+
+
+def compute_sarcasm_scores(
+    df: pd.DataFrame,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    cache: InferenceCache = None,
+    workers: int = 1,
+    threads_per_worker: int = None,
+    backend: str = DEFAULT_BACKEND,
+    checkpoint: ScoringCheckpoint = None,
+    chunking: str = None,
+    store: ScoreStoreWriter = None,
+) -> pd.DataFrame:
+    """
+    Add a 'sarcasm_score' column to the DataFrame, with values in [0, 1].
+    """
+    total = len(df)
+    if workers > 1:
+        print(f"Computing sarcasm scores for {total} comics on {workers} worker processes...")
+        results = score_sharded(
+            "emotions_sarcasm", "build_sarcasm_pipeline", df["text"], batch_size, max_tokens,
+            cache=cache, workers=workers, threads_per_worker=threads_per_worker,
+            backend=backend, checkpoint=checkpoint, dates=df["date"],
+            chunking=chunking,
+        )
+    else:
+        print("Building sarcasm classifier (this may take a moment on first run)...")
+        sarcasm_clf = build_sarcasm_pipeline(backend)
+
+        print(f"Computing sarcasm scores for {total} comics...")
+        # Length-bucketed batches; results come back in df order
+        results = run_checkpointed(
+            lambda texts, on_results=None: run_model(
+                sarcasm_clf, texts, batch_size, max_tokens, cache=cache, chunking=chunking,
+                on_results=on_results,
+            ),
+            df["date"],
+            df["text"],
+            checkpoint,
+        )
+    columns = results_to_columns(results)
+    if store is not None:
+        store.append(df["date"], *score_vectors(results))
 
     df = df.copy()
-    df["sarcasm_score"] = scores
+    df["sarcasm_score"] = columns["sarcasm_score"].values
     return df
 
 
+def stream_sarcasm_stats(
+    source: Path,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    cache: InferenceCache = None,
+    workers: int = 1,
+    threads_per_worker: int = None,
+    backend: str = DEFAULT_BACKEND,
+    checkpoint: ScoringCheckpoint = None,
+    chunking: str = None,
+    store: ScoreStoreWriter = None,
+) -> pd.DataFrame:
+    """
+    Streaming equivalent of compute_sarcasm_scores() + aggregate_by_year().
+
+    Comics are read from `source` (the dataset JSON or a shard directory)
+    and scored chunk by chunk, and only running per-year statistics are
+    kept, so memory stays flat however large the archive is.
+    """
+    moments = YearlyMoments(["sarcasm_score"])
+    with open_scorer(
+        "emotions_sarcasm", "build_sarcasm_pipeline", batch_size, max_tokens,
+        cache=cache, workers=workers, threads_per_worker=threads_per_worker, backend=backend,
+        chunking=chunking,
+    ) as score:
+        for chunk in iter_comic_chunks(source):
+            results = run_checkpointed(score, chunk.dates, chunk.texts, checkpoint)
+            moments.update(chunk.years, results_to_columns(results))
+            if store is not None:
+                store.append(chunk.dates, *score_vectors(results))
+            print(f"Streamed {int(moments.counts().sum())} comics...")
+
+    counts = moments.counts()
+    return pd.DataFrame(
+        {
+            "year": counts.index,
+            "mean_sarcasm": moments.means()["sarcasm_score"].values,
+            "std_sarcasm": moments.stds()["sarcasm_score"].values,
+            "comic_count": counts.values,
+        }
+    )
+
+
 def aggregate_by_year(df: pd.DataFrame) -> pd.DataFrame:
     """
     Aggregate sarcasm scores by year.
@@ -196,6 +287,21 @@ def aggregate_by_year(df: pd.DataFrame) -> pd.DataFrame:
     return stats
 
 
+def add_confidence_intervals(
+    stats: pd.DataFrame, df: pd.DataFrame, resamples: int, confidence: float, seed: int
+) -> pd.DataFrame:
+    """
+    Add mean_sarcasm_ci_low / mean_sarcasm_ci_high: a bootstrap confidence
+    interval for each year's mean, from the per-comic 'sarcasm_score'.
+    """
+    print(f"Bootstrapping {confidence:.0%} confidence intervals ({resamples} resamples)...")
+    intervals = interval_columns(
+        df["year"], df[["sarcasm_score"]].rename(columns={"sarcasm_score": "mean_sarcasm"}),
+        resamples, confidence, seed,
+    )
+    return with_intervals(stats.set_index("year"), intervals, ["mean_sarcasm"]).reset_index()
+
+
 def save_results(stats: pd.DataFrame, out_dir: Path):
     """
     Save the yearly sarcasm statistics to CSV.
@@ -208,13 +314,22 @@ def save_results(stats: pd.DataFrame, out_dir: Path):
 
 def plot_sarcasm_trend(stats: pd.DataFrame, out_dir: Path):
     """
-    Plot a simple line chart of mean sarcasm score by year.
+    Plot a simple line chart of mean sarcasm score by year, with the
+    bootstrap confidence interval shaded when `stats` has one.
     """
     out_dir.mkdir(parents=True, exist_ok=True)
     stats = stats.sort_values("year")
 
     fig, ax = plt.subplots(figsize=(12, 6))
     ax.plot(stats["year"], stats["mean_sarcasm"], marker="o")
+    if "mean_sarcasm_ci_low" in stats:
+        ax.fill_between(
+            stats["year"],
+            stats["mean_sarcasm_ci_low"],
+            stats["mean_sarcasm_ci_high"],
+            alpha=0.25,
+            linewidth=0,
+        )
 
     ax.set_xlabel("Year")
     ax.set_ylabel("Mean sarcasm score (0 = not sarcastic, 1 = highly sarcastic)")
@@ -237,18 +352,83 @@ def plot_sarcasm_trend(stats: pd.DataFrame, out_dir: Path):
     print(f"Sarcasm trend plot saved to: {out_path}")
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Score Dilbert transcripts for sarcasm/irony and aggregate by year."
+    )
+    add_scoring_arguments(parser)
+    add_output_arguments(parser, Path(__file__).parent / "emotions_sarcasm_output")
+    return resolve_scoring_arguments(parser.parse_args(), "sarcasm")
+
+
 def main():
-    # Output directory relative to this script's location
-    out_dir = Path(__file__).parent / "emotions_sarcasm_output"
+    args = parse_args()
 
-    print("Loading dataset...")
-    df = load_dataset()
+    out_dir = args.output_dir
 
-    print("Computing sarcasm scores...")
-    df_with_scores = compute_sarcasm_scores(df)
+    options = chunking_options(backend_options(CALL_KWARGS, args.backend), args.chunked)
 
-    print("Aggregating by year...")
-    yearly_stats = aggregate_by_year(df_with_scores)
+    if args.stream is not None:
+        # Bounded memory: score chunk by chunk, aggregate on the fly
+        print(f"Streaming comics from {args.stream}...")
+        checkpoint = ScoringCheckpoint(
+            "sarcasm", options, resume=args.resume, shard_size=args.checkpoint_every
+        )
+        with InferenceCache() as cache, open_score_writer("sarcasm", options, args.stream) as store:
+            yearly_stats = stream_sarcasm_stats(
+                args.stream,
+                batch_size=args.batch_size,
+                max_tokens=args.max_tokens,
+                cache=cache,
+                workers=args.workers,
+                threads_per_worker=args.threads_per_worker,
+                backend=args.backend,
+                checkpoint=checkpoint,
+                chunking=args.chunked,
+                store=store,
+            )
+            print(cache.report())
+        if args.bootstrap:
+            # Streaming keeps no per-comic frame; the run's score store has every comic
+            df_with_scores = columns_from_store(require_score_store("sarcasm", options, args.stream))
+    else:
+        # Reuse per-comic results from score_all.py when they are up to date
+        if args.from_scores is not None:
+            # Stored scores only: no model is built and torch is never imported
+            df_with_scores = require_model_scores("sarcasm", options, args.from_scores)
+        else:
+            df_with_scores = load_model_scores("sarcasm", options)
+        if df_with_scores is None:
+            print("Loading dataset...")
+            df = load_dataset()
+
+            print("Computing sarcasm scores...")
+            # Results are flushed to checkpoint shards as they are scored
+            checkpoint = ScoringCheckpoint(
+                "sarcasm", options, resume=args.resume, shard_size=args.checkpoint_every
+            )
+            with InferenceCache() as cache, open_score_writer("sarcasm", options) as store:
+                df_with_scores = compute_sarcasm_scores(
+                    df,
+                    batch_size=args.batch_size,
+                    max_tokens=args.max_tokens,
+                    cache=cache,
+                    workers=args.workers,
+                    threads_per_worker=args.threads_per_worker,
+                    backend=args.backend,
+                    checkpoint=checkpoint,
+                    chunking=args.chunked,
+                    store=store,
+                )
+                print(cache.report())
+
+        print("Aggregating by year...")
+        yearly_stats = aggregate_by_year(df_with_scores)
+
+    if args.bootstrap:
+        yearly_stats = add_confidence_intervals(
+            yearly_stats, df_with_scores, args.bootstrap, args.confidence, args.bootstrap_seed
+        )
 
     print("Saving CSV...")
     save_results(yearly_stats, out_dir)
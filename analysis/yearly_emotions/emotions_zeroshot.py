@@ -1,82 +1,36 @@
-import json
+import argparse
+import sys
 from pathlib import Path
-from datetime import datetime
 
 import pandas as pd
 import matplotlib.pyplot as plt
-import torch
-from transformers import pipeline
-
-
-DATASET_PATH = Path(__file__).parent.parent.parent / "data" / "dilbert_comics_transcripts.json"
-
-
-def load_dataset() -> pd.DataFrame:
-    """
-    Load the Dilbert transcripts and return a DataFrame with at least:
-      - date (string)
-      - year (int)
-      - text (full transcript)
-    
-    The JSON structure is:
-    {
-        "1989-04-16": {
-            "transcript": "FULL TEXT HERE",
-            "title": "...",
-            ...
-        },
-        ...
-    }
-    """
-    print(f"Loading dataset from: {DATASET_PATH}")
-    
-    if not DATASET_PATH.exists():
-        raise FileNotFoundError(
-            f"Dataset not found at {DATASET_PATH}. "
-            f"Please check the DATASET_PATH constant in this script."
-        )
-    
-    with DATASET_PATH.open("r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    rows = []
-    skipped = 0
-
-    # The JSON is a dictionary where keys are date strings and values are entry dicts
-    for date_str, entry in data.items():
-        # Extract the transcript text
-        transcript = entry.get('transcript', '')
-        
-        if not transcript:
-            skipped += 1
-            continue
-
-        # Parse year from date string (format: "YYYY-MM-DD")
-        try:
-            year = datetime.strptime(date_str, "%Y-%m-%d").year
-        except ValueError:
-            # Fallback: first 4 chars as year
-            try:
-                year = int(date_str[:4])
-            except (ValueError, IndexError):
-                skipped += 1
-                continue
-
-        rows.append(
-            {
-                "date": date_str,
-                "year": year,
-                "text": transcript.strip(),
-            }
-        )
-
-    if skipped > 0:
-        print(f"Warning: Skipped {skipped} entries with missing transcripts")
-    
-    df = pd.DataFrame(rows)
-    print(f"Loaded {len(df)} comics from dataset")
-    return df
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common.accumulators import YearlyMoments
+from common.backends import DEFAULT_BACKEND, apply_backend, backend_options
+from common.bootstrap import interval_columns, with_intervals
+from common.checkpoint import ScoringCheckpoint, run_checkpointed
+from common.chunking import chunking_options, run_chunked
+from common.cli import (
+    add_output_arguments,
+    add_scoring_arguments,
+    require_model_scores,
+    require_score_store,
+    resolve_scoring_arguments,
+)
+from common.corpus import load_dataset
+from common.inference import DEFAULT_BATCH_SIZE, DEFAULT_MAX_TOKENS
+from common.inference_cache import InferenceCache
+from common.models import load_pipeline
+from common.score_store import ScoreStoreWriter, open_score_writer
+from common.scores import load_model_scores
+from common.sharding import open_scorer, score_sharded
+from common.stream import iter_comic_chunks
+from common.zeroshot_pairs import DEFAULT_HYPOTHESIS_TEMPLATE, score_pairs
+
+
+# Hugging Face model (see common/models.py for pinned local snapshots)
+EMOTION_MODEL = "MoritzLaurer/deberta-v3-large-zeroshot-v1"
 
 CANDIDATE_LABELS = [
     "amusement",
@@ -89,12 +43,23 @@ CANDIDATE_LABELS = [
     "neutral",
 ]
 
+# Keyword arguments for every classifier call. The hypothesis template is
+# spelled out so that it is part of the per-pair cache key.
+CALL_KWARGS = {
+    "candidate_labels": CANDIDATE_LABELS,
+    "hypothesis_template": DEFAULT_HYPOTHESIS_TEMPLATE,
+    "multi_label": True,
+    "truncation": True,
+}
+
 
 def get_device():
     """
     Determine the best available device for model inference.
     Priority: MPS (Apple Silicon) > CUDA (NVIDIA GPU) > CPU
     """
+    import torch
+
     if torch.backends.mps.is_available():
         return "mps"
     elif torch.cuda.is_available():
@@ -103,7 +68,7 @@ def get_device():
         return "cpu"
 
 
-def build_emotion_pipeline():
+def build_emotion_pipeline(backend: str = DEFAULT_BACKEND):
     """Build a zero-shot emotion classifier.
 
     We use a DeBERTa v3 model fine-tuned for general-purpose zero-shot
@@ -112,12 +77,12 @@ def build_emotion_pipeline():
     """
     device = get_device()
     print(f"Using device: {device}")
-    clf = pipeline(
+    clf = load_pipeline(
         "zero-shot-classification",
-        model="MoritzLaurer/deberta-v3-large-zeroshot-v1",
+        EMOTION_MODEL,
         device=device,
     )
-    return clf
+    return apply_backend(clf, backend)
 
 
 def get_emotion_scores(classifier, text: str) -> dict:
@@ -126,13 +91,12 @@ def get_emotion_scores(classifier, text: str) -> dict:
     The zero-shot pipeline returns a dict with 'labels' and 'scores'. We
     normalise it into a fixed mapping for all labels in CANDIDATE_LABELS.
     """
-    result = classifier(
-        text,
-        candidate_labels=CANDIDATE_LABELS,
-        multi_label=True,
-        truncation=True,
-    )
+    result = classifier(text, **CALL_KWARGS)
+    return score_map_from_result(result)
+
 
+def score_map_from_result(result: dict) -> dict:
+    """Turn one zero-shot result ({'labels', 'scores'}) into a label -> score map."""
     labels = result["labels"]
     scores = result["scores"]
 
@@ -143,29 +107,113 @@ def get_emotion_scores(classifier, text: str) -> dict:
     return score_map
 
 
-def compute_emotion_scores(df: pd.DataFrame) -> pd.DataFrame:
-    """Add one column per emotion label with scores in [0, 1], plus 'top_emotion'."""
-    print("Building zero-shot emotion classifier (this may take a moment on first run)...")
-    emotion_clf = build_emotion_pipeline()
+def results_to_columns(results: list) -> pd.DataFrame:
+    """Turn pipeline results into one score column per label plus 'top_emotion'."""
+    columns = pd.DataFrame(
+        [score_map_from_result(result) for result in results],
+        columns=CANDIDATE_LABELS,
+    )
+    # Derive a 'top_emotion' column for convenience
+    columns["top_emotion"] = columns[CANDIDATE_LABELS].idxmax(axis=1)
+    return columns
+
 
+def score_vectors(results: list):
+    """Every label's score per comic, for the score store: (CANDIDATE_LABELS, rows)."""
     rows = []
-    total = len(df)
-    print(f"Computing emotion scores for {total} comics...")
+    for result in results:
+        scores = score_map_from_result(result)
+        rows.append([scores[label] for label in CANDIDATE_LABELS])
+    return CANDIDATE_LABELS, rows
 
-    for idx, text in enumerate(df["text"], 1):
-        if idx % 100 == 0 or idx == total:
-            print(f"  Processed {idx}/{total} comics ({100*idx/total:.1f}%)")
-        scores = get_emotion_scores(emotion_clf, text)
-        rows.append(scores)
 
-    scores_df = pd.DataFrame(rows)
+def columns_from_store(store) -> pd.DataFrame:
+    """'year' and one score column per label, read back from a ScoreStore."""
+    columns = pd.DataFrame(store.matrix(CANDIDATE_LABELS), columns=CANDIDATE_LABELS)
+    columns.insert(0, "year", store.years)
+    return columns
 
-    df = df.copy()
-    for label in CANDIDATE_LABELS:
-        df[label] = scores_df[label]
 
-    # Derive a 'top_emotion' column for convenience
-    df["top_emotion"] = df[CANDIDATE_LABELS].idxmax(axis=1)
+def run_model(classifier, texts, batch_size=DEFAULT_BATCH_SIZE, max_tokens=DEFAULT_MAX_TOKENS,
+              cache=None, lengths=None, chunking=None, on_results=None) -> list:
+    """
+    Score `texts` against CANDIDATE_LABELS and return one zero-shot result
+    per text, in order. Shared by compute_emotion_scores() and score_all.py.
+
+    Each (transcript, label) NLI pair is cached separately, so editing
+    CANDIDATE_LABELS only runs the model for labels it hasn't seen.
+    `batch_size`/`max_tokens` count NLI pairs. `lengths` is accepted for
+    interface compatibility but unused, since pairs are tokenized here.
+    Finished texts are also passed to `on_results(indices, results)`.
+    """
+    if chunking is not None:
+        # Panel by panel, then one aggregated result per comic (common/chunking.py)
+        return run_chunked(
+            lambda chunks, chunk_lengths, on_chunks: run_model(
+                classifier, chunks, batch_size, max_tokens, cache=cache, lengths=chunk_lengths,
+                on_results=on_chunks,
+            ),
+            classifier,
+            texts,
+            chunking,
+            on_results=on_results,
+        )
+    return score_pairs(
+        classifier,
+        texts,
+        CALL_KWARGS["candidate_labels"],
+        hypothesis_template=CALL_KWARGS["hypothesis_template"],
+        multi_label=CALL_KWARGS["multi_label"],
+        batch_size=batch_size,
+        max_tokens=max_tokens,
+        cache=cache,
+        on_results=on_results,
+    )
+
+
+def compute_emotion_scores(
+    df: pd.DataFrame,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    cache: InferenceCache = None,
+    workers: int = 1,
+    threads_per_worker: int = None,
+    backend: str = DEFAULT_BACKEND,
+    checkpoint: ScoringCheckpoint = None,
+    chunking: str = None,
+    store: ScoreStoreWriter = None,
+) -> pd.DataFrame:
+    """Add one column per emotion label with scores in [0, 1], plus 'top_emotion'."""
+    total = len(df)
+    if workers > 1:
+        print(f"Computing emotion scores for {total} comics on {workers} worker processes...")
+        results = score_sharded(
+            "emotions_zeroshot", "build_emotion_pipeline", df["text"], batch_size, max_tokens,
+            cache=cache, workers=workers, threads_per_worker=threads_per_worker,
+            backend=backend, checkpoint=checkpoint, dates=df["date"],
+            chunking=chunking,
+        )
+    else:
+        print("Building zero-shot emotion classifier (this may take a moment on first run)...")
+        emotion_clf = build_emotion_pipeline(backend)
+
+        print(f"Computing emotion scores for {total} comics...")
+        results = run_checkpointed(
+            lambda texts, on_results=None: run_model(
+                emotion_clf, texts, batch_size, max_tokens, cache=cache, chunking=chunking,
+                on_results=on_results,
+            ),
+            df["date"],
+            df["text"],
+            checkpoint,
+        )
+    columns = results_to_columns(results)
+    if store is not None:
+        store.append(df["date"], *score_vectors(results))
+
+    df = df.copy()
+    for name in columns.columns:
+        df[name] = columns[name].values
     return df
 
 
@@ -182,6 +230,50 @@ def aggregate_by_year(df: pd.DataFrame) -> pd.DataFrame:
     return mean_scores
 
 
+def add_confidence_intervals(
+    stats: pd.DataFrame, df: pd.DataFrame, resamples: int, confidence: float, seed: int
+) -> pd.DataFrame:
+    """Follow each label's yearly mean with its bootstrap <label>_ci_low / <label>_ci_high."""
+    print(f"Bootstrapping {confidence:.0%} confidence intervals ({resamples} resamples)...")
+    intervals = interval_columns(df["year"], df[CANDIDATE_LABELS], resamples, confidence, seed)
+    return with_intervals(stats.set_index("year"), intervals, CANDIDATE_LABELS).reset_index()
+
+
+def stream_emotion_stats(
+    source: Path,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    cache: InferenceCache = None,
+    workers: int = 1,
+    threads_per_worker: int = None,
+    backend: str = DEFAULT_BACKEND,
+    checkpoint: ScoringCheckpoint = None,
+    chunking: str = None,
+    store: ScoreStoreWriter = None,
+) -> pd.DataFrame:
+    """Streaming equivalent of compute_emotion_scores() + aggregate_by_year().
+
+    Comics are read from `source` (the dataset JSON or a shard directory)
+    and scored chunk by chunk; only running per-year means are kept.
+    """
+    moments = YearlyMoments(CANDIDATE_LABELS)
+    with open_scorer(
+        "emotions_zeroshot", "build_emotion_pipeline", batch_size, max_tokens,
+        cache=cache, workers=workers, threads_per_worker=threads_per_worker, backend=backend,
+        chunking=chunking,
+    ) as score:
+        for chunk in iter_comic_chunks(source):
+            results = run_checkpointed(score, chunk.dates, chunk.texts, checkpoint)
+            moments.update(chunk.years, results_to_columns(results))
+            if store is not None:
+                store.append(chunk.dates, *score_vectors(results))
+            print(f"Streamed {int(moments.counts().sum())} comics...")
+
+    mean_scores = moments.means().reset_index()
+    mean_scores["comic_count"] = moments.counts().values
+    return mean_scores
+
+
 def save_results(stats: pd.DataFrame, out_dir: Path):
     """Save yearly emotion statistics to CSV."""
     out_dir.mkdir(parents=True, exist_ok=True)
@@ -220,24 +312,126 @@ def plot_emotion_heatmap(stats: pd.DataFrame, out_dir: Path):
     print(f"Zero-shot emotion heatmap saved to: {out_path}")
 
 
+def plot_emotion_trends(stats: pd.DataFrame, out_dir: Path, top_n: int = 6):
+    """
+    Line chart of the `top_n` highest-scoring labels by year, each with its
+    bootstrap confidence interval shaded (stats must have the _ci columns).
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    stats = stats.sort_values("year")
+    labels = stats[CANDIDATE_LABELS].mean().sort_values(ascending=False).index[:top_n]
+
+    fig, ax = plt.subplots(figsize=(16, 6))
+    for label in labels:
+        (line,) = ax.plot(stats["year"], stats[label], marker="o", markersize=3, label=label)
+        ax.fill_between(
+            stats["year"],
+            stats[f"{label}_ci_low"],
+            stats[f"{label}_ci_high"],
+            color=line.get_color(),
+            alpha=0.2,
+            linewidth=0,
+        )
+
+    ax.set_xlabel("Year")
+    ax.set_ylabel("Mean emotion score (0–1)")
+    ax.set_title("Highest-Scoring Zero-shot Emotions by Year, with Bootstrap Confidence Intervals")
+    ax.legend(loc="best")
+
+    fig.tight_layout()
+    out_path = out_dir / "emotions_zeroshot_trends.png"
+    fig.savefig(out_path, dpi=150)
+    plt.close(fig)
+    print(f"Zero-shot emotion trends saved to: {out_path}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Score Dilbert transcripts with zero-shot emotion labels and aggregate by year."
+    )
+    add_scoring_arguments(parser)
+    add_output_arguments(parser, Path(__file__).parent / "emotions_zeroshot_output")
+    return resolve_scoring_arguments(parser.parse_args(), "zeroshot")
+
+
 def main():
-    # Output directory relative to this script's location
-    out_dir = Path(__file__).parent / "emotions_zeroshot_output"
+    args = parse_args()
 
-    print("Loading dataset...")
-    df = load_dataset()
+    out_dir = args.output_dir
 
-    print("Computing zero-shot emotion scores...")
-    df_with_scores = compute_emotion_scores(df)
+    options = chunking_options(backend_options(CALL_KWARGS, args.backend), args.chunked)
 
-    print("Aggregating by year...")
-    yearly_stats = aggregate_by_year(df_with_scores)
+    if args.stream is not None:
+        # Bounded memory: score chunk by chunk, aggregate on the fly
+        print(f"Streaming comics from {args.stream}...")
+        checkpoint = ScoringCheckpoint(
+            "zeroshot", options, resume=args.resume, shard_size=args.checkpoint_every
+        )
+        with InferenceCache() as cache, open_score_writer("zeroshot", options, args.stream) as store:
+            yearly_stats = stream_emotion_stats(
+                args.stream,
+                batch_size=args.batch_size,
+                max_tokens=args.max_tokens,
+                cache=cache,
+                workers=args.workers,
+                threads_per_worker=args.threads_per_worker,
+                backend=args.backend,
+                checkpoint=checkpoint,
+                chunking=args.chunked,
+                store=store,
+            )
+            print(cache.report())
+        if args.bootstrap:
+            # Streaming keeps no per-comic frame; the run's score store has every comic
+            df_with_scores = columns_from_store(require_score_store("zeroshot", options, args.stream))
+    else:
+        # Reuse per-comic results from score_all.py when they are up to date
+        if args.from_scores is not None:
+            # Stored scores only: no model is built and torch is never imported
+            df_with_scores = require_model_scores("zeroshot", options, args.from_scores)
+        else:
+            df_with_scores = load_model_scores("zeroshot", options)
+        if df_with_scores is None:
+            print("Loading dataset...")
+            df = load_dataset()
+
+            print("Computing zero-shot emotion scores...")
+            # Results are flushed to checkpoint shards as they are scored
+            checkpoint = ScoringCheckpoint(
+                "zeroshot", options, resume=args.resume, shard_size=args.checkpoint_every
+            )
+            with InferenceCache() as cache, open_score_writer("zeroshot", options) as store:
+                df_with_scores = compute_emotion_scores(
+                    df,
+                    batch_size=args.batch_size,
+                    max_tokens=args.max_tokens,
+                    cache=cache,
+                    workers=args.workers,
+                    threads_per_worker=args.threads_per_worker,
+                    backend=args.backend,
+                    checkpoint=checkpoint,
+                    chunking=args.chunked,
+                    store=store,
+                )
+                print(cache.report())
+
+        print("Aggregating by year...")
+        yearly_stats = aggregate_by_year(df_with_scores)
+
+    if args.bootstrap:
+        yearly_stats = add_confidence_intervals(
+            yearly_stats, df_with_scores, args.bootstrap, args.confidence, args.bootstrap_seed
+        )
 
     print("Saving CSV...")
     save_results(yearly_stats, out_dir)
 
     print("Plotting emotion heatmap...")
     plot_emotion_heatmap(yearly_stats, out_dir)
+    if args.bootstrap:
+        print("Plotting emotion trends with confidence intervals...")
+        plot_emotion_trends(yearly_stats, out_dir)
 
     print("Done.")
     print(f"Outputs saved in: {out_dir}")
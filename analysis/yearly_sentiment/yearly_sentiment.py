@@ -13,174 +13,250 @@ The dataset structure we expect:
 - Dates are in "YYYY-MM-DD" format
 """
 
-import json
+import argparse
+import sys
 from pathlib import Path
-from datetime import datetime
 import pandas as pd
 import matplotlib.pyplot as plt
-from transformers import pipeline
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common.accumulators import YearlyMoments
+from common.backends import DEFAULT_BACKEND, apply_backend, backend_options
+from common.bootstrap import interval_columns, with_intervals
+from common.checkpoint import ScoringCheckpoint, run_checkpointed
+from common.chunking import chunking_options, run_chunked, score_map
+from common.cli import (
+    add_output_arguments,
+    add_scoring_arguments,
+    require_model_scores,
+    require_score_store,
+    resolve_scoring_arguments,
+)
+from common.corpus import DATASET_PATH, load_dataset
+from common.inference import DEFAULT_BATCH_SIZE, DEFAULT_MAX_TOKENS, run_batched
+from common.inference_cache import InferenceCache
+from common.models import load_pipeline
+from common.score_store import ScoreStoreWriter, open_score_writer
+from common.scores import load_model_scores
+from common.sharding import open_scorer, score_sharded
+from common.stream import iter_comic_chunks
 
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
 
-# Path to the dataset file (relative to this script's location)
-# Adjust this if the dataset is moved or renamed
-DATASET_PATH = Path(__file__).parent.parent.parent / "data" / "dilbert_comics_transcripts.json"
+# The dataset path (data/dilbert_comics_transcripts.json) and its loader live in
+# analysis/common/corpus.py, shared with the other analysis scripts
 
 # Output files (saved in the same directory as this script)
 OUTPUT_DIR = Path(__file__).parent
 CSV_OUTPUT = OUTPUT_DIR / "yearly_sentiment.csv"
 PNG_OUTPUT = OUTPUT_DIR / "yearly_sentiment.png"
 
+# Hugging Face model used for sentiment analysis (see common/models.py for
+# pinned local snapshots)
+SENTIMENT_MODEL = "distilbert-base-uncased-finetuned-sst-2-english"
+
+# The model's two classes, as stored in the per-comic score vectors
+SENTIMENT_LABELS = ["NEGATIVE", "POSITIVE"]
+
+# Keyword arguments for every classifier call (also part of the cache key)
+CALL_KWARGS = {}
+
 # ============================================================================
-# DATASET LOADING
+# SENTIMENT ANALYSIS
 # ============================================================================
 
-def load_dataset(dataset_path: Path) -> pd.DataFrame:
+def build_sentiment_pipeline(backend: str = DEFAULT_BACKEND):
     """
-    Load the Dilbert transcript JSON dataset and convert it to a pandas DataFrame.
-    
-    We assume the JSON structure is:
-    {
-        "1989-04-16": {
-            "transcript": "FULL TEXT HERE",
-            "title": "...",
-            ...
-        },
-        ...
-    }
+    Build the sentiment analysis pipeline.
     
-    Args:
-        dataset_path: Path to the JSON file
-        
-    Returns:
-        DataFrame with columns: date, year, text
+    This model is pre-trained and ready to use - no training needed!
     """
-    print(f"Loading dataset from: {dataset_path}")
-    
-    if not dataset_path.exists():
-        raise FileNotFoundError(
-            f"Dataset not found at {dataset_path}. "
-            f"Please check the DATASET_PATH constant in this script."
-        )
-    
-    # Load the JSON file
-    with open(dataset_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    clf = load_pipeline("sentiment-analysis", SENTIMENT_MODEL)
     
-    print(f"Loaded {len(data)} comics from dataset")
-    
-    # Convert to list of records
-    records = []
-    skipped = 0
+    # Optionally swap in a quantized or ONNX Runtime model (see common/backends.py)
+    return apply_backend(clf, backend)
+
+
+def results_to_columns(results: list) -> pd.DataFrame:
+    """
+    Convert pipeline results (one per comic) into per-comic sentiment columns.
     
-    for date_str, entry in data.items():
-        # Extract the transcript text
-        transcript = entry.get('transcript', '')
+    Args:
+        results: One {'label': 'POSITIVE/NEGATIVE', 'score': 0.0-1.0} dict per comic
         
-        # Skip entries without transcript text
-        if not transcript or not transcript.strip():
-            skipped += 1
-            continue
+    Returns:
+        DataFrame with columns: sentiment_label, sentiment_score, sentiment_value
+    """
+    rows = []
+    for result in results:
+        label = result['label']  # 'POSITIVE' or 'NEGATIVE'
+        score = result['score']  # Confidence score (0.0 to 1.0)
         
-        # Parse the date to extract year
-        try:
-            date_obj = datetime.strptime(date_str, "%Y-%m-%d")
-            year = date_obj.year
-        except ValueError:
-            print(f"Warning: Could not parse date '{date_str}', skipping")
-            skipped += 1
-            continue
+        # Convert to numeric value for easier aggregation
+        # POSITIVE -> positive score, NEGATIVE -> negative score
+        # This gives us a range from -1.0 (very negative) to +1.0 (very positive)
+        if label == "POSITIVE":
+            sentiment_value = score
+        else:  # NEGATIVE
+            sentiment_value = -score
         
-        records.append({
-            'date': date_str,
-            'year': year,
-            'text': transcript.strip()
+        rows.append({
+            'sentiment_label': label,
+            'sentiment_score': score,
+            'sentiment_value': sentiment_value
         })
     
-    if skipped > 0:
-        print(f"Warning: Skipped {skipped} entries due to missing data")
-    
-    # Create DataFrame
-    df = pd.DataFrame(records)
+    return pd.DataFrame(rows, columns=['sentiment_label', 'sentiment_score', 'sentiment_value'])
+
+
+def score_vectors(results: list):
+    """
+    Both class probabilities per comic, for the score store.
     
-    print(f"Created DataFrame with {len(df)} comics")
-    print(f"Year range: {df['year'].min()} to {df['year'].max()}")
+    The pipeline only returns the winning label; the other one gets the
+    remaining probability (the model is a binary softmax).
     
-    return df
+    Returns:
+        (SENTIMENT_LABELS, one [p(NEGATIVE), p(POSITIVE)] pair per comic)
+    """
+    rows = []
+    for result in results:
+        scores = score_map(result, SENTIMENT_LABELS)
+        rows.append([scores.get(label, 0.0) for label in SENTIMENT_LABELS])
+    return SENTIMENT_LABELS, rows
 
 
-# ============================================================================
-# SENTIMENT ANALYSIS
-# ============================================================================
+def columns_from_store(store) -> pd.DataFrame:
+    """
+    Rebuild the per-comic columns of results_to_columns() (plus year) from
+    a ScoreStore, e.g. after a streaming run that kept no per-comic frame.
+    """
+    probs = store.matrix(SENTIMENT_LABELS)
+    positive = probs[:, 1] >= probs[:, 0]
+    score = probs.max(axis=1)
+    return pd.DataFrame({
+        'year': store.years,
+        'sentiment_label': pd.Series(SENTIMENT_LABELS)[positive.astype(int)].values,
+        'sentiment_score': score,
+        'sentiment_value': score * (2 * positive - 1),
+    })
+
 
-def compute_sentiment(df: pd.DataFrame) -> pd.DataFrame:
+def run_model(classifier, texts, batch_size=DEFAULT_BATCH_SIZE, max_tokens=DEFAULT_MAX_TOKENS,
+              cache=None, lengths=None, chunking=None, on_results=None) -> list:
+    """
+    Score texts in length-bucketed batches.
+    
+    Shared by compute_sentiment() and analysis/score_all.py.
+    
+    Finished texts are also passed to on_results(indices, results) as
+    their batches complete (for checkpointing).
+    
+    Returns:
+        One pipeline result per text, in the original order
+    """
+    if chunking is not None:
+        # Panel by panel, then one aggregated result per comic (common/chunking.py)
+        return run_chunked(
+            lambda chunks, chunk_lengths, on_chunks: run_model(
+                classifier, chunks, batch_size, max_tokens, cache=cache, lengths=chunk_lengths,
+                on_results=on_chunks,
+            ),
+            classifier,
+            texts,
+            chunking,
+            on_results=on_results,
+        )
+    return run_batched(
+        classifier,
+        texts,
+        batch_size=batch_size,
+        max_tokens=max_tokens,
+        cache=cache,
+        lengths=lengths,
+        on_results=on_results,
+        **CALL_KWARGS,
+    )
+
+
+def compute_sentiment(
+    df: pd.DataFrame,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    cache: InferenceCache = None,
+    workers: int = 1,
+    threads_per_worker: int = None,
+    backend: str = DEFAULT_BACKEND,
+    checkpoint: ScoringCheckpoint = None,
+    chunking: str = None,
+    store: ScoreStoreWriter = None,
+) -> pd.DataFrame:
     """
     Compute sentiment for each comic using a pre-trained Hugging Face model.
     
     This function:
     - Uses the distilbert-base-uncased-finetuned-sst-2-english model
-    - Applies sentiment analysis to each transcript
+    - Applies sentiment analysis to each transcript, in length-bucketed batches
     - Converts labels to numeric scores for easier aggregation
     
     Args:
         df: DataFrame with 'text' column
+        batch_size: Maximum number of comics per forward pass
+        max_tokens: Maximum padded tokens (comics x longest comic) per batch
+        cache: Optional InferenceCache; cached transcripts skip the model
+        workers: Number of worker processes (1 = run in this process)
+        threads_per_worker: torch threads per worker (default: CPUs / workers)
+        backend: Inference backend: fp32, int8, onnx or onnx-int8
+        checkpoint: Optional ScoringCheckpoint; results are saved shard by shard
+        chunking: Optional panel-chunk aggregation (mean, max or weighted),
+                  see common/chunking.py; None scores whole transcripts
+        store: Optional ScoreStoreWriter; receives both class probabilities per comic
         
     Returns:
         DataFrame with added columns: sentiment_label, sentiment_score, sentiment_value
     """
-    print("\nInitializing sentiment analyzer...")
-    print("(This may take a moment on first run as the model downloads)")
-    
-    # Initialize the sentiment analysis pipeline
-    # This model is pre-trained and ready to use - no training needed!
-    sentiment_analyzer = pipeline(
-        "sentiment-analysis",
-        model="distilbert-base-uncased-finetuned-sst-2-english"
-    )
-    
-    print("Sentiment analyzer ready. Processing comics...")
-    print("(This may take several minutes for thousands of comics)")
-    
-    # Apply sentiment analysis to each row
-    # We'll do this row-by-row to show progress
-    results = []
     total = len(df)
     
-    for idx, row in df.iterrows():
-        text = row['text']
+    if workers > 1:
+        # Shard the corpus across worker processes, each with its own model
+        print(f"\nScoring {total} comics on {workers} worker processes...")
+        outputs = score_sharded(
+            "yearly_sentiment", "build_sentiment_pipeline", df['text'], batch_size, max_tokens,
+            cache=cache, workers=workers, threads_per_worker=threads_per_worker,
+            backend=backend, checkpoint=checkpoint, dates=df['date'],
+            chunking=chunking,
+        )
+    else:
+        print("\nInitializing sentiment analyzer...")
+        print("(This may take a moment on first run as the model downloads)")
         
-        # Run sentiment analysis
-        # The pipeline returns a list with one dict: [{'label': 'POSITIVE/NEGATIVE', 'score': 0.0-1.0}]
-        result = sentiment_analyzer(text)[0]
+        sentiment_analyzer = build_sentiment_pipeline(backend)
         
-        label = result['label']  # 'POSITIVE' or 'NEGATIVE'
-        score = result['score']  # Confidence score (0.0 to 1.0)
-        
-        # Convert to numeric value for easier aggregation
-        # POSITIVE -> positive score, NEGATIVE -> negative score
-        # This gives us a range from -1.0 (very negative) to +1.0 (very positive)
-        if label == "POSITIVE":
-            sentiment_value = score
-        else:  # NEGATIVE
-            sentiment_value = -score
+        print("Sentiment analyzer ready. Processing comics...")
+        print("(This may take several minutes for thousands of comics)")
         
-        results.append({
-            'sentiment_label': label,
-            'sentiment_score': score,
-            'sentiment_value': sentiment_value
-        })
-        
-        # Show progress every 100 comics
-        if (idx + 1) % 100 == 0:
-            print(f"  Processed {idx + 1}/{total} comics...")
+        # Run sentiment analysis in batches of similar-length transcripts
+        # run_batched hands the results back in the original row order
+        outputs = run_checkpointed(
+            lambda texts, on_results=None: run_model(
+                sentiment_analyzer, texts, batch_size, max_tokens, cache=cache, chunking=chunking,
+                on_results=on_results,
+            ),
+            df['date'],
+            df['text'],
+            checkpoint,
+        )
+    
+    sentiment_df = results_to_columns(outputs)
+    if store is not None:
+        store.append(df["date"], *score_vectors(outputs))
     
     print(f"Completed sentiment analysis for {total} comics")
     
     # Add sentiment columns to the DataFrame
-    sentiment_df = pd.DataFrame(results)
-    df = pd.concat([df, sentiment_df], axis=1)
+    df = pd.concat([df.reset_index(drop=True), sentiment_df], axis=1)
     
     return df
 
@@ -223,6 +299,86 @@ def aggregate_by_year(df: pd.DataFrame) -> pd.DataFrame:
     return yearly_stats
 
 
+def add_confidence_intervals(
+    yearly_stats: pd.DataFrame,
+    df: pd.DataFrame,
+    resamples: int,
+    confidence: float,
+    seed: int,
+) -> pd.DataFrame:
+    """
+    Add bootstrap confidence intervals for each year's mean sentiment.
+    
+    Args:
+        yearly_stats: Output of aggregate_by_year() or stream_sentiment()
+        df: Per-comic frame with 'year' and 'sentiment_value' columns
+        resamples, confidence, seed: See common/bootstrap.py
+        
+    Returns:
+        yearly_stats with mean_sentiment_ci_low and mean_sentiment_ci_high
+    """
+    print(f"\nBootstrapping {confidence:.0%} confidence intervals ({resamples} resamples)...")
+    intervals = interval_columns(
+        df['year'], df[['sentiment_value']].rename(columns={'sentiment_value': 'mean_sentiment'}),
+        resamples, confidence, seed,
+    )
+    return with_intervals(yearly_stats.set_index('year'), intervals, ['mean_sentiment']).reset_index()
+
+
+def stream_sentiment(
+    source: Path,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    cache: InferenceCache = None,
+    workers: int = 1,
+    threads_per_worker: int = None,
+    backend: str = DEFAULT_BACKEND,
+    checkpoint: ScoringCheckpoint = None,
+    chunking: str = None,
+    store: ScoreStoreWriter = None,
+) -> pd.DataFrame:
+    """
+    Streaming equivalent of compute_sentiment() + aggregate_by_year().
+    
+    Comics are read incrementally and scored chunk by chunk. Each chunk is
+    folded into running per-year means and then dropped, so peak memory
+    stays flat no matter how large the archive is.
+    
+    Args:
+        source: The dataset JSON, or a directory of per-year shards
+                (e.g. public/comics-data)
+        (the remaining arguments are as for compute_sentiment)
+        
+    Returns:
+        DataFrame with columns: year, mean_sentiment, comic_count
+    """
+    moments = YearlyMoments(['sentiment_value'])
+    
+    with open_scorer(
+        "yearly_sentiment", "build_sentiment_pipeline", batch_size, max_tokens,
+        cache=cache, workers=workers, threads_per_worker=threads_per_worker, backend=backend,
+        chunking=chunking,
+    ) as score:
+        for chunk in iter_comic_chunks(source):
+            outputs = run_checkpointed(score, chunk.dates, chunk.texts, checkpoint)
+            moments.update(chunk.years, results_to_columns(outputs))
+            if store is not None:
+                store.append(chunk.dates, *score_vectors(outputs))
+            print(f"Streamed {int(moments.counts().sum())} comics...")
+    
+    counts = moments.counts()
+    yearly_stats = pd.DataFrame({
+        'year': counts.index,
+        'mean_sentiment': moments.means()['sentiment_value'].values,
+        'comic_count': counts.values,
+    })
+    
+    print(f"Aggregated data for {len(yearly_stats)} years")
+    print(f"Total comics analyzed: {yearly_stats['comic_count'].sum()}")
+    
+    return yearly_stats
+
+
 # ============================================================================
 # VISUALIZATION
 # ============================================================================
@@ -232,7 +388,8 @@ def plot_sentiment_trend(yearly_stats: pd.DataFrame, output_path: Path):
     Create a line chart showing sentiment trends over time.
     
     Args:
-        yearly_stats: DataFrame with 'year' and 'mean_sentiment' columns
+        yearly_stats: DataFrame with 'year' and 'mean_sentiment' columns (plus
+                      mean_sentiment_ci_low / _ci_high for the band, if present)
         output_path: Where to save the PNG file
     """
     print(f"\nGenerating visualization...")
@@ -251,6 +408,18 @@ def plot_sentiment_trend(yearly_stats: pd.DataFrame, output_path: Path):
         label='Average Sentiment'
     )
     
+    # Shade the bootstrap confidence interval, when there is one
+    if 'mean_sentiment_ci_low' in yearly_stats:
+        ax.fill_between(
+            yearly_stats['year'],
+            yearly_stats['mean_sentiment_ci_low'],
+            yearly_stats['mean_sentiment_ci_high'],
+            color='#3b82f6',
+            alpha=0.2,
+            linewidth=0,
+            label='Confidence interval (bootstrap)'
+        )
+    
     # Add a horizontal line at y=0 (neutral sentiment)
     ax.axhline(y=0, color='gray', linestyle='--', linewidth=1, alpha=0.5, label='Neutral')
     
@@ -291,38 +460,114 @@ def plot_sentiment_trend(yearly_stats: pd.DataFrame, output_path: Path):
 # MAIN WORKFLOW
 # ============================================================================
 
+def parse_args():
+    """
+    Parse command-line options (batch sizing, CPU worker processes and outputs).
+    """
+    parser = argparse.ArgumentParser(
+        description="Year-by-year sentiment analysis for Dilbert transcripts"
+    )
+    add_scoring_arguments(parser)
+    add_output_arguments(parser, OUTPUT_DIR)
+    return resolve_scoring_arguments(parser.parse_args(), "sentiment")
+
+
 def main():
     """
     Main function that orchestrates the entire analysis workflow.
     """
+    args = parse_args()
+    
     print("=" * 70)
     print("Year-by-Year Sentiment Analysis for Dilbert Transcripts")
     print("=" * 70)
     
+    csv_output = args.output_dir / CSV_OUTPUT.name
+    png_output = args.output_dir / PNG_OUTPUT.name
+    
     try:
-        # Step 1: Load the dataset
-        df = load_dataset(DATASET_PATH)
+        options = chunking_options(backend_options(CALL_KWARGS, args.backend), args.chunked)
         
-        # Step 2: Compute sentiment for each comic
-        df = compute_sentiment(df)
+        if args.stream is not None:
+            # Steps 1-3 in bounded memory: stream, score and aggregate on the fly
+            print(f"\nStreaming comics from {args.stream}...")
+            checkpoint = ScoringCheckpoint(
+                "sentiment", options, resume=args.resume, shard_size=args.checkpoint_every
+            )
+            with InferenceCache() as cache, open_score_writer("sentiment", options, args.stream) as store:
+                yearly_stats = stream_sentiment(
+                    args.stream,
+                    batch_size=args.batch_size,
+                    max_tokens=args.max_tokens,
+                    cache=cache,
+                    workers=args.workers,
+                    threads_per_worker=args.threads_per_worker,
+                    backend=args.backend,
+                    checkpoint=checkpoint,
+                    chunking=args.chunked,
+                    store=store,
+                )
+                print(cache.report())
+            if args.bootstrap:
+                # Streaming keeps no per-comic frame; the run's score store has every comic
+                df = columns_from_store(require_score_store("sentiment", options, args.stream))
+        else:
+            # Steps 1-2 can be skipped when score_all.py already produced
+            # up-to-date per-comic sentiment for this dataset
+            if args.from_scores is not None:
+                # Stored scores only: no model is built and torch is never imported
+                df = require_model_scores("sentiment", options, args.from_scores)
+            else:
+                df = load_model_scores("sentiment", options)
+            if df is None:
+                # Step 1: Load the dataset
+                df = load_dataset(DATASET_PATH)
+                
+                # Step 2: Compute sentiment for each comic
+                # Unchanged transcripts are served from the persistent inference cache,
+                # and results are flushed to checkpoint shards as they are scored
+                checkpoint = ScoringCheckpoint(
+                    "sentiment", options, resume=args.resume, shard_size=args.checkpoint_every
+                )
+                with InferenceCache() as cache, open_score_writer("sentiment", options, DATASET_PATH) as store:
+                    df = compute_sentiment(
+                        df,
+                        batch_size=args.batch_size,
+                        max_tokens=args.max_tokens,
+                        cache=cache,
+                        workers=args.workers,
+                        threads_per_worker=args.threads_per_worker,
+                        backend=args.backend,
+                        checkpoint=checkpoint,
+                        chunking=args.chunked,
+                        store=store,
+                    )
+                    print(cache.report())
+            
+            # Step 3: Aggregate by year
+            yearly_stats = aggregate_by_year(df)
         
-        # Step 3: Aggregate by year
-        yearly_stats = aggregate_by_year(df)
+        # Step 3b: Uncertainty of each year's mean
+        if args.bootstrap:
+            yearly_stats = add_confidence_intervals(
+                yearly_stats, df, args.bootstrap, args.confidence, args.bootstrap_seed
+            )
         
         # Step 4: Save results to CSV
-        yearly_stats.to_csv(CSV_OUTPUT, index=False)
-        print(f"\nSaved yearly statistics to: {CSV_OUTPUT}")
+        args.output_dir.mkdir(parents=True, exist_ok=True)
+        yearly_stats.to_csv(csv_output, index=False)
+        print(f"\nSaved yearly statistics to: {csv_output}")
         
         # Step 5: Create and save visualization
-        plot_sentiment_trend(yearly_stats, PNG_OUTPUT)
+        plot_sentiment_trend(yearly_stats, png_output)
         
         # Step 6: Print summary
         print("\n" + "=" * 70)
         print("Analysis Complete!")
         print("=" * 70)
         print(f"\nOutput files:")
-        print(f"  CSV: {CSV_OUTPUT}")
-        print(f"  PNG: {PNG_OUTPUT}")
+        print(f"  CSV: {csv_output}")
+        print(f"  PNG: {png_output}")
         print(f"\nSummary statistics:")
         print(yearly_stats.describe())
         print(f"\nFirst few years:")
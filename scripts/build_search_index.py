@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Build the full-transcript search indexes for the web viewer (see
+search_index.py for the formats):
+
+    public/search-index/words/      word -> comics, sharded by word prefix
+    public/search-index/trigrams/   trigram -> comics, sharded by trigram hash;
+                                    answers the viewer's substring search
+
+Comic ids are positions in public/comics-index.json `dates`, so the indexes
+must be rebuilt whenever the shards are (run it after build_web_shards.py).
+Like the shard build it is incremental: only shards whose bytes changed are
+rewritten.
+
+--verify N runs N random queries through both index readers and against a
+brute-force scan of every transcript, and fails if any result differs.
+--benchmark compares trigram candidate-set sizes and query latency with the
+brute-force substring scan. --query looks up one query (as a substring,
+like the viewer) and prints the matching dates.
+
+Usage:
+    python scripts/build_search_index.py
+    python scripts/build_search_index.py --verify 500
+    python scripts/build_search_index.py --benchmark
+    python scripts/build_search_index.py --query "pointy-hair"
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from build_web_shards import INPUT_FILE, PUBLIC_DIR, ROOT, sha256_hex, split_by_year, write_if_changed
+from search_index import (
+    DEFAULT_PREFIX_LENGTH,
+    DEFAULT_TRIGRAM_SHARDS,
+    TRIGRAMS_FORMAT_VERSION,
+    WORDS_FORMAT_VERSION,
+    TrigramIndex,
+    WordIndex,
+    brute_force_search,
+    brute_force_substring_search,
+    build_postings,
+    build_trigram_postings,
+    encode_trigram_shards,
+    encode_word_shards,
+    normalize_text,
+    shard_key,
+    trigram_shard,
+    words,
+)
+
+SEARCH_INDEX_DIR = PUBLIC_DIR / "search-index"
+WORDS_DIR = SEARCH_INDEX_DIR / "words"
+TRIGRAMS_DIR = SEARCH_INDEX_DIR / "trigrams"
+
+# Fragments people actually type, for --benchmark
+BENCHMARK_TERMS = [
+    "ogber", "pointy-hair", "dilbert", "catbert", "synergy", "wally",
+    "engineer", "i'm not", "the ", "xyz",
+]
+
+
+def load_transcripts(input_file: Path):
+    """(dates, transcripts) in comics-index.json order."""
+    with input_file.open("r", encoding="utf-8") as f:
+        all_data = json.load(f)
+    _, index = split_by_year(all_data)
+    dates = [item["date"] for item in index["dates"]]
+    return dates, [all_data[date].get("transcript") or "" for date in dates]
+
+
+def load_index_manifest(index_dir: Path, version: int) -> dict:
+    path = index_dir / "manifest.json"
+    if not path.exists():
+        return {}
+    with path.open("r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    return manifest if manifest.get("version") == version else {}
+
+
+def write_index(index_dir: Path, shards: dict, old: dict, manifest: dict, full: bool) -> int:
+    """
+    Write {key: (file name, bytes, item count)} shard files into `index_dir`,
+    drop shards that no longer exist, and write the manifest with a
+    "shards" entry per key. `old` is the previous manifest (empty if its
+    layout differs). Returns the number of shard files rewritten.
+    """
+    index_dir.mkdir(parents=True, exist_ok=True)
+    old_shards = old.get("shards", {})
+    entries = {}
+    rewritten = 0
+    for key, (name, data, items) in shards.items():
+        known = old_shards.get(key, {}).get("sha256")
+        if write_if_changed(index_dir / name, data, known, full):
+            rewritten += 1
+        entries[key] = {"file": name, "sha256": sha256_hex(data), "bytes": len(data), "items": items}
+
+    for key in sorted(set(old_shards) - set(entries)):
+        (index_dir / old_shards[key]["file"]).unlink(missing_ok=True)
+
+    manifest = {**manifest, "shards": entries}
+    write_if_changed(index_dir / "manifest.json", json.dumps(manifest, indent=2).encode("utf-8") + b"\n")
+    return rewritten
+
+
+def build_words(transcripts: list[str], prefix_length: int, full: bool):
+    """Write the word index; return (shard count, rewritten, bytes)."""
+    old = load_index_manifest(WORDS_DIR, WORDS_FORMAT_VERSION)
+    if old.get("prefixLength") != prefix_length:
+        old = {"shards": {key: {"file": entry["file"]} for key, entry in old.get("shards", {}).items()}}
+
+    postings = build_postings(transcripts)
+    counts = {}
+    for term in postings:
+        key = shard_key(term, prefix_length)
+        counts[key] = counts.get(key, 0) + 1
+    shards = {
+        key: (f"{key}.bin", data, counts[key])
+        for key, data in encode_word_shards(postings, prefix_length).items()
+    }
+    manifest = {
+        "version": WORDS_FORMAT_VERSION,
+        "prefixLength": prefix_length,
+        "docs": len(transcripts),
+        "terms": len(postings),
+    }
+    rewritten = write_index(WORDS_DIR, shards, old, manifest, full)
+    return len(shards), rewritten, sum(len(data) for _, data, _ in shards.values())
+
+
+def build_trigrams(transcripts: list[str], n_shards: int, full: bool):
+    """Write the trigram index; return (shard count, rewritten, bytes)."""
+    old = load_index_manifest(TRIGRAMS_DIR, TRIGRAMS_FORMAT_VERSION)
+    if old.get("shardCount") != n_shards:
+        old = {"shards": {key: {"file": entry["file"]} for key, entry in old.get("shards", {}).items()}}
+
+    postings = build_trigram_postings(transcripts)
+    counts = {}
+    for trigram in postings:
+        shard = trigram_shard(trigram, n_shards)
+        counts[shard] = counts.get(shard, 0) + 1
+    shards = {
+        str(shard): (f"t{shard:03d}.bin", data, counts[shard])
+        for shard, data in encode_trigram_shards(postings, len(transcripts), n_shards).items()
+    }
+    manifest = {
+        "version": TRIGRAMS_FORMAT_VERSION,
+        "shardCount": n_shards,
+        "docs": len(transcripts),
+        "trigrams": len(postings),
+    }
+    rewritten = write_index(TRIGRAMS_DIR, shards, old, manifest, full)
+    return len(shards), rewritten, sum(len(data) for _, data, _ in shards.values())
+
+
+def random_queries(transcripts: list[str], n: int, seed: int = 0) -> list[str]:
+    """A mix of single words, word pairs from one comic, and absent words."""
+    rng = random.Random(seed)
+    queries = []
+    while len(queries) < n:
+        comic_words = words(normalize_text(rng.choice(transcripts)))
+        if not comic_words:
+            continue
+        kind = len(queries) % 3
+        if kind == 0:
+            queries.append(rng.choice(comic_words))
+        elif kind == 1:
+            queries.append(" ".join(rng.sample(comic_words, min(2, len(comic_words)))))
+        else:
+            queries.append(rng.choice(comic_words) + "zq")
+    return queries
+
+
+def random_substrings(normalized: list[str], n: int, seed: int = 0) -> list[str]:
+    """Substrings of 2-12 characters cut from random comics, plus a few absent ones."""
+    rng = random.Random(seed)
+    terms = []
+    while len(terms) < n:
+        text = rng.choice(normalized)
+        length = rng.randint(2, 12)
+        if len(text) < length:
+            continue
+        start = rng.randrange(len(text) - length + 1)
+        term = text[start:start + length]
+        terms.append(term + "q#" if len(terms) % 5 == 4 else term)
+    return terms
+
+
+def verify(transcripts: list[str], n: int) -> bool:
+    ok = True
+
+    index = WordIndex(WORDS_DIR)
+    mismatches = 0
+    for query in random_queries(transcripts, n):
+        got, expected = index.query(query), brute_force_search(transcripts, query)
+        if got != expected:
+            mismatches += 1
+            if mismatches <= 10:
+                print(f"  MISMATCH words {query!r}: index {len(got)} comics, scan {len(expected)}")
+    print(f"  words: {n} queries, {mismatches} mismatches, {index.shards_read} shards read")
+    ok &= mismatches == 0
+
+    normalized = [normalize_text(text) for text in transcripts]
+    index = TrigramIndex(TRIGRAMS_DIR)
+    mismatches = 0
+    for term in random_substrings(normalized, n):
+        got, expected = index.search(term, normalized), brute_force_substring_search(normalized, term)
+        if got != expected:
+            mismatches += 1
+            if mismatches <= 10:
+                print(f"  MISMATCH trigrams {term!r}: index {len(got)} comics, scan {len(expected)}")
+    print(f"  trigrams: {n} queries, {mismatches} mismatches, {index.shards_read} shards read")
+    ok &= mismatches == 0
+    return ok
+
+
+def benchmark(transcripts: list[str], n_random: int = 300):
+    """Trigram candidates and latency vs the brute-force substring scan."""
+    normalized = [normalize_text(text) for text in transcripts]
+
+    def timed(fn, *args, repeat=5):
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = fn(*args)
+            best = min(best, time.perf_counter() - start)
+        return result, best * 1000
+
+    print(f"\n  {len(normalized)} comics. Cold = shards read from disk and decoded; "
+          f"warm = shards already in memory.")
+    print(f"  {'term':<14}{'shards':>7}{'candidates':>11}{'matches':>9}"
+          f"{'cold ms':>9}{'warm ms':>9}{'scan ms':>9}")
+    for term in BENCHMARK_TERMS:
+        index = TrigramIndex(TRIGRAMS_DIR)
+        start = time.perf_counter()
+        matches = index.search(term, normalized)
+        cold = (time.perf_counter() - start) * 1000
+        candidates = index.candidates(term)
+        _, warm = timed(index.search, term, normalized)
+        expected, scan = timed(brute_force_substring_search, normalized, term)
+        assert matches == expected, term
+        print(f"  {term!r:<14}{index.shards_read:>7}{len(candidates):>11}{len(matches):>9}"
+              f"{cold:>9.2f}{warm:>9.2f}{scan:>9.2f}")
+
+    index = TrigramIndex(TRIGRAMS_DIR)
+    ratios, index_ms, scan_ms, fallbacks = [], [], [], 0
+    for term in random_substrings(normalized, n_random, seed=1):
+        candidates = index.candidates(term)
+        if candidates is None:
+            fallbacks += 1
+            continue
+        matches, elapsed = timed(index.search, term, normalized, repeat=1)
+        _, scan = timed(brute_force_substring_search, normalized, term, repeat=1)
+        ratios.append(len(candidates) / len(normalized))
+        index_ms.append(elapsed)
+        scan_ms.append(scan)
+    print(f"\n  {n_random} random substrings ({fallbacks} under 3 characters fall back to a scan):")
+    print(f"    candidates: median {statistics.median(ratios):.2%} of comics, "
+          f"95th percentile {statistics.quantiles(ratios, n=20)[-1]:.2%}")
+    print(f"    latency: index median {statistics.median(index_ms):.3f} ms, "
+          f"scan median {statistics.median(scan_ms):.2f} ms "
+          f"({statistics.median(scan_ms) / statistics.median(index_ms):.0f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the web viewer's full-transcript search indexes")
+    parser.add_argument("--input", type=Path, default=INPUT_FILE)
+    parser.add_argument("--prefix-length", type=int, default=DEFAULT_PREFIX_LENGTH,
+                        help="Shard the word index by the first N characters of each word")
+    parser.add_argument("--trigram-shards", type=int, default=DEFAULT_TRIGRAM_SHARDS,
+                        help="Number of trigram index shards")
+    parser.add_argument("--full", action="store_true", help="Rewrite every shard, changed or not")
+    parser.add_argument("--verify", type=int, metavar="N", help="Check N random queries against a brute-force scan")
+    parser.add_argument("--benchmark", action="store_true", help="Compare trigram search with a brute-force scan")
+    parser.add_argument("--query", help="Print the dates whose transcript contains this text")
+    args = parser.parse_args()
+
+    print("Reading comics data...")
+    dates, transcripts = load_transcripts(args.input)
+
+    if args.query is None or not (TRIGRAMS_DIR / "manifest.json").exists():
+        for name, build, option, index_dir in (
+            ("word", build_words, args.prefix_length, WORDS_DIR),
+            ("trigram", build_trigrams, args.trigram_shards, TRIGRAMS_DIR),
+        ):
+            print(f"Building {name} index...")
+            n_shards, rewritten, total = build(transcripts, option, args.full)
+            print(f"  {n_shards} shards, {total / 1024:.1f} KB total; rewritten: {rewritten}")
+            print(f"  Index: {index_dir.relative_to(ROOT)}")
+
+    if args.query is not None:
+        term = args.query.lower()
+        normalized = [normalize_text(text) for text in transcripts]
+        for doc in TrigramIndex(TRIGRAMS_DIR).search(term, normalized):
+            print(dates[doc])
+
+    if args.verify:
+        print("Verifying against a brute-force scan...")
+        if not verify(transcripts, args.verify):
+            sys.exit(1)
+
+    if args.benchmark:
+        print("Benchmarking trigram search...")
+        benchmark(transcripts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Build the data files the web viewer fetches from the master transcripts JSON:
+
+    public/comics-index.json         years, every date with its title, latest year
+    public/comics-data/<year>.json   {date: entry} for one year, minified
+    public/comics-data/compact/<year>.json
+                                     the same year in the compact columnar form
+                                     (see compact_shards.py), plus precompressed
+                                     .json.gz / .json.br siblings
+    public/comics-data/search/<year>.json
+                                     search-only shard: dates, titles and
+                                     pre-normalized transcripts with an offset
+                                     map back to the originals (see
+                                     search_index.py), also with .gz / .br
+    public/comics-manifest.json      sha256 and byte size of the index and of
+                                     every year shard (legacy and compact)
+
+The legacy files are byte-for-byte what scripts/split-json-by-year.js
+writes; the viewer prefers the compact shards when the manifest lists them.
+Servers that support precompressed files (nginx gzip_static / brotli_static,
+most CDNs) can serve the .gz / .br siblings directly. Brotli output needs the
+optional `brotli` package (pip install brotli); without it only .gz is
+written. --report prints the per-year sizes of all three formats.
+
+The build is incremental: a year shard is only rewritten when its content
+hash changes, so unchanged files keep their mtime and deploy caches stay
+warm. The client compares the manifest hashes with what it has cached in
+IndexedDB and re-downloads only the stale years.
+
+Usage:
+    python scripts/build_web_shards.py
+    python scripts/build_web_shards.py --full     # rewrite every file
+    python scripts/build_web_shards.py --report   # size report, legacy vs compact vs search
+"""
+
+import argparse
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from compact_shards import brotli_bytes, encode_year, gzip_bytes
+from search_index import encode_search_shard
+
+ROOT = Path(__file__).resolve().parent.parent
+INPUT_FILE = ROOT / "data" / "dilbert_comics_transcripts.json"
+PUBLIC_DIR = ROOT / "public"
+OUTPUT_DIR = PUBLIC_DIR / "comics-data"
+COMPACT_DIR = OUTPUT_DIR / "compact"
+SEARCH_DIR = OUTPUT_DIR / "search"
+INDEX_FILE = PUBLIC_DIR / "comics-index.json"
+MANIFEST_FILE = PUBLIC_DIR / "comics-manifest.json"
+
+MANIFEST_VERSION = 1
+
+
+def to_json_bytes(obj) -> bytes:
+    """Serialize like JavaScript's JSON.stringify(obj): compact, UTF-8, no ASCII escaping."""
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def sha256_hex(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def split_by_year(all_data: dict):
+    """Group entries by year and build the index, in the same order as the JS script."""
+    by_year = {}
+    dates = []
+    for date, entry in all_data.items():
+        year = date.split("-")[0]
+        by_year.setdefault(year, {})[date] = entry
+        dates.append({"date": date, "title": entry.get("title") or "", "year": year})
+
+    years = sorted(by_year)
+    index = {"years": years, "dates": dates, "latestYear": years[-1] if years else None}
+    return {year: by_year[year] for year in years}, index
+
+
+def load_manifest() -> dict:
+    if not MANIFEST_FILE.exists():
+        return {}
+    with MANIFEST_FILE.open("r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    return manifest if manifest.get("version") == MANIFEST_VERSION else {}
+
+
+def write_if_changed(path: Path, data: bytes, known_sha256: str = None, full: bool = False) -> bool:
+    """
+    Write `data` to `path` unless the file already holds exactly that content.
+
+    `known_sha256` is the hash the manifest recorded for the file; if it
+    matches and the size agrees the file is not even read back.
+    """
+    digest = sha256_hex(data)
+    if not full and path.exists() and path.stat().st_size == len(data):
+        if known_sha256 == digest or sha256_hex(path.read_bytes()) == digest:
+            return False
+
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+    return True
+
+
+def write_compressed_siblings(path: Path, data: bytes, rewrite: bool) -> dict:
+    """
+    Write <path>.gz and <path>.br next to `path` (only if `path` was just
+    rewritten or a sibling is missing); return their sizes in bytes.
+    """
+    sizes = {}
+    for suffix, compress in ((".gz", gzip_bytes), (".br", brotli_bytes)):
+        sibling = path.with_name(path.name + suffix)
+        if rewrite or not sibling.exists():
+            packed = compress(data)
+            if packed is None:
+                continue
+            tmp_path = sibling.with_name(sibling.name + ".tmp")
+            tmp_path.write_bytes(packed)
+            os.replace(tmp_path, sibling)
+        sizes[suffix] = sibling.stat().st_size
+    return {"gzipBytes": sizes.get(".gz"), "brotliBytes": sizes.get(".br")}
+
+
+def print_size_report(years: dict, legacy_gzip: dict):
+    """Per-year sizes of the legacy shards vs the compact and search ones (KB)."""
+    def kb(n):
+        return f"{n / 1024:9.1f}" if n is not None else "        -"
+
+    print(f"\n  {'year':<6}{'legacy':>9}{'gz':>9}  {'compact':>9}{'gz':>9}{'br':>9}  {'search':>9}{'gz':>9}")
+    totals = [0] * 7
+    for year, entry in years.items():
+        compact, search = entry["compact"], entry["search"]
+        row = [entry["bytes"], legacy_gzip[year], compact["bytes"], compact["gzipBytes"], compact["brotliBytes"],
+               search["bytes"], search["gzipBytes"]]
+        print(f"  {year:<6}{kb(row[0])}{kb(row[1])}  {kb(row[2])}{kb(row[3])}{kb(row[4])}  {kb(row[5])}{kb(row[6])}")
+        totals = [t + (v or 0) for t, v in zip(totals, row)]
+    print(f"  {'total':<6}{kb(totals[0])}{kb(totals[1])}  {kb(totals[2])}{kb(totals[3])}{kb(totals[4] or None)}"
+          f"  {kb(totals[5])}{kb(totals[6])}")
+    print(f"  Compact JSON is {totals[2] / totals[0]:.0%} of the legacy size; "
+          f"compact + gzip is {totals[3] / totals[0]:.0%}"
+          + (f", compact + brotli {totals[4] / totals[0]:.0%}" if totals[4] else ""))
+    print(f"  Search shards are {totals[5] / totals[2]:.0%} of the compact size "
+          f"({totals[6] / totals[3]:.0%} gzipped)")
+
+
+def file_entry(path: Path, data: bytes, **extra) -> dict:
+    return {
+        "file": path.relative_to(PUBLIC_DIR).as_posix(),
+        "sha256": sha256_hex(data),
+        "bytes": len(data),
+        **extra,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the web viewer's index and per-year shards")
+    parser.add_argument("--input", type=Path, default=INPUT_FILE)
+    parser.add_argument("--full", action="store_true", help="Rewrite every file, changed or not")
+    parser.add_argument("--report", action="store_true", help="Print per-year sizes, legacy vs compact")
+    args = parser.parse_args()
+
+    print("Reading comics data...")
+    with args.input.open("r", encoding="utf-8") as f:
+        all_data = json.load(f)
+
+    COMPACT_DIR.mkdir(parents=True, exist_ok=True)
+    SEARCH_DIR.mkdir(parents=True, exist_ok=True)
+    if brotli_bytes(b"") is None:
+        print("Note: brotli is not installed (pip install brotli); writing .gz siblings only")
+    by_year, index = split_by_year(all_data)
+    old = load_manifest()
+    old_years = old.get("years", {})
+
+    print("Writing year files...")
+    years = {}
+    written = []
+    legacy_gzip = {}
+    for year, entries in by_year.items():
+        path = OUTPUT_DIR / f"{year}.json"
+        data = to_json_bytes(entries)
+        known = old_years.get(year, {}).get("sha256")
+        if write_if_changed(path, data, known, args.full):
+            written.append(year)
+            print(f"  Wrote {year}.json ({len(data) / 1024:.2f} KB)")
+
+        compact_path = COMPACT_DIR / f"{year}.json"
+        compact_data = to_json_bytes(encode_year(year, entries))
+        known = old_years.get(year, {}).get("compact", {}).get("sha256")
+        compact_written = write_if_changed(compact_path, compact_data, known, args.full)
+        if compact_written:
+            print(f"  Wrote compact/{year}.json ({len(compact_data) / 1024:.2f} KB)")
+        siblings = write_compressed_siblings(compact_path, compact_data, compact_written)
+
+        search_path = SEARCH_DIR / f"{year}.json"
+        search_data = to_json_bytes(encode_search_shard(year, entries))
+        known = old_years.get(year, {}).get("search", {}).get("sha256")
+        search_written = write_if_changed(search_path, search_data, known, args.full)
+        if search_written:
+            print(f"  Wrote search/{year}.json ({len(search_data) / 1024:.2f} KB)")
+        search_siblings = write_compressed_siblings(search_path, search_data, search_written)
+
+        years[year] = file_entry(
+            path, data, comics=len(entries),
+            compact=file_entry(compact_path, compact_data, **siblings),
+            search=file_entry(search_path, search_data, **search_siblings),
+        )
+        if args.report:
+            legacy_gzip[year] = len(gzip_bytes(data))
+
+    removed = sorted(set(old_years) - set(years))
+    for year in removed:
+        for stale in (OUTPUT_DIR / f"{year}.json", *COMPACT_DIR.glob(f"{year}.json*"), *SEARCH_DIR.glob(f"{year}.json*")):
+            stale.unlink(missing_ok=True)
+        print(f"  Removed {year}.json")
+
+    index_data = to_json_bytes(index)
+    known = old.get("index", {}).get("sha256")
+    index_written = write_if_changed(INDEX_FILE, index_data, known, args.full)
+    if index_written:
+        print(f"  Wrote comics-index.json ({len(index_data) / 1024:.2f} KB)")
+    index_siblings = write_compressed_siblings(INDEX_FILE, index_data, index_written)
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "index": file_entry(INDEX_FILE, index_data, **index_siblings),
+        "years": years,
+    }
+    write_if_changed(MANIFEST_FILE, json.dumps(manifest, indent=2).encode("utf-8") + b"\n")
+
+    total = sum(entry["bytes"] for entry in years.values())
+    changed = sum(years[y]["bytes"] for y in written) + (len(index_data) if index_written else 0)
+    print("\nDone.")
+    print(f"  Total years: {len(years)}")
+    print(f"  Total comics: {len(index['dates'])}")
+    print(f"  Rewritten: {len(written)} year file(s){' and the index' if index_written else ''}, "
+          f"{changed / 1024:.2f} KB of {(total + len(index_data)) / 1024 / 1024:.2f} MB")
+    if removed:
+        print(f"  Removed: {', '.join(removed)}")
+    print(f"  Manifest: {MANIFEST_FILE.relative_to(ROOT)}")
+    if args.report:
+        print_size_report(years, legacy_gzip)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Compact columnar encoding for the per-year comic shards.
+
+A legacy shard is {date: {image, originalimageurl, title, transcript}},
+repeating all four keys for every comic. Most of that is redundant:
+
+  - `image` is the date plus an extension ("1990-01-01.gif")
+  - every `originalimageurl` has the same shape,
+    https://web.archive.org/web/<timestamp>im_/https://assets.amuniversal.com/<id>
+  - the dates of one year are small day offsets from January 1st
+
+The compact form stores one parallel array per field instead:
+
+    {
+      "format": "columnar-1",
+      "year": "1990",
+      "days": [0, 1, 2, ...],              day of year, 0 = January 1st
+      "imageSuffixes": [".gif", ".jpg"],   image = date + imageSuffixes[i]
+      "image": [0, 0, 1, ...],
+      "urlTemplates": ["https://web.archive.org/web/{}im_/https://assets.amuniversal.com/{}"],
+      "url": [[0, "20230228085311", "41d32f..."], ...],   template index, then the slots
+      "title": ["", ...],
+      "transcript": ["...", ...],
+      "raw": {"17": {...}}                 entries that don't round-trip, verbatim
+    }
+
+URL templates are found automatically: long digit / hex runs become "{}"
+slots, so the shared prefix and infix are stored once per shard. Every entry
+is decoded again after encoding; any entry that would not come back
+identical is kept verbatim under "raw", so the encoding is always lossless.
+src/utils/shards.js is the matching decoder in the viewer.
+"""
+
+import gzip
+import re
+from datetime import date, timedelta
+
+FORMAT = "columnar-1"
+
+FIELDS = ("image", "originalimageurl", "title", "transcript")
+
+# Runs that vary per URL (Wayback timestamps, asset ids)
+_URL_SLOT_RE = re.compile(r"[0-9a-f]{12,}")
+
+
+def _url_template(url: str):
+    slots = _URL_SLOT_RE.findall(url)
+    return _URL_SLOT_RE.sub("{}", url), slots
+
+
+def _fill_template(template: str, slots) -> str:
+    parts = template.split("{}")
+    out = [parts[0]]
+    for slot, part in zip(slots, parts[1:]):
+        out.append(slot)
+        out.append(part)
+    return "".join(out)
+
+
+def day_offset(year: str, date_str: str):
+    """Days since January 1st, or None if date_str is not a date in `year`."""
+    try:
+        day = date.fromisoformat(date_str)
+    except ValueError:
+        return None
+    if str(day.year) != year or day.isoformat() != date_str:
+        return None
+    return (day - date(day.year, 1, 1)).days
+
+
+def _table_index(table: list, lookup: dict, value: str) -> int:
+    if value not in lookup:
+        lookup[value] = len(table)
+        table.append(value)
+    return lookup[value]
+
+
+def encode_year(year: str, entries: dict) -> dict:
+    """Encode one year's {date: entry} into the compact columnar form."""
+    shard = {
+        "format": FORMAT,
+        "year": year,
+        "days": [],
+        "imageSuffixes": [],
+        "image": [],
+        "urlTemplates": [],
+        "url": [],
+        "title": [],
+        "transcript": [],
+        "raw": {},
+    }
+    suffix_index, template_index = {}, {}
+
+    for i, (date_str, entry) in enumerate(entries.items()):
+        day = day_offset(year, date_str)
+        image = entry.get("image")
+        url = entry.get("originalimageurl")
+        encodable = (
+            day is not None
+            and list(entry) == list(FIELDS)
+            and all(isinstance(entry[field], str) for field in FIELDS)
+            and image.startswith(date_str)
+        )
+        if encodable:
+            template, slots = _url_template(url)
+            encodable = _fill_template(template, slots) == url
+
+        if not encodable:
+            # Keep the row aligned with a placeholder and store the entry as is
+            shard["days"].append(day if day is not None else -1)
+            shard["image"].append(-1)
+            shard["url"].append([-1])
+            shard["title"].append("")
+            shard["transcript"].append("")
+            shard["raw"][str(i)] = [date_str, entry]
+            continue
+
+        shard["days"].append(day)
+        shard["image"].append(_table_index(shard["imageSuffixes"], suffix_index, image[len(date_str):]))
+        shard["url"].append([_table_index(shard["urlTemplates"], template_index, template), *slots])
+        shard["title"].append(entry["title"])
+        shard["transcript"].append(entry["transcript"])
+
+    if not shard["raw"]:
+        del shard["raw"]
+    return shard
+
+
+def decode_year(shard: dict) -> dict:
+    """Inverse of encode_year(): back to {date: entry}."""
+    if shard.get("format") != FORMAT:
+        raise ValueError(f"Unknown shard format: {shard.get('format')!r}")
+
+    start = date(int(shard["year"]), 1, 1)
+    raw = shard.get("raw", {})
+    entries = {}
+    for i, day in enumerate(shard["days"]):
+        if str(i) in raw:
+            date_str, entry = raw[str(i)]
+            entries[date_str] = entry
+            continue
+        date_str = (start + timedelta(days=day)).isoformat()
+        template, *slots = shard["url"][i]
+        entries[date_str] = {
+            "image": date_str + shard["imageSuffixes"][shard["image"][i]],
+            "originalimageurl": _fill_template(shard["urlTemplates"][template], slots),
+            "title": shard["title"][i],
+            "transcript": shard["transcript"][i],
+        }
+    return entries
+
+
+def gzip_bytes(data: bytes) -> bytes:
+    """Deterministic gzip (no timestamp), best compression."""
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def brotli_bytes(data: bytes):
+    """Brotli at maximum quality, or None if the optional brotli package is missing."""
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli.compress(data, quality=11)
@@ -1,54 +1,236 @@
+#!/usr/bin/env python3
+"""
+Generate plain, accessible HTML pages of the transcripts for screen-reader
+users, one page per year plus a table of contents:
+
+    aria-html/index.html       contents: every year with its comic count
+    aria-html/<year>.html      that year's comics, grouped by month, with a
+                               month list at the top and links to the
+                               previous / next year
+    aria-html/manifest.json    per year: the hash of what the page was built
+                               from, so unchanged years are not rebuilt
+
+Every page is streamed section by section through a buffered writer and
+replaced atomically; all transcript text, titles and URLs are HTML-escaped.
+Only years whose comics (or neighbouring years, which the page links to)
+changed are rewritten; --full rebuilds everything.
+
+--single PATH writes the old layout instead: every comic in one page.
+
+Usage:
+    python scripts/convert_json_to_aria_html.py
+    python scripts/convert_json_to_aria_html.py --full
+    python scripts/convert_json_to_aria_html.py --single dilbert_transcripts.html
+"""
+
+import argparse
+import calendar
 import json
+import os
+import time
+from html import escape
+from pathlib import Path
+
+from build_web_shards import INPUT_FILE, ROOT, sha256_hex, split_by_year, to_json_bytes
+
+OUTPUT_DIR = ROOT / "aria-html"
+
+# Bump when the page markup changes so every page is rebuilt
+PAGE_VERSION = 1
+
+WRITE_BUFFER = 1 << 16
+
+SITE_TITLE = "Dilbert Comic Transcripts"
+
+
+def esc(text) -> str:
+    return escape(text or "", quote=True)
+
+
+class AtomicPage:
+    """Buffered text writer to a temporary file, moved into place on success."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.tmp_path = path.with_name(path.name + ".tmp")
+
+    def __enter__(self):
+        self.file = self.tmp_path.open("w", encoding="utf-8", buffering=WRITE_BUFFER)
+        return self.file
+
+    def __exit__(self, exc_type, exc, tb):
+        self.file.close()
+        if exc_type is None:
+            os.replace(self.tmp_path, self.path)
+        else:
+            self.tmp_path.unlink(missing_ok=True)
+
+
+# ------------------------------
+# Markup
+# ------------------------------
+
+def write_head(out, title: str, subtitle: str):
+    out.write(
+        "<!DOCTYPE html>\n"
+        '<html lang="en">\n'
+        "<head>\n"
+        '    <meta charset="UTF-8">\n'
+        '    <meta name="viewport" content="width=device-width, initial-scale=1.0">\n'
+        f"    <title>{esc(title)}</title>\n"
+        "</head>\n"
+        "<body>\n\n"
+        '    <header role="banner">\n'
+        f"        <h1>{esc(title)}</h1>\n"
+        f"        <p>{esc(subtitle)}</p>\n"
+        "    </header>\n\n"
+    )
+
+
+def write_foot(out):
+    out.write("</body>\n</html>\n")
+
+
+def write_comic(out, date: str, entry: dict, heading_level: int = 3):
+    """One comic as a labelled section; heading_level is the comic's heading."""
+    h, sub = f"h{heading_level}", f"h{heading_level + 1}"
+    date_attr = esc(date)
+    out.write(f'        <section aria-labelledby="comic-{date_attr}">\n')
+    out.write(f'            <{h} id="comic-{date_attr}"><time datetime="{date_attr}">{date_attr}</time>')
+    if entry.get("title"):
+        out.write(f": {esc(entry['title'])}")
+    out.write(f"</{h}>\n")
+    if entry.get("originalimageurl"):
+        out.write(f'            <p><a href="{esc(entry["originalimageurl"])}">View Original Image on Archive.org</a></p>\n')
+    out.write(f'            <div role="document" aria-labelledby="comic-{date_attr}-transcript">\n')
+    out.write(f'                <{sub} id="comic-{date_attr}-transcript">Transcript</{sub}>\n')
+    for line in (entry.get("transcript") or "").split("\n"):
+        if line.strip():
+            out.write(f"                <p>{esc(line.strip())}</p>\n")
+    out.write("            </div>\n        </section>\n")
+
+
+def month_name(month: str) -> str:
+    return calendar.month_name[int(month)] if month.isdigit() and 1 <= int(month) <= 12 else month
+
+
+def year_nav(year: str, previous: str, following: str) -> str:
+    links = ['<a href="index.html">All years</a>']
+    if previous:
+        links.append(f'<a href="{previous}.html" rel="prev">{previous}</a>')
+    if following:
+        links.append(f'<a href="{following}.html" rel="next">{following}</a>')
+    return f'    <nav aria-label="Years around {year}">\n        ' + " | ".join(links) + "\n    </nav>\n\n"
+
+
+def write_year_page(path: Path, year: str, entries: dict, previous: str, following: str):
+    by_month = {}
+    for date, entry in sorted(entries.items()):
+        by_month.setdefault(date[5:7], []).append((date, entry))
+
+    with AtomicPage(path) as out:
+        write_head(out, f"{SITE_TITLE}: {year}", f"Accessible text transcripts of {len(entries)} Dilbert comics from {year}")
+        out.write(year_nav(year, previous, following))
+        out.write('    <nav aria-label="Months">\n        <ul>\n')
+        for month, comics in by_month.items():
+            name = month_name(month)
+            out.write(f'            <li><a href="#month-{esc(month)}">{esc(name)}</a> ({len(comics)})</li>\n')
+        out.write("        </ul>\n    </nav>\n\n")
+
+        out.write('    <main role="main">\n')
+        for month, comics in by_month.items():
+            name = month_name(month)
+            out.write(f'        <h2 id="month-{esc(month)}">{esc(name)} {esc(year)}</h2>\n')
+            for date, entry in comics:
+                write_comic(out, date, entry)
+        out.write("    </main>\n\n")
+        out.write(year_nav(year, previous, following))
+        write_foot(out)
+
+
+def write_index_page(path: Path, counts: dict):
+    years = list(counts)
+    with AtomicPage(path) as out:
+        write_head(out, SITE_TITLE, f"Accessible text transcripts of Dilbert comics from {years[0]} to {years[-1]}")
+        out.write('    <main role="main">\n        <h2 id="contents">Contents</h2>\n')
+        out.write('        <nav aria-labelledby="contents">\n            <ul>\n')
+        for year, count in counts.items():
+            out.write(f'                <li><a href="{year}.html">{year}</a> ({count} comics)</li>\n')
+        out.write("            </ul>\n        </nav>\n    </main>\n\n")
+        write_foot(out)
+
+
+def write_single_page(path: Path, all_data: dict):
+    years = sorted({date[:4] for date in all_data})
+    with AtomicPage(path) as out:
+        write_head(out, f"{SITE_TITLE} - Accessible",
+                   f"Accessible text transcripts of Dilbert comics from {years[0]} to {years[-1]}")
+        out.write('    <main role="main">\n')
+        for date, entry in all_data.items():
+            write_comic(out, date, entry, heading_level=2)
+        out.write("    </main>\n\n")
+        write_foot(out)
+
+
+# ------------------------------
+# Incremental build
+# ------------------------------
+
+def load_manifest(output_dir: Path) -> dict:
+    path = output_dir / "manifest.json"
+    if not path.exists():
+        return {}
+    with path.open("r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    return manifest if manifest.get("version") == PAGE_VERSION else {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate accessible HTML transcript pages")
+    parser.add_argument("--input", type=Path, default=INPUT_FILE)
+    parser.add_argument("--output-dir", type=Path, default=OUTPUT_DIR)
+    parser.add_argument("--full", action="store_true", help="Rebuild every page, changed or not")
+    parser.add_argument("--single", type=Path, metavar="PATH", help="Write every comic into one page at PATH instead")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with args.input.open("r", encoding="utf-8") as f:
+        all_data = json.load(f)
+
+    if args.single:
+        write_single_page(args.single, all_data)
+        print(f"HTML file generated as '{args.single}' ({time.perf_counter() - start:.2f}s)")
+        return
+
+    output_dir = args.output_dir
+    output_dir.mkdir(parents=True, exist_ok=True)
+    by_year, _ = split_by_year(all_data)
+    years = list(by_year)
+    old_years = load_manifest(output_dir).get("years", {})
+
+    pages = {}
+    rebuilt = []
+    for i, year in enumerate(years):
+        previous = years[i - 1] if i > 0 else None
+        following = years[i + 1] if i + 1 < len(years) else None
+        # The page also links to its neighbours, so they are part of its input
+        digest = sha256_hex(to_json_bytes([previous, following, by_year[year]]))
+        path = output_dir / f"{year}.html"
+        if args.full or old_years.get(year, {}).get("sha256") != digest or not path.exists():
+            write_year_page(path, year, by_year[year], previous, following)
+            rebuilt.append(year)
+        pages[year] = {"file": path.name, "sha256": digest, "comics": len(by_year[year])}
+
+    for year in sorted(set(old_years) - set(pages)):
+        (output_dir / old_years[year]["file"]).unlink(missing_ok=True)
+
+    write_index_page(output_dir / "index.html", {year: len(entries) for year, entries in by_year.items()})
+    with (output_dir / "manifest.json").open("w", encoding="utf-8") as f:
+        json.dump({"version": PAGE_VERSION, "years": pages}, f, indent=2)
+
+    print(f"HTML pages in '{output_dir}': {len(years)} years, rebuilt {len(rebuilt)} "
+          f"({', '.join(rebuilt) if rebuilt else 'none'}) in {time.perf_counter() - start:.2f}s")
+
 
-# Load JSON data from file
-with open('dilber_comics_transcript.json', 'r') as f:
-    data = json.load(f)
-
-# Start the HTML content
-html_content = '''<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Dilbert Comic Transcripts - Accessible</title>
-</head>
-<body>
-
-    <header role="banner">
-        <h1>Dilbert Comic Transcripts</h1>
-        <p>Accessible text transcripts of *Dilbert* comics from 1989 to 2023</p>
-    </header>
-
-    <main role="main">
-'''
-
-# Generate HTML sections for each comic entry
-for date, info in data.items():
-    # Generate transcript paragraphs
-    transcript_paragraphs = ''.join(f'<p>{line}</p>' for line in info['transcript'].split('\n') if line.strip())
-    
-    # Add a section for each comic
-    html_content += f'''
-        <section aria-labelledby="comic-{date}">
-            <h2 id="comic-{date}">Comic Date</h2>
-            <time datetime="{date}">{date}</time>
-            <p><a href="{info['originalimageurl']}">View Original Image on Archive.org</a></p>
-            <div role="document" aria-labelledby="comic-{date}-transcript">
-                <h3 id="comic-{date}-transcript">Transcript</h3>
-                {transcript_paragraphs}
-            </div>
-        </section>
-    '''
-
-# Close the HTML structure
-html_content += '''
-    </main>
-</body>
-</html>
-'''
-
-# Write to an HTML file
-with open('dilbert_transcripts.html', 'w') as f:
-    f.write(html_content)
-
-print("HTML file generated as 'dilbert_transcripts.html'")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
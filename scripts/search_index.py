@@ -0,0 +1,511 @@
+"""
+Precomputed full-transcript search index for the web viewer.
+
+The viewer's search only looks at year files that happen to be loaded, so
+transcript matches in other years are silently missed. This module builds
+an inverted index over every transcript that the client can query one small
+shard at a time:
+
+    public/search-index/words/
+        manifest.json    format, prefix length, comic count, and per shard:
+                         file name, sha256, byte size, number of terms
+        <prefix>.bin     every term starting with <prefix> and its postings
+
+Comics are numbered by their position in public/comics-index.json `dates`,
+which the client already has, so postings store only small integers.
+
+Text is normalized exactly like the client does before searching
+(lowercase, every run of whitespace around a newline collapsed to one
+space), then split into words of letters and digits.
+
+Shard file layout (all integers are unsigned LEB128 varints):
+
+    b"DWI1"
+    term count
+    per term, in sorted order:
+        term byte length, term (UTF-8)
+        document frequency
+        postings byte length
+        postings: (comic id delta, term frequency) per comic, ids ascending,
+                  the first delta relative to 0
+
+WordIndex is the reference reader and query evaluator: it is the oracle the
+index is checked against (build_search_index.py --verify), alongside
+brute_force_search(), a plain scan over the normalized transcripts.
+
+The word index cannot answer the viewer's actual search, which is a
+substring test (`transcript.includes(term)`: "ogber", "pointy-hair"). For
+that there is a trigram index over the same normalized text:
+
+    public/search-index/trigrams/
+        manifest.json    format, shard count, comic count, per shard: file,
+                         sha256, byte size, number of trigrams
+        t<NNN>.bin       the trigrams whose FNV-1a hash (32-bit, over the
+                         UTF-8 bytes) modulo the shard count is NNN
+
+A query needs every trigram of the term, so it fetches at most len - 2
+shards; intersecting their posting lists gives the candidate comics, and
+only those are checked with a real substring test. Terms shorter than three
+characters have no trigrams and fall back to a scan.
+
+Trigram shard layout:
+
+    b"DTI1"
+    trigram count
+    per trigram, in sorted order:
+        trigram byte length, trigram (UTF-8)
+        document frequency
+        encoding: 0 = delta varints of the comic ids,
+                  1 = bitmap, bit i (LSB first) set if comic i contains it
+        payload byte length, payload
+
+Each list uses whichever encoding is smaller, so trigrams like " th" that
+occur in most comics cost a fixed comic-count / 8 bytes.
+src/utils/searchIndex.js is the matching reader in the viewer.
+
+Candidates are then checked against search shards rather than full year
+files: one per year (public/comics-data/search/<year>.json, written by
+build_web_shards.py) holding only what search needs, already normalized:
+
+    {
+      "format": "search-1",
+      "year": "1990",
+      "days": [0, 1, 2, ...],              as in compact_shards.py ("dates"
+                                           with the full strings if any date
+                                           is not a plain date of the year)
+      "title": ["", ...],
+      "text": ["normalized transcript", ...],
+      "offsets": [[4, 2, 27, 1], ...]
+    }
+
+"offsets" maps normalized positions back to the original transcript so a
+match can be highlighted there. Each collapsed whitespace run adds a pair
+(gap, removed): the run's replacement space is `gap` positions after the
+previous one (after 0 for the first) and `removed` more characters of the
+original precede everything after it. So [4, 2, 27, 1] means normalized
+positions 0-4 are unchanged, 5-31 are 2 later in the original and 32 on
+are 3 later. Positions are UTF-16 code units, like JavaScript strings. It is
+null for the rare text where lowercasing changes the length and positions
+cannot be mapped.
+"""
+
+import json
+import re
+from collections import defaultdict
+from pathlib import Path
+
+from compact_shards import day_offset
+
+
+WORDS_MAGIC = b"DWI1"
+WORDS_FORMAT_VERSION = 1
+
+TRIGRAMS_MAGIC = b"DTI1"
+TRIGRAMS_FORMAT_VERSION = 1
+
+# Number of trigram shards (~7 KB each for the full corpus)
+DEFAULT_TRIGRAM_SHARDS = 256
+
+SEARCH_SHARD_FORMAT = "search-1"
+
+POSTINGS_DELTA = 0
+POSTINGS_BITMAP = 1
+
+# Shard by the first N characters of each term
+DEFAULT_PREFIX_LENGTH = 2
+
+_NEWLINE_RUN_RE = re.compile(r"\s*\n\s*")
+_WORD_RE = re.compile(r"[^\W_]+")
+_SAFE_PREFIX_RE = re.compile(r"[a-z0-9]+")
+
+
+# ------------------------------
+# Normalization
+# ------------------------------
+
+def normalize_text(text: str) -> str:
+    """The client's search normalization: lowercase, newline runs -> one space."""
+    return _NEWLINE_RUN_RE.sub(" ", (text or "").lower())
+
+
+def normalize_with_offsets(text: str):
+    """
+    normalize_text() plus the offset map back to `text` described above:
+    (normalized, [p1, s1, p2, s2, ...]), or (normalized, None) if the
+    positions cannot be mapped.
+    """
+    text = text or ""
+    lowered = text.lower()
+    if len(lowered) != len(text) or any(ord(char) > 0xFFFF for char in text):
+        return normalize_text(text), None
+
+    parts, offsets = [], []
+    last = shift = previous = 0
+    for match in _NEWLINE_RUN_RE.finditer(lowered):
+        parts.append(lowered[last:match.start()])
+        parts.append(" ")
+        removed = match.end() - match.start() - 1
+        if removed:
+            # The space sits where the run started; what follows moves left
+            position = match.start() - shift
+            offsets += [position - previous, removed]
+            previous = position
+            shift += removed
+        last = match.end()
+    parts.append(lowered[last:])
+    return "".join(parts), offsets
+
+
+def to_original_offset(offsets: list, position: int) -> int:
+    """Map a normalized position to the original text with an offset map."""
+    space = shift = 0
+    for i in range(0, len(offsets), 2):
+        space += offsets[i]
+        if space >= position:
+            break
+        shift += offsets[i + 1]
+    return position + shift
+
+
+def words(text: str) -> list[str]:
+    """Words of a normalized text (letters and digits; punctuation splits)."""
+    return _WORD_RE.findall(text)
+
+
+def trigrams(text: str) -> set[str]:
+    """Every 3-character substring of a normalized text."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def fnv1a_32(data: bytes) -> int:
+    h = 0x811C9DC5
+    for byte in data:
+        h = ((h ^ byte) * 0x01000193) & 0xFFFFFFFF
+    return h
+
+
+def trigram_shard(trigram: str, n_shards: int) -> int:
+    return fnv1a_32(trigram.encode("utf-8")) % n_shards
+
+
+def shard_key(term: str, prefix_length: int) -> str:
+    """File-name-safe shard key: the term prefix, hex-encoded if not [a-z0-9]."""
+    prefix = term[:prefix_length]
+    if _SAFE_PREFIX_RE.fullmatch(prefix):
+        return prefix
+    return "x" + prefix.encode("utf-8").hex()
+
+
+# ------------------------------
+# Varints
+# ------------------------------
+
+def encode_varint(value: int, out: bytearray):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varint(data: bytes, pos: int):
+    """Return (value, new position)."""
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def encode_postings(postings: list) -> bytes:
+    """[(comic id, term frequency), ...] with ascending ids -> delta varints."""
+    out = bytearray()
+    previous = 0
+    for doc, tf in postings:
+        encode_varint(doc - previous, out)
+        encode_varint(tf, out)
+        previous = doc
+    return bytes(out)
+
+
+def decode_postings(data: bytes, count: int) -> list:
+    postings = []
+    pos = doc = 0
+    for _ in range(count):
+        delta, pos = decode_varint(data, pos)
+        tf, pos = decode_varint(data, pos)
+        doc += delta
+        postings.append((doc, tf))
+    return postings
+
+
+def encode_doc_ids(doc_ids: list[int], n_docs: int):
+    """Ascending comic ids -> (encoding, payload), whichever is smaller."""
+    out = bytearray()
+    previous = 0
+    for doc in doc_ids:
+        encode_varint(doc - previous, out)
+        previous = doc
+    bitmap_size = (n_docs + 7) // 8
+    if len(out) <= bitmap_size:
+        return POSTINGS_DELTA, bytes(out)
+
+    bitmap = bytearray(bitmap_size)
+    for doc in doc_ids:
+        bitmap[doc >> 3] |= 1 << (doc & 7)
+    return POSTINGS_BITMAP, bytes(bitmap)
+
+
+def decode_doc_ids(encoding: int, payload: bytes, count: int) -> list[int]:
+    if encoding == POSTINGS_BITMAP:
+        return [
+            (i << 3) | bit
+            for i, byte in enumerate(payload) if byte
+            for bit in range(8) if byte >> bit & 1
+        ]
+    doc_ids = []
+    pos = doc = 0
+    for _ in range(count):
+        delta, pos = decode_varint(payload, pos)
+        doc += delta
+        doc_ids.append(doc)
+    return doc_ids
+
+
+# ------------------------------
+# Building
+# ------------------------------
+
+def build_postings(transcripts: list[str]) -> dict:
+    """term -> [(comic id, term frequency), ...] over all transcripts."""
+    postings = defaultdict(list)
+    for doc, text in enumerate(transcripts):
+        counts = defaultdict(int)
+        for word in words(normalize_text(text)):
+            counts[word] += 1
+        for word, tf in counts.items():
+            postings[word].append((doc, tf))
+    return postings
+
+
+def encode_word_shards(postings: dict, prefix_length: int = DEFAULT_PREFIX_LENGTH) -> dict:
+    """Group terms by prefix; return {shard key: shard file bytes}."""
+    by_shard = defaultdict(list)
+    for term in sorted(postings):
+        by_shard[shard_key(term, prefix_length)].append(term)
+
+    shards = {}
+    for key, terms in sorted(by_shard.items()):
+        out = bytearray(WORDS_MAGIC)
+        encode_varint(len(terms), out)
+        for term in terms:
+            encoded_term = term.encode("utf-8")
+            encoded_postings = encode_postings(postings[term])
+            encode_varint(len(encoded_term), out)
+            out += encoded_term
+            encode_varint(len(postings[term]), out)
+            encode_varint(len(encoded_postings), out)
+            out += encoded_postings
+        shards[key] = bytes(out)
+    return shards
+
+
+def decode_word_shard(data: bytes) -> dict:
+    """Shard file bytes -> {term: [(comic id, term frequency), ...]}."""
+    if data[:4] != WORDS_MAGIC:
+        raise ValueError("Not a word index shard")
+    pos = 4
+    n_terms, pos = decode_varint(data, pos)
+    terms = {}
+    for _ in range(n_terms):
+        length, pos = decode_varint(data, pos)
+        term = data[pos:pos + length].decode("utf-8")
+        pos += length
+        count, pos = decode_varint(data, pos)
+        length, pos = decode_varint(data, pos)
+        terms[term] = decode_postings(data[pos:pos + length], count)
+        pos += length
+    return terms
+
+
+def encode_search_shard(year: str, entries: dict) -> dict:
+    """One year's {date: entry} -> the search shard described above."""
+    days = [day_offset(year, date_str) for date_str in entries]
+    shard = {"format": SEARCH_SHARD_FORMAT, "year": year}
+    if None in days:
+        shard["dates"] = list(entries)
+    else:
+        shard["days"] = days
+    shard.update(title=[], text=[], offsets=[])
+    for entry in entries.values():
+        text, offsets = normalize_with_offsets(entry.get("transcript"))
+        shard["title"].append(entry.get("title") or "")
+        shard["text"].append(text)
+        shard["offsets"].append(offsets)
+    return shard
+
+
+def build_trigram_postings(transcripts: list[str]) -> dict:
+    """trigram -> ascending comic ids over all normalized transcripts."""
+    postings = defaultdict(list)
+    for doc, text in enumerate(transcripts):
+        for trigram in trigrams(normalize_text(text)):
+            postings[trigram].append(doc)
+    return postings
+
+
+def encode_trigram_shards(postings: dict, n_docs: int, n_shards: int = DEFAULT_TRIGRAM_SHARDS) -> dict:
+    """Group trigrams by hash; return {shard number: shard file bytes}."""
+    by_shard = defaultdict(list)
+    for trigram in sorted(postings):
+        by_shard[trigram_shard(trigram, n_shards)].append(trigram)
+
+    shards = {}
+    for shard, shard_trigrams in sorted(by_shard.items()):
+        out = bytearray(TRIGRAMS_MAGIC)
+        encode_varint(len(shard_trigrams), out)
+        for trigram in shard_trigrams:
+            encoded = trigram.encode("utf-8")
+            encoding, payload = encode_doc_ids(postings[trigram], n_docs)
+            encode_varint(len(encoded), out)
+            out += encoded
+            encode_varint(len(postings[trigram]), out)
+            encode_varint(encoding, out)
+            encode_varint(len(payload), out)
+            out += payload
+        shards[shard] = bytes(out)
+    return shards
+
+
+def decode_trigram_shard(data: bytes) -> dict:
+    """Shard file bytes -> {trigram: [comic id, ...]}."""
+    if data[:4] != TRIGRAMS_MAGIC:
+        raise ValueError("Not a trigram index shard")
+    pos = 4
+    n_trigrams, pos = decode_varint(data, pos)
+    postings = {}
+    for _ in range(n_trigrams):
+        length, pos = decode_varint(data, pos)
+        trigram = data[pos:pos + length].decode("utf-8")
+        pos += length
+        count, pos = decode_varint(data, pos)
+        encoding, pos = decode_varint(data, pos)
+        length, pos = decode_varint(data, pos)
+        postings[trigram] = decode_doc_ids(encoding, data[pos:pos + length], count)
+        pos += length
+    return postings
+
+
+# ------------------------------
+# Reading and querying (reference implementation)
+# ------------------------------
+
+class WordIndex:
+    """Reads a words/ index directory shard by shard, like the client would."""
+
+    def __init__(self, index_dir: Path):
+        self.dir = Path(index_dir)
+        with (self.dir / "manifest.json").open("r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("version") != WORDS_FORMAT_VERSION:
+            raise ValueError(f"Unsupported word index version in {self.dir}")
+        self.prefix_length = self.manifest["prefixLength"]
+        self._shards = {}
+        self.shards_read = 0
+
+    def _shard(self, key: str) -> dict:
+        if key not in self._shards:
+            entry = self.manifest["shards"].get(key)
+            if entry is None:
+                self._shards[key] = {}
+            else:
+                self._shards[key] = decode_word_shard((self.dir / entry["file"]).read_bytes())
+                self.shards_read += 1
+        return self._shards[key]
+
+    def postings(self, term: str) -> list:
+        """[(comic id, term frequency), ...] for one (normalized) term."""
+        return self._shard(shard_key(term, self.prefix_length)).get(term, [])
+
+    def query(self, text: str) -> list[int]:
+        """Comic ids containing every word of `text`, ascending."""
+        terms = sorted(set(words(normalize_text(text))))
+        if not terms:
+            return []
+        # Intersect rarest first
+        lists = sorted((self.postings(term) for term in terms), key=len)
+        result = {doc for doc, _ in lists[0]}
+        for postings in lists[1:]:
+            if not result:
+                break
+            result &= {doc for doc, _ in postings}
+        return sorted(result)
+
+
+def brute_force_search(transcripts: list[str], text: str) -> list[int]:
+    """Comic ids whose transcript contains every word of `text`, by scanning."""
+    terms = set(words(normalize_text(text)))
+    if not terms:
+        return []
+    return [
+        doc for doc, transcript in enumerate(transcripts)
+        if terms <= set(words(normalize_text(transcript)))
+    ]
+
+
+class TrigramIndex:
+    """Reads a trigrams/ index directory, fetching only the shards a query needs."""
+
+    def __init__(self, index_dir: Path):
+        self.dir = Path(index_dir)
+        with (self.dir / "manifest.json").open("r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("version") != TRIGRAMS_FORMAT_VERSION:
+            raise ValueError(f"Unsupported trigram index version in {self.dir}")
+        self.n_shards = self.manifest["shardCount"]
+        self._shards = {}
+        self.shards_read = 0
+
+    def _shard(self, shard: int) -> dict:
+        if shard not in self._shards:
+            entry = self.manifest["shards"].get(str(shard))
+            if entry is None:
+                self._shards[shard] = {}
+            else:
+                self._shards[shard] = decode_trigram_shard((self.dir / entry["file"]).read_bytes())
+                self.shards_read += 1
+        return self._shards[shard]
+
+    def postings(self, trigram: str) -> list[int]:
+        return self._shard(trigram_shard(trigram, self.n_shards)).get(trigram, [])
+
+    def candidates(self, term: str):
+        """
+        Comic ids that contain every trigram of the (lowercased) term, a
+        superset of the real matches; None if the term is too short to use
+        the index.
+        """
+        needed = trigrams(term)
+        if not needed:
+            return None
+        lists = sorted((self.postings(trigram) for trigram in needed), key=len)
+        result = set(lists[0])
+        for postings in lists[1:]:
+            if not result:
+                break
+            result &= set(postings)
+        return sorted(result)
+
+    def search(self, term: str, normalized: list[str]) -> list[int]:
+        """Comic ids whose normalized transcript contains `term`, verifying only the candidates."""
+        candidates = self.candidates(term)
+        if candidates is None:
+            candidates = range(len(normalized))
+        return [doc for doc in candidates if term in normalized[doc]]
+
+
+def brute_force_substring_search(normalized: list[str], term: str) -> list[int]:
+    """The viewer's search as a plain scan: comic ids whose normalized transcript contains `term`."""
+    return [doc for doc, text in enumerate(normalized) if term in text]
@@ -1,4 +1,4 @@
-import { useState, useEffect, useCallback } from 'react'
+import { useState, useEffect, useCallback, useRef } from 'react'
 import { Routes, Route, Navigate, useNavigate, useParams, useLocation, Link } from 'react-router-dom'
 import SearchBar from './components/SearchBar'
 import DatePicker from './components/DatePicker'
@@ -11,6 +11,31 @@ import SettingsModal from './components/SettingsModal'
 import Blog from './components/Blog'
 import Article from './components/Article'
 import { getCachedIndex, cacheIndex, getCachedYear, cacheYear } from './utils/indexedDB'
+import {
+  decodeSearchShard,
+  decodeYearShard,
+  searchEntriesFromYear,
+  searchShardFile,
+  toOriginalOffset,
+  yearShardFile
+} from './utils/shards'
+import { createTrigramSearch } from './utils/searchIndex'
+
+// Per-file content hashes written by scripts/build_web_shards.py.
+// Returns null when the manifest is missing, which disables hash checks.
+const fetchManifest = async (baseUrl) => {
+  try {
+    const response = await fetch(`${baseUrl}comics-manifest.json`, { cache: 'no-cache' })
+    return response.ok ? await response.json() : null
+  } catch (error) {
+    console.warn('Could not load comics-manifest.json:', error)
+    return null
+  }
+}
+
+// URL for a data file, versioned by its hash so HTTP caches never serve a stale copy
+const versionedUrl = (baseUrl, file, hash) =>
+  hash ? `${baseUrl}${file}?v=${hash.slice(0, 12)}` : `${baseUrl}${file}`
 
 // Layout component that wraps all routes
 function AppLayout({ children, currentPath }) {
@@ -150,8 +175,16 @@ function ComicsView() {
     return false
   })
   const [isSettingsOpen, setIsSettingsOpen] = useState(false)
+  const [transcriptHighlight, setTranscriptHighlight] = useState(null)
 
   const baseUrl = import.meta.env.BASE_URL
+  const manifestRef = useRef(null)
+  const yearRequestsRef = useRef({})
+  const trigramSearchRef = useRef(null)
+  const searchYearsRef = useRef({})
+  if (!trigramSearchRef.current) {
+    trigramSearchRef.current = createTrigramSearch((file, hash) => versionedUrl(baseUrl, file, hash))
+  }
 
   // Helper function to load a year's data (with caching)
   const loadYearData = useCallback(async (year) => {
@@ -159,30 +192,46 @@ function ComicsView() {
       return comicsData[year] || null
     }
 
-    // Try cache first
-    let data = await getCachedYear(year)
-    
-    if (!data) {
-      // Not in cache, fetch from network
-      try {
-        const response = await fetch(`${baseUrl}comics-data/${year}.json`)
-        if (!response.ok) {
-          throw new Error(`HTTP error! status: ${response.status}`)
+    // A search that spans many years may ask again before the first load
+    // has landed in comicsData; share the request in flight
+    if (yearRequestsRef.current[year]) {
+      return yearRequestsRef.current[year]
+    }
+
+    const request = (async () => {
+      // Try cache first (stale if the manifest has a different hash)
+      const { file, hash } = yearShardFile(manifestRef.current, year)
+      let data = await getCachedYear(year, hash)
+      
+      if (!data) {
+        // Not in cache, fetch from network
+        try {
+          const response = await fetch(versionedUrl(baseUrl, file, hash))
+          if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`)
+          }
+          data = decodeYearShard(await response.json())
+          // Cache it for next time (don't await, fire and forget)
+          cacheYear(year, data, hash).catch(err => {
+            console.warn(`Failed to cache year ${year}:`, err)
+          })
+        } catch (error) {
+          console.error(`Error loading year ${year}:`, error)
+          throw error
         }
-        data = await response.json()
-        // Cache it for next time (don't await, fire and forget)
-        cacheYear(year, data).catch(err => {
-          console.warn(`Failed to cache year ${year}:`, err)
-        })
-      } catch (error) {
-        console.error(`Error loading year ${year}:`, error)
-        throw error
       }
+      
+      setComicsData(prev => ({ ...prev, [year]: data }))
+      setLoadedYears(prev => new Set([...prev, year]))
+      return data
+    })()
+
+    yearRequestsRef.current[year] = request
+    try {
+      return await request
+    } finally {
+      delete yearRequestsRef.current[year]
     }
-    
-    setComicsData(prev => ({ ...prev, [year]: data }))
-    setLoadedYears(prev => new Set([...prev, year]))
-    return data
   }, [baseUrl, loadedYears, comicsData])
 
   // Handle immediate search (Enter key or button)
@@ -225,17 +274,23 @@ function ComicsView() {
         setLoadingStage('index')
         setLoading(true)
         
-        let index = await getCachedIndex()
+        // The manifest is tiny and never cached, so it always says which
+        // cached files are still current
+        const manifest = await fetchManifest(baseUrl)
+        manifestRef.current = manifest
+        const indexHash = manifest?.index?.sha256 || null
+        
+        let index = await getCachedIndex(indexHash)
         
         if (!index) {
           // Not in cache, fetch from network
-          const response = await fetch(`${baseUrl}comics-index.json`)
+          const response = await fetch(versionedUrl(baseUrl, 'comics-index.json', indexHash))
           if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status} - Could not find comics-index.json`)
           }
           index = await response.json()
           // Cache it for next time (don't await, fire and forget)
-          cacheIndex(index).catch(err => {
+          cacheIndex(index, indexHash).catch(err => {
             console.warn('Failed to cache index:', err)
           })
         }
@@ -250,17 +305,18 @@ function ComicsView() {
         setLoadingStage('year')
         setLoadingYear(targetYear)
         
-        let yearData = await getCachedYear(targetYear)
+        const { file: yearFile, hash: yearHash } = yearShardFile(manifest, targetYear)
+        let yearData = await getCachedYear(targetYear, yearHash)
         
         if (!yearData) {
           // Not in cache, fetch from network
-          const response = await fetch(`${baseUrl}comics-data/${targetYear}.json`)
+          const response = await fetch(versionedUrl(baseUrl, yearFile, yearHash))
           if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status} - Could not find ${targetYear}.json`)
+            throw new Error(`HTTP error! status: ${response.status} - Could not find ${yearFile}`)
           }
-          yearData = await response.json()
+          yearData = decodeYearShard(await response.json())
           // Cache it for next time (don't await, fire and forget)
-          cacheYear(targetYear, yearData).catch(err => {
+          cacheYear(targetYear, yearData, yearHash).catch(err => {
             console.warn(`Failed to cache year ${targetYear}:`, err)
           })
         }
@@ -422,7 +478,32 @@ function ComicsView() {
     }
   }, [searchTerm])
 
-  // Handle search (two-phase approach)
+  // Helper function to load a year's search entries ({ date: { title, text,
+  // offsets } }): the search shard if published, otherwise derived from the
+  // full year. Kept in memory for the session
+  const loadSearchYear = useCallback((year) => {
+    if (!searchYearsRef.current[year]) {
+      const shard = searchShardFile(manifestRef.current, year)
+      const request = shard
+        ? fetch(versionedUrl(baseUrl, shard.file, shard.hash))
+            .then(response => {
+              if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`)
+              }
+              return response.json()
+            })
+            .then(decodeSearchShard)
+        : Promise.resolve(comicsData[year] || loadYearData(year)).then(searchEntriesFromYear)
+      // Forget failed loads so the next search retries them
+      request.catch(() => {
+        delete searchYearsRef.current[year]
+      })
+      searchYearsRef.current[year] = request
+    }
+    return searchYearsRef.current[year]
+  }, [baseUrl, comicsData, loadYearData])
+
+  // Handle search
   useEffect(() => {
     if (!comicsIndex || !debouncedSearchTerm) {
       setSearchResults([])
@@ -434,197 +515,97 @@ function ComicsView() {
     setSearchStatus('Searching...')
 
     const term = debouncedSearchTerm.toLowerCase()
-    
-    // Phase 1: Search index for title matches
-    const titleMatchingDates = comicsIndex.dates.filter(item => {
-      return item.title.toLowerCase().includes(term)
-    })
+    let cancelled = false
 
-    // Phase 2: Search already-loaded years for transcript matches
-    const transcriptMatches = []
-    Object.keys(comicsData).forEach(year => {
-      const yearData = comicsData[year]
-      Object.keys(yearData).forEach(date => {
-        const comic = yearData[date]
-        if (!comic) return
-        
-        let transcript = comic.transcript ? comic.transcript.toLowerCase() : ''
-        transcript = transcript.replace(/\s*\n\s*/g, ' ')
-        
-        // Check if already in title matches to avoid duplicates
-        const alreadyMatched = titleMatchingDates.some(item => item.date === date)
-        if (!alreadyMatched && transcript.includes(term)) {
-          transcriptMatches.push({ date, year, comic })
+    // Excerpt around a match at `index` of the normalized text, or the start
+    // of the text for title-only matches (index -1)
+    const makeExcerpt = (text, index) => {
+      if (index === -1) {
+        return text.slice(0, 50) + (text.length > 50 ? '...' : '')
+      }
+      const start = Math.max(0, index - 25)
+      const end = Math.min(text.length, index + term.length + 25)
+      let excerpt = text.slice(start, end)
+      if (start > 0) excerpt = '...' + excerpt
+      if (end < text.length) excerpt += '...'
+      return excerpt
+    }
+
+    const runSearch = async () => {
+      // Phase 1: Search index for title matches
+      const titleMatchingDates = comicsIndex.dates.filter(item => {
+        return item.title.toLowerCase().includes(term)
+      })
+
+      // Phase 2: Ask the trigram index which comics can contain the term.
+      // null (no index, or a term under three characters) falls back to
+      // searching the years that are already loaded
+      let candidateDates = null
+      try {
+        const ids = await trigramSearchRef.current.candidates(term)
+        if (ids) {
+          candidateDates = ids.map(id => comicsIndex.dates[id]).filter(Boolean)
         }
+      } catch (error) {
+        console.warn('Trigram search failed, searching loaded years only:', error)
+      }
+      if (cancelled) return
+      const transcriptCandidates = candidateDates || comicsIndex.dates.filter(item => comicsData[item.year])
+
+      // Phase 3: Load search entries for the years of title matches and
+      // transcript candidates
+      const years = Array.from(new Set(
+        [...titleMatchingDates, ...transcriptCandidates].map(item => item.year)
+      ))
+      if (years.some(year => !searchYearsRef.current[year])) {
+        setLoadingStage('search')
+      }
+      const loadedSearchYears = await Promise.all(years.map(year => loadSearchYear(year)))
+      if (cancelled) return
+      const searchData = {}
+      years.forEach((year, index) => {
+        searchData[year] = loadedSearchYears[index]
       })
-    })
 
-    // Phase 3: Identify unique years from title matches that need loading
-    const yearsToLoad = new Set(
-      titleMatchingDates
-        .map(item => item.year)
-        .filter(year => !comicsData[year])
-    )
-    
-    // Phase 4: Load missing year files for title matches
-    if (yearsToLoad.size > 0) {
-      setLoadingStage('search')
-      Promise.all(
-        Array.from(yearsToLoad).map(year => loadYearData(year))
-      )
-        .then(loadedYearDataArray => {
-          // Build a map of loaded years for easy access
-          const loadedYearsMap = {}
-          Array.from(yearsToLoad).forEach((year, index) => {
-            loadedYearsMap[year] = loadedYearDataArray[index]
-          })
-          
-          // Update comicsData with loaded years
-          setComicsData(currentComicsData => ({
-            ...currentComicsData,
-            ...loadedYearsMap
-          }))
-          
-          // Phase 5: Build results from both title and transcript matches
-          // Merge loaded years with current data for building results
-          const mergedData = { ...comicsData, ...loadedYearsMap }
-          const results = []
-          const processedDates = new Set()
-          
-          // Add title matches
-          titleMatchingDates.forEach(item => {
-            const yearData = mergedData[item.year]
-            if (!yearData) return
-            
-            const comic = yearData[item.date]
-            if (!comic) return
-            
-            let transcript = comic.transcript ? comic.transcript.toLowerCase() : ''
-            transcript = transcript.replace(/\s*\n\s*/g, ' ')
-            
-            let excerpt = ''
-            if (transcript.includes(term)) {
-              // Transcript also matches
-              const index = transcript.indexOf(term)
-              const start = Math.max(0, index - 25)
-              const end = Math.min(transcript.length, index + term.length + 25)
-              excerpt = transcript.slice(start, end)
-              if (start > 0) excerpt = '...' + excerpt
-              if (end < transcript.length) excerpt += '...'
-            } else {
-              // Title match only
-              excerpt = transcript.slice(0, 50) + (transcript.length > 50 ? '...' : '')
-            }
-            
-            results.push({
-              date: item.date,
-              comic,
-              excerpt
-            })
-            processedDates.add(item.date)
-          })
-          
-          // Add transcript-only matches from loaded years
-          transcriptMatches.forEach(({ date, comic }) => {
-            if (processedDates.has(date)) return
-            
-            let transcript = comic.transcript ? comic.transcript.toLowerCase() : ''
-            transcript = transcript.replace(/\s*\n\s*/g, ' ')
-            
-            let excerpt = ''
-            const index = transcript.indexOf(term)
-            const start = Math.max(0, index - 25)
-            const end = Math.min(transcript.length, index + term.length + 25)
-            excerpt = transcript.slice(start, end)
-            if (start > 0) excerpt = '...' + excerpt
-            if (end < transcript.length) excerpt += '...'
-            
-            results.push({
-              date,
-              comic,
-              excerpt
-            })
-          })
-          
-          // Sort results by date (newest first)
-          results.sort((a, b) => b.date.localeCompare(a.date))
-          
-          setSearchResults(results)
-          setLoadingStage(null)
-          // Announce results
-          if (results.length === 0) {
-            setSearchStatus('No results found')
-          } else {
-            setSearchStatus(`${results.length} ${results.length === 1 ? 'result' : 'results'} found`)
-          }
-        })
-        .catch(error => {
-          console.error('Error loading years for search:', error)
-          setError(error.message)
-          setLoadingStage(null)
-        })
-    } else {
-      // No years to load, just build results from what we have
+      // Phase 4: Build results, checking candidates with the same substring
+      // test the index was built for
       const results = []
       const processedDates = new Set()
-      
-      // Add title matches
-      titleMatchingDates.forEach(item => {
-        const yearData = comicsData[item.year]
-        if (!yearData) return
-        
-        const comic = yearData[item.date]
-        if (!comic) return
-        
-        let transcript = comic.transcript ? comic.transcript.toLowerCase() : ''
-        transcript = transcript.replace(/\s*\n\s*/g, ' ')
-        
-        let excerpt = ''
-        if (transcript.includes(term)) {
-          const index = transcript.indexOf(term)
-          const start = Math.max(0, index - 25)
-          const end = Math.min(transcript.length, index + term.length + 25)
-          excerpt = transcript.slice(start, end)
-          if (start > 0) excerpt = '...' + excerpt
-          if (end < transcript.length) excerpt += '...'
-        } else {
-          excerpt = transcript.slice(0, 50) + (transcript.length > 50 ? '...' : '')
-        }
-        
-        results.push({
-          date: item.date,
-          comic,
-          excerpt
-        })
-        processedDates.add(item.date)
-      })
-      
-      // Add transcript-only matches
-      transcriptMatches.forEach(({ date, comic }) => {
+
+      const addResult = (date, year, titleMatch) => {
         if (processedDates.has(date)) return
-        
-        let transcript = comic.transcript ? comic.transcript.toLowerCase() : ''
-        transcript = transcript.replace(/\s*\n\s*/g, ' ')
-        
-        let excerpt = ''
-        const index = transcript.indexOf(term)
-        const start = Math.max(0, index - 25)
-        const end = Math.min(transcript.length, index + term.length + 25)
-        excerpt = transcript.slice(start, end)
-        if (start > 0) excerpt = '...' + excerpt
-        if (end < transcript.length) excerpt += '...'
-        
+        const entry = searchData[year]?.[date]
+        if (!entry) return
+
+        const index = entry.text.indexOf(term)
+        if (index === -1 && !titleMatch) return
+
+        // Where the match sits in the original transcript, for highlighting
+        const highlight = index !== -1 && entry.offsets
+          ? {
+              start: toOriginalOffset(entry.offsets, index),
+              end: toOriginalOffset(entry.offsets, index + term.length - 1) + 1
+            }
+          : null
+
         results.push({
           date,
-          comic,
-          excerpt
+          comic: { title: entry.title },
+          excerpt: makeExcerpt(entry.text, index),
+          highlight
         })
-      })
-      
+        processedDates.add(date)
+      }
+
+      // Add title matches, then transcript-only matches
+      titleMatchingDates.forEach(item => addResult(item.date, item.year, true))
+      transcriptCandidates.forEach(item => addResult(item.date, item.year, false))
+
       // Sort results by date (newest first)
       results.sort((a, b) => b.date.localeCompare(a.date))
-      
+
       setSearchResults(results)
+      setLoadingStage(stage => (stage === 'search' ? null : stage))
       // Announce results
       if (results.length === 0) {
         setSearchStatus('No results found')
@@ -632,7 +613,20 @@ function ComicsView() {
         setSearchStatus(`${results.length} ${results.length === 1 ? 'result' : 'results'} found`)
       }
     }
-  }, [debouncedSearchTerm, comicsIndex, comicsData, loadYearData])
+
+    runSearch().catch(error => {
+      if (cancelled) return
+      console.error('Error loading years for search:', error)
+      setError(error.message)
+      setLoadingStage(null)
+    })
+
+    // Loading years can update comicsData, which re-runs this effect; only
+    // the latest run may publish results
+    return () => {
+      cancelled = true
+    }
+  }, [debouncedSearchTerm, comicsIndex, comicsData, loadSearchYear])
 
   // Navigation function
   const navigateTo = useCallback(async (action, date) => {
@@ -756,6 +750,9 @@ function ComicsView() {
       }
     }
     
+    // Highlight the match in the transcript of the opened comic
+    const result = searchResults.find(item => item.date === date)
+    setTranscriptHighlight(result?.highlight ? { date, ...result.highlight } : null)
     setCurrentDate(date)
     setSearchTerm('')
     navigate(`/comic/${date}`)
@@ -892,6 +889,7 @@ function ComicsView() {
                   <TranscriptPanel
                     date={currentDate}
                     comic={currentComic}
+                    highlight={transcriptHighlight?.date === currentDate ? transcriptHighlight : null}
                   />
                 </div>
               )}
@@ -1,7 +1,8 @@
 import { useState } from 'react'
 
-function TranscriptPanel({ date, comic }) {
-  const [showTranscript, setShowTranscript] = useState(false)
+function TranscriptPanel({ date, comic, highlight }) {
+  // Opened from a search result: show the transcript with the match marked
+  const [showTranscript, setShowTranscript] = useState(Boolean(highlight))
   
   if (!comic) return null
 
@@ -34,7 +35,15 @@ function TranscriptPanel({ date, comic }) {
           className="bg-gray-50 dark:bg-gray-900 rounded-lg p-4 border border-gray-200 dark:border-gray-700 animate-fadeIn max-h-96 overflow-y-auto"
         >
           <p id="transcript" className="text-gray-700 dark:text-gray-300 leading-relaxed whitespace-pre-line font-mono text-xs md:text-sm">
-            {comic.transcript}
+            {highlight ? (
+              <>
+                {comic.transcript.slice(0, highlight.start)}
+                <mark className="bg-yellow-200 dark:bg-yellow-700 text-inherit rounded-sm">
+                  {comic.transcript.slice(highlight.start, highlight.end)}
+                </mark>
+                {comic.transcript.slice(highlight.end)}
+              </>
+            ) : comic.transcript}
           </p>
         </div>
       )}
@@ -5,6 +5,13 @@ const STORE_INDEX = 'index'
 const STORE_YEARS = 'years'
 const CACHE_VERSION = '1.0.0' // Increment when data structure changes
 
+// Entries are also stamped with the content hash from comics-manifest.json
+// (written by scripts/build_web_shards.py). When an expected hash is passed
+// in, an entry with a different hash is stale, so only the years that
+// actually changed are downloaded again.
+const isFresh = (result, expectedHash) =>
+  result && result._version === CACHE_VERSION && (!expectedHash || result._hash === expectedHash)
+
 let db = null
 
 // Initialize IndexedDB
@@ -46,7 +53,7 @@ export const initDB = () => {
 }
 
 // Get index from cache
-export const getCachedIndex = async () => {
+export const getCachedIndex = async (expectedHash = null) => {
   try {
     const database = await initDB()
     return new Promise((resolve, reject) => {
@@ -56,10 +63,10 @@ export const getCachedIndex = async () => {
       
       request.onsuccess = () => {
         const result = request.result
-        // Check version
-        if (result && result._version === CACHE_VERSION) {
+        // Check version and content hash
+        if (isFresh(result, expectedHash)) {
           // Remove version metadata before returning
-          const { _version, ...indexData } = result
+          const { _version, _hash, ...indexData } = result
           resolve(indexData)
         } else {
           resolve(null) // Version mismatch or no cache
@@ -74,11 +81,11 @@ export const getCachedIndex = async () => {
 }
 
 // Cache index
-export const cacheIndex = async (indexData) => {
+export const cacheIndex = async (indexData, hash = null) => {
   try {
     const database = await initDB()
     // Store with version metadata
-    const dataWithVersion = { ...indexData, _version: CACHE_VERSION }
+    const dataWithVersion = { ...indexData, _version: CACHE_VERSION, _hash: hash }
     return new Promise((resolve, reject) => {
       const transaction = database.transaction([STORE_INDEX], 'readwrite')
       const store = transaction.objectStore(STORE_INDEX)
@@ -93,7 +100,7 @@ export const cacheIndex = async (indexData) => {
 }
 
 // Get year data from cache
-export const getCachedYear = async (year) => {
+export const getCachedYear = async (year, expectedHash = null) => {
   try {
     const database = await initDB()
     return new Promise((resolve, reject) => {
@@ -103,10 +110,10 @@ export const getCachedYear = async (year) => {
       
       request.onsuccess = () => {
         const result = request.result
-        // Check version
-        if (result && result._version === CACHE_VERSION) {
+        // Check version and content hash
+        if (isFresh(result, expectedHash)) {
           // Remove version metadata before returning
-          const { _version, ...yearData } = result
+          const { _version, _hash, ...yearData } = result
           resolve(yearData)
         } else {
           resolve(null) // Version mismatch or no cache
@@ -121,11 +128,11 @@ export const getCachedYear = async (year) => {
 }
 
 // Cache year data
-export const cacheYear = async (year, yearData) => {
+export const cacheYear = async (year, yearData, hash = null) => {
   try {
     const database = await initDB()
     // Store with version metadata
-    const dataWithVersion = { ...yearData, _version: CACHE_VERSION }
+    const dataWithVersion = { ...yearData, _version: CACHE_VERSION, _hash: hash }
     return new Promise((resolve, reject) => {
       const transaction = database.transaction([STORE_YEARS], 'readwrite')
       const store = transaction.objectStore(STORE_YEARS)
@@ -0,0 +1,156 @@
+// Reader for the trigram search index written by
+// scripts/build_search_index.py (the format is described in
+// scripts/search_index.py). Given a lowercased search term it returns the
+// comics that may contain it, as positions in comics-index.json `dates`;
+// the caller still checks each candidate with a real substring test.
+
+const TRIGRAMS_MAGIC = 'DTI1'
+const TRIGRAMS_FORMAT_VERSION = 1
+const POSTINGS_BITMAP = 1
+
+const encoder = new TextEncoder()
+const decoder = new TextDecoder()
+
+// The client's search normalization, also used to build the index
+export const normalizeText = (text) =>
+  (text || '').toLowerCase().replace(/\s*\n\s*/g, ' ')
+
+// 32-bit FNV-1a over the UTF-8 bytes, as in search_index.py
+const fnv1a = (bytes) => {
+  let hash = 0x811c9dc5
+  for (const byte of bytes) {
+    hash = Math.imul(hash ^ byte, 0x01000193) >>> 0
+  }
+  return hash
+}
+
+// Trigrams by code point, matching Python string slicing
+const trigramsOf = (term) => {
+  const chars = Array.from(term)
+  const trigrams = new Set()
+  for (let i = 0; i + 3 <= chars.length; i++) {
+    trigrams.add(chars.slice(i, i + 3).join(''))
+  }
+  return trigrams
+}
+
+const readVarint = (bytes, state) => {
+  let value = 0
+  let scale = 1
+  let byte
+  do {
+    byte = bytes[state.pos++]
+    value += (byte & 0x7f) * scale
+    scale *= 128
+  } while (byte >= 0x80)
+  return value
+}
+
+// Shard bytes -> Map(trigram -> { count, encoding, payload }); posting
+// lists are only decoded when a query needs them
+const parseShard = (buffer) => {
+  const bytes = new Uint8Array(buffer)
+  if (decoder.decode(bytes.subarray(0, 4)) !== TRIGRAMS_MAGIC) {
+    throw new Error('Not a trigram index shard')
+  }
+  const state = { pos: 4 }
+  const entries = new Map()
+  const total = readVarint(bytes, state)
+  for (let i = 0; i < total; i++) {
+    const length = readVarint(bytes, state)
+    const trigram = decoder.decode(bytes.subarray(state.pos, state.pos + length))
+    state.pos += length
+    const count = readVarint(bytes, state)
+    const encoding = readVarint(bytes, state)
+    const payloadLength = readVarint(bytes, state)
+    entries.set(trigram, { count, encoding, payload: bytes.subarray(state.pos, state.pos + payloadLength) })
+    state.pos += payloadLength
+  }
+  return entries
+}
+
+const decodeDocIds = ({ count, encoding, payload }) => {
+  const ids = []
+  if (encoding === POSTINGS_BITMAP) {
+    payload.forEach((byte, i) => {
+      for (let bit = 0; byte && bit < 8; bit++) {
+        if (byte & (1 << bit)) ids.push(i * 8 + bit)
+      }
+    })
+    return ids
+  }
+  const state = { pos: 0 }
+  let doc = 0
+  for (let i = 0; i < count; i++) {
+    doc += readVarint(payload, state)
+    ids.push(doc)
+  }
+  return ids
+}
+
+// `urlFor(file, hash)` builds the fetch URL for a file under public/.
+// Manifest and shards are fetched once and kept in memory.
+export const createTrigramSearch = (urlFor) => {
+  let manifestPromise = null
+  const shards = new Map()
+
+  const loadManifest = () => {
+    if (!manifestPromise) {
+      manifestPromise = fetch(urlFor('search-index/trigrams/manifest.json'), { cache: 'no-cache' })
+        .then(response => (response.ok ? response.json() : null))
+        .then(manifest => (manifest?.version === TRIGRAMS_FORMAT_VERSION ? manifest : null))
+        .catch(error => {
+          console.warn('Could not load the trigram search index:', error)
+          return null
+        })
+    }
+    return manifestPromise
+  }
+
+  const loadShard = (manifest, shard) => {
+    if (!shards.has(shard)) {
+      const entry = manifest.shards[shard]
+      const promise = !entry
+        ? Promise.resolve(new Map())
+        : fetch(urlFor(`search-index/trigrams/${entry.file}`, entry.sha256))
+            .then(response => {
+              if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`)
+              return response.arrayBuffer()
+            })
+            .then(parseShard)
+      // Forget failed fetches so the next search retries them
+      promise.catch(() => shards.delete(shard))
+      shards.set(shard, promise)
+    }
+    return shards.get(shard)
+  }
+
+  // Ascending comic ids that contain every trigram of `term`, or null when
+  // the index is unavailable or the term is shorter than three characters
+  const candidates = async (term) => {
+    const trigrams = trigramsOf(term)
+    if (trigrams.size === 0) return null
+    const manifest = await loadManifest()
+    if (!manifest) return null
+
+    const lists = await Promise.all(
+      Array.from(trigrams).map(async trigram => {
+        const shard = String(fnv1a(encoder.encode(trigram)) % manifest.shardCount)
+        const entries = await loadShard(manifest, shard)
+        return entries.get(trigram) || { count: 0, encoding: 0, payload: new Uint8Array() }
+      })
+    )
+
+    // Intersect rarest first
+    lists.sort((a, b) => a.count - b.count)
+    let result = decodeDocIds(lists[0])
+    for (const list of lists.slice(1)) {
+      if (result.length === 0) break
+      const ids = new Set(decodeDocIds(list))
+      result = result.filter(id => ids.has(id))
+    }
+    return result
+  }
+
+  return { candidates }
+}
@@ -0,0 +1,106 @@
+// Decoders for the year shards written by scripts/build_web_shards.py.
+// The compact columnar shards (the format is described in
+// scripts/compact_shards.py) decode to the same { date: entry } shape as the
+// legacy comics-data/{year}.json files, so the rest of the app is unchanged.
+
+import { normalizeText } from './searchIndex'
+
+const COMPACT_FORMAT = 'columnar-1'
+
+const fillTemplate = (template, slots) => {
+  const parts = template.split('{}')
+  let out = parts[0]
+  for (let i = 1; i < parts.length; i++) {
+    out += slots[i - 1] + parts[i]
+  }
+  return out
+}
+
+export const decodeYearShard = (shard) => {
+  // Legacy shards are already { date: entry }
+  if (!shard || shard.format !== COMPACT_FORMAT) {
+    return shard
+  }
+
+  const year = Number(shard.year)
+  const raw = shard.raw || {}
+  const entries = {}
+
+  shard.days.forEach((day, i) => {
+    if (raw[i]) {
+      const [date, entry] = raw[i]
+      entries[date] = entry
+      return
+    }
+    const date = new Date(Date.UTC(year, 0, 1 + day)).toISOString().slice(0, 10)
+    const [template, ...slots] = shard.url[i]
+    entries[date] = {
+      image: date + shard.imageSuffixes[shard.image[i]],
+      originalimageurl: fillTemplate(shard.urlTemplates[template], slots),
+      title: shard.title[i],
+      transcript: shard.transcript[i],
+    }
+  })
+
+  return entries
+}
+
+// Which file to fetch for a year: the compact shard when the manifest
+// lists one, otherwise the legacy file
+export const yearShardFile = (manifest, year) => {
+  const entry = manifest?.years?.[year]
+  if (entry?.compact) {
+    return { file: entry.compact.file, hash: entry.compact.sha256 }
+  }
+  return { file: entry?.file || `comics-data/${year}.json`, hash: entry?.sha256 || null }
+}
+
+// Search-only shards (comics-data/search/{year}.json): dates, titles and
+// pre-normalized transcripts with an offset map back to the originals, as
+// described in scripts/search_index.py. Decoded to
+// { date: { title, text, offsets } }.
+const SEARCH_FORMAT = 'search-1'
+
+export const decodeSearchShard = (shard) => {
+  if (!shard || shard.format !== SEARCH_FORMAT) {
+    throw new Error(`Unknown search shard format: ${shard?.format}`)
+  }
+  const year = Number(shard.year)
+  const dates = shard.dates || shard.days.map(day =>
+    new Date(Date.UTC(year, 0, 1 + day)).toISOString().slice(0, 10)
+  )
+  const entries = {}
+  dates.forEach((date, i) => {
+    entries[date] = { title: shard.title[i], text: shard.text[i], offsets: shard.offsets[i] }
+  })
+  return entries
+}
+
+// The same shape built from a full year, for when no search shard is published
+export const searchEntriesFromYear = (yearData) => {
+  const entries = {}
+  Object.keys(yearData || {}).forEach(date => {
+    const comic = yearData[date]
+    if (!comic) return
+    entries[date] = { title: comic.title || '', text: normalizeText(comic.transcript), offsets: null }
+  })
+  return entries
+}
+
+// The search shard for a year, or null if the manifest lists none
+export const searchShardFile = (manifest, year) => {
+  const entry = manifest?.years?.[year]?.search
+  return entry ? { file: entry.file, hash: entry.sha256 } : null
+}
+
+// Normalized text position -> position in the original transcript
+export const toOriginalOffset = (offsets, position) => {
+  let space = 0
+  let shift = 0
+  for (let i = 0; i < offsets.length; i += 2) {
+    space += offsets[i]
+    if (space >= position) break
+    shift += offsets[i + 1]
+  }
+  return position + shift
+}